@@ -0,0 +1,250 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import FloatField, Func, Value
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .filters import filter_sensor_data
+from .models import SensorData
+
+try:
+    import numpy as np
+except ImportError:  # optional; /sensor-data/anomalies/ answers 501 without it
+    np = None
+
+
+# -------------------------
+# Anomaly detection over sensor streams
+# -------------------------
+# A window of readings for every sensor in scope is read in one query and
+# laid out as a (sensors x readings) grid per series, so each detector is a
+# handful of array operations over all sensors at once:
+#
+# - zscore: the reading against the mean/σ of the sensor's previous
+#   `window` readings;
+# - ewma:   the exponentially weighted mean leaving that rolling mean by more
+#   than z EWMA standard deviations (σ·sqrt(α/(2-α))), i.e. a sustained
+#   drift rather than a single spike; reported where the drift starts;
+# - rate:   the change per hour since the previous reading, scored against
+#   the rolling mean/σ of earlier changes.
+DEFAULT_LOOKBACK = timedelta(days=1)
+DEFAULT_WINDOW = 30
+DEFAULT_Z = 3.0
+DEFAULT_ALPHA = 0.3
+DEFAULT_LIMIT = 500
+EWMA_BLOCK = 256
+# Readings read per window at most (ANOMALY_MAX_ROWS), and per round trip
+DEFAULT_MAX_ROWS = 1_000_000
+FETCH_CHUNK = 10000
+
+SERIES = ("discard_rate", "error_rate", "weight")
+DETECTORS = ("zscore", "ewma", "rate")
+
+
+class WindowTooLarge(Exception):
+    pass
+
+
+def available():
+    return np is not None
+
+
+class EpochSeconds(Func):
+    # float8 rather than the numeric EXTRACT returns, which is slow to decode
+    template = "EXTRACT(EPOCH FROM %(expressions)s)::double precision"
+    output_field = FloatField()
+
+
+# -------------------------
+# Loading
+# -------------------------
+def load_window(user, filters):
+    """
+    The user's readings matching ``filters`` (the last day if no start is
+    given) as float columns, ordered by sensor and time. Rows are streamed
+    from a server-side cursor straight into the arrays; raises WindowTooLarge
+    past ANOMALY_MAX_ROWS readings.
+    """
+    if not filters["start"]:
+        filters = {**filters, "start": timezone.now() - DEFAULT_LOOKBACK}
+    max_rows = getattr(settings, "ANOMALY_MAX_ROWS", DEFAULT_MAX_ROWS)
+    qs = filter_sensor_data(SensorData.objects.filter(owner=user), filters)
+    rows = qs.order_by("sensor_id", "timestamp").annotate(
+        epoch=EpochSeconds("timestamp"),
+        weight=Coalesce(Cast("current_weight_kg", FloatField()), Value(float("nan"))),
+    ).values_list(
+        "sensor_id", "epoch", "items_scanned", "items_discarded",
+        "items_processed", "processed_with_errors", "weight",
+    )[:max_rows + 1]
+    dtype = [("sensor_id", np.int64), *((name, np.float64) for name in (
+        "epoch", "scanned", "discarded", "processed", "errors", "weight",
+    ))]
+    data = np.fromiter(rows.iterator(chunk_size=FETCH_CHUNK), dtype=dtype)
+    if len(data) > max_rows:
+        raise WindowTooLarge(max_rows)
+    epoch, scanned, discarded, processed, errors, weight = (
+        data[name] for name in ("epoch", "scanned", "discarded", "processed", "errors", "weight")
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        series = {
+            "discard_rate": np.where(scanned > 0, discarded / scanned, np.nan),
+            "error_rate": np.where(processed > 0, errors / processed, np.nan),
+            "weight": weight,
+        }
+    return filters, data["sensor_id"], epoch, series
+
+
+def to_grid(sensor_ids):
+    """Row/column of each (sensor-ordered) reading in a sensors x readings grid."""
+    sensors, starts, counts = np.unique(sensor_ids, return_index=True, return_counts=True)
+    rows = np.repeat(np.arange(len(sensors)), counts)
+    cols = np.arange(len(sensor_ids)) - np.repeat(starts, counts)
+    return sensors, rows, cols, (len(sensors), int(counts.max()))
+
+
+def _place(values, rows, cols, shape):
+    grid = np.full(shape, np.nan)
+    grid[rows, cols] = values
+    return grid
+
+
+# -------------------------
+# Vectorized statistics (NaN marks a missing value)
+# -------------------------
+def rolling_stats(grid, window, min_periods=None):
+    """Mean and sample σ of the previous ``window`` cells of each cell's row."""
+    if min_periods is None:
+        min_periods = max(2, window // 2)
+    valid = ~np.isnan(grid)
+    values = np.where(valid, grid, 0.0)
+    pad = np.zeros((grid.shape[0], 1))
+    sums = np.hstack([pad, np.cumsum(values, axis=1)])
+    squares = np.hstack([pad, np.cumsum(values * values, axis=1)])
+    counts = np.hstack([pad, np.cumsum(valid, axis=1)])
+
+    hi = np.arange(grid.shape[1])
+    lo = np.maximum(hi - window, 0)
+    n = counts[:, hi] - counts[:, lo]
+    s1 = sums[:, hi] - sums[:, lo]
+    s2 = squares[:, hi] - squares[:, lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = s1 / n
+        std = np.sqrt(np.maximum(s2 - s1 * mean, 0) / (n - 1))
+    short = n < min_periods
+    mean[short] = np.nan
+    std[short] = np.nan
+    return mean, std
+
+
+def forward_fill(grid):
+    """Carry the last value forward; leading gaps take the row's first value."""
+    valid = ~np.isnan(grid)
+    index = np.where(valid, np.arange(grid.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = grid[np.arange(grid.shape[0])[:, None], index]
+    first = grid[np.arange(grid.shape[0]), valid.argmax(axis=1)]
+    return np.where(np.isnan(filled), first[:, None], filled)
+
+
+def ewma(grid, alpha):
+    """
+    Exponentially weighted moving average of each row. Computed a block of
+    EWMA_BLOCK columns at a time as one matrix product, carrying the last
+    average of the previous block into the next.
+    """
+    grid = forward_fill(grid)
+    decay = 1 - alpha
+    k = np.arange(EWMA_BLOCK)
+    lags = k[:, None] - k[None, :]
+    weights = np.where(lags >= 0, alpha * decay ** np.maximum(lags, 0), 0.0)
+    carry = decay ** (k + 1)
+
+    out = np.empty_like(grid)
+    previous = grid[:, 0]
+    for start in range(0, grid.shape[1], EWMA_BLOCK):
+        block = grid[:, start:start + EWMA_BLOCK]
+        width = block.shape[1]
+        out[:, start:start + width] = block @ weights[:width, :width].T + previous[:, None] * carry[:width]
+        previous = out[:, start + width - 1]
+    return out
+
+
+def _score(grid, window, scale=1.0):
+    mean, std = rolling_stats(grid, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        score = (grid - mean) / (std * scale)
+    score[~(std > 0)] = np.nan
+    return mean, std, score
+
+
+# -------------------------
+# Detection
+# -------------------------
+def detect(sensor_ids, epoch, series, window=DEFAULT_WINDOW, z=DEFAULT_Z,
+           alpha=DEFAULT_ALPHA, limit=DEFAULT_LIMIT):
+    """Returns (counts per series/detector, the ``limit`` newest anomalies)."""
+    if not len(sensor_ids):
+        return {name: dict.fromkeys(DETECTORS, 0) for name in series}, []
+
+    sensors, rows, cols, shape = to_grid(sensor_ids)
+    times = _place(epoch, rows, cols, shape)
+    hours = np.diff(times, axis=1, prepend=np.nan) / 3600
+
+    ewma_scale = np.sqrt(alpha / (2 - alpha))
+    counts, found = {}, []
+    labels = [(name, detector) for name in series for detector in DETECTORS]
+    for name, values in series.items():
+        grid = _place(values, rows, cols, shape)
+        mean, std, zscore = _score(grid, window)
+
+        # NaN compares false, so missing values and short histories never flag
+        with np.errstate(invalid="ignore", divide="ignore"):
+            drift = (ewma(grid, alpha) - mean) / (std * ewma_scale)
+            drifting = np.abs(drift) >= z
+            drift_onset = drifting & ~np.hstack([np.zeros((shape[0], 1), bool), drifting[:, :-1]])
+
+            rate = np.diff(forward_fill(grid), axis=1, prepend=np.nan) / hours
+            rate[~np.isfinite(rate)] = np.nan
+            _, _, rate_score = _score(rate, window)
+
+            observed = ~np.isnan(grid)
+            flags = {
+                "zscore": (observed & (np.abs(zscore) >= z), zscore),
+                "ewma": (observed & drift_onset, drift),
+                "rate": (observed & (np.abs(rate_score) >= z), rate_score),
+            }
+        counts[name] = {}
+        for detector, (flag, score) in flags.items():
+            r, c = np.nonzero(flag)
+            counts[name][detector] = len(r)
+            label = np.full(len(r), labels.index((name, detector)))
+            found.append(np.column_stack([times[r, c], sensors[r], label, grid[r, c], score[r, c]]))
+
+    # Only the newest `limit` flags become dicts
+    found = np.concatenate(found)
+    found = found[np.argsort(-found[:, 0], kind="stable")[:limit]]
+    return counts, [
+        {
+            "timestamp": datetime.fromtimestamp(ts, tz=dt_timezone.utc),
+            "sensor": int(sensor),
+            "series": labels[int(label)][0],
+            "detector": labels[int(label)][1],
+            "value": round(float(value), 4),
+            "score": round(float(score), 3),
+        }
+        for ts, sensor, label, value, score in found.tolist()
+    ]
+
+
+def anomalies(user, filters, **options):
+    filters, sensor_ids, epoch, series = load_window(user, filters)
+    counts, found = detect(sensor_ids, epoch, series, **options)
+    return {
+        "start": filters["start"],
+        "end": filters["end"],
+        "readings": len(sensor_ids),
+        "sensors": len(np.unique(sensor_ids)),
+        "counts": counts,
+        "anomalies": found,
+    }
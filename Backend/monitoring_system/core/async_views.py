@@ -0,0 +1,251 @@
+import asyncio
+import json
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.db.models import F, FloatField, Sum
+from django.db.models.functions import Cast, Coalesce, TruncDate
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from . import buffer, db_routers, ingest, metrics_cache
+from .authentication import CachedJWTAuthentication
+from .downsampling import DOWNSAMPLE_MODES, LTTB_SERIES, downsample, lttb
+from .efficiency import GRAINS as EFFICIENCY_GRAINS, efficiency_series
+from .filters import energy_filters, energy_queryset, sensor_data_filters, sensor_data_queryset
+from .models import EnergyConsumption
+from .realtime import publish_energy
+from .rollups import RESOLUTIONS, rollup_metrics
+from .summary import build_summary, summary_querysets
+from .views import SensorDataViewSet
+
+
+# -------------------------
+# Async metrics and ingest views
+# -------------------------
+# Plain Django async views for deployments served through
+# monitoring_system.asgi, answering like their DRF counterparts:
+#
+#   GET  /api/async/sensor-data/metrics/  ~ /api/sensor-data/metrics/
+#   GET  /api/async/energy/metrics/       ~ /api/energy/metrics/
+#   GET  /api/async/dashboard/            ~ /api/plants/summary/
+#   POST /api/async/sensor-data/bulk/     ~ /api/sensor-data/bulk/
+#   POST /api/async/energy/bulk/            a list of energy readings
+#
+# Django's async ORM runs each query on the request's one database thread:
+# awaiting it frees the event loop, but a request's queries still take turns.
+# The independent aggregations behind one call therefore go through
+# concurrently(), which gives each its own worker thread and connection.
+# SensorData writes stay one transaction with their rollup updates, which the
+# async ORM can't open, so they run in a thread; energy rows have no rollups
+# and are written with abulk_create().
+SENSOR_DATA_METRICS = {
+    "production": ["items_scanned", "items_processed", "items_discarded", "processed_with_errors"],
+    "weight": ["current_weight_kg"],
+    "quality": ["category_a", "category_b", "category_c", "category_d"],
+}
+CHUNK_SIZE = 2000
+
+
+def _json(data, status=200):
+    # DRF's encoder, so payloads match the synchronous endpoints
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+def _error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+def _on_own_connection(func):
+    close_old_connections()
+    try:
+        return func()
+    finally:
+        close_old_connections()
+
+
+async def concurrently(*funcs):
+    """Run blocking ``funcs`` at once, each on a worker thread with its own connection."""
+    return await asyncio.gather(*(
+        sync_to_async(_on_own_connection, thread_sensitive=False)(func) for func in funcs
+    ))
+
+
+@sync_to_async
+def _authenticate(request):
+    try:
+        result = CachedJWTAuthentication().authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return result[0] if result else None
+
+
+def api_view(method, replica=False):
+    """
+    JWT-authenticated async view taking ``(request, user)``. ``replica``
+    views only read, and do so from the replica when the request allows it.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request):
+            if request.method != method:
+                return _error("Method not allowed", 405)
+            user = await _authenticate(request)
+            if user is None:
+                return _error("Authentication credentials were not provided or are invalid", 401)
+            request.user = user
+            if replica and db_routers.replica_alias() and not await sync_to_async(db_routers.is_pinned)(request):
+                db_routers.read_from_replica()
+            return await view(request, user)
+        return csrf_exempt(wrapper)
+    return decorator
+
+
+def _load_rows(request):
+    try:
+        return json.loads(request.body)
+    except ValueError:
+        return None
+
+
+def _bulk_result(created, errors):
+    body, status = ingest.bulk_result(created, errors)
+    return _json(body, status=status)
+
+
+# -------------------------
+# Metrics
+# -------------------------
+async def _cached(endpoint, user, params, compute):
+    """metrics_cache.cached_response() for async views; ``compute`` returns (data, error)."""
+    key, data = await sync_to_async(metrics_cache.lookup)(endpoint, user, params)
+    if data is not None:
+        return _json(data)
+    data, error = await compute(user, params)
+    if error:
+        return _error(error, 400)
+    await sync_to_async(metrics_cache.store)(key, data, params.get("metric", ""))
+    return _json(data)
+
+
+async def _sensor_data_metrics(user, params):
+    metric_type = params.get("metric")
+    resolution = params.get("resolution")
+    max_points = params.get("max_points")
+    mode = params.get("downsample", "avg")
+    limit = SensorDataViewSet.max_chart_points
+
+    if max_points is not None:
+        try:
+            max_points = int(max_points)
+        except ValueError:
+            max_points = 0
+        if not 3 <= max_points <= limit:
+            return None, f"max_points must be between 3 and {limit}"
+        if mode not in DOWNSAMPLE_MODES:
+            return None, "Invalid downsample mode"
+    if resolution and resolution not in RESOLUTIONS:
+        return None, "Invalid resolution"
+    if metric_type not in SENSOR_DATA_METRICS:
+        return None, "Invalid metric"
+
+    filters = sensor_data_filters(params)
+    if resolution:
+        if filters["item_id"] or filters["categories"]:
+            return None, "Item and category filters are not available with resolution"
+        data = await sync_to_async(rollup_metrics)(user, filters, resolution, metric_type)
+        if max_points:
+            data = lttb(data[::-1], max_points, LTTB_SERIES[metric_type])[::-1]
+        return data, None
+
+    fields = SENSOR_DATA_METRICS[metric_type]
+    qs = sensor_data_queryset(user, params)
+    if max_points:
+        return await sync_to_async(downsample)(qs, metric_type, fields, filters, max_points, mode), None
+    return [row async for row in qs.values("timestamp", *fields, "readings", "compacted").aiterator(chunk_size=CHUNK_SIZE)], None
+
+
+async def _energy_metrics(user, params):
+    metric_type = params.get("metric")
+    if not metric_type:
+        return None, "Metric parameter is required"
+    qs = energy_queryset(user, params)
+
+    if metric_type == "daily":
+        rows = qs.annotate(date=TruncDate("timestamp")).values("date").annotate(
+            energy_kwh=Coalesce(Cast(Sum("energy_kwh"), FloatField()), 0.0),
+            cost_inr=Coalesce(Cast(Sum("cost"), FloatField()), 0.0),
+        ).order_by("date")
+        return [row async for row in rows.aiterator()], None
+
+    if metric_type == "sensor-cost":
+        rows = qs.values(sensor_name=F("sensor__name")).annotate(
+            total_cost=Coalesce(Cast(Sum("cost"), FloatField()), 0.0)
+        ).order_by("-total_cost")
+        return [row async for row in rows.aiterator()], None
+
+    if metric_type == "efficiency":
+        grain = params.get("resolution", "day")
+        if grain not in EFFICIENCY_GRAINS:
+            return None, "Invalid resolution"
+        return await sync_to_async(efficiency_series)(qs, user, energy_filters(params), grain), None
+
+    return None, "Invalid metric type"
+
+
+@api_view("GET", replica=True)
+async def sensor_data_metrics(request, user):
+    return await _cached("sensor-data", user, request.GET, _sensor_data_metrics)
+
+
+@api_view("GET", replica=True)
+async def energy_metrics(request, user):
+    return await _cached("energy", user, request.GET, _energy_metrics)
+
+
+@api_view("GET", replica=True)
+async def dashboard(request, user):
+    """The plant summary, with its three aggregations run at the same time."""
+    filters = sensor_data_filters(request.GET)
+    rows = await concurrently(*(partial(list, qs) for qs in summary_querysets(user, filters)))
+    return _json(build_summary(filters, *rows))
+
+
+# -------------------------
+# Ingest
+# -------------------------
+@api_view("POST")
+async def sensor_data_bulk(request, user):
+    rows = _load_rows(request)
+    error = ingest.payload_error(rows)
+    if error:
+        return _error(error, 400)
+
+    readings, errors = await sync_to_async(ingest.sensor_data_readings)(user, rows)
+    # Rows, rollups, cache invalidation and stream events in one transaction
+    await sync_to_async(buffer.write_sensor_data)([(user, reading) for reading in readings])
+    return _bulk_result(len(readings), errors)
+
+
+def _energy_written(user, rows):
+    metrics_cache.invalidate(
+        user, plants={row.plant_id for row in rows}, sensors={row.sensor_id for row in rows}
+    )
+    publish_energy(rows)
+
+
+@api_view("POST")
+async def energy_bulk(request, user):
+    rows = _load_rows(request)
+    error = ingest.payload_error(rows)
+    if error:
+        return _error(error, 400)
+
+    energy, errors = await sync_to_async(ingest.energy_rows)(user, rows)
+    if energy:
+        await EnergyConsumption.objects.abulk_create(energy, batch_size=1000)
+        await sync_to_async(_energy_written)(user, energy)
+    return _bulk_result(len(energy), errors)
@@ -0,0 +1,610 @@
+import asyncio
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import partial
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection, connections, transaction
+from django.http import QueryDict
+from django.test import AsyncClient, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import analytics, metrics_cache, middleware, renderers
+from .authentication import CachedJWTAuthentication, get_cache as auth_cache, user_cache_key
+from .filters import sensor_data_filters
+from .hashers import ConfigurablePBKDF2PasswordHasher
+from .models import CustomUser, Plant, Sensor, Item, SensorData
+from .rollups import retract_readings
+from .serializers import SensorDataSerializer, SensorDataRowSerializer
+
+
+# -----------------------
+# Helpers
+# -----------------------
+@contextmanager
+def rolled_back():
+    """Run a benchmark inside a transaction that is always rolled back."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+@contextmanager
+def counting_queries():
+    """
+    CaptureQueriesContext over an emptied query log: the log keeps only the
+    last 9000 queries, and once earlier blocks have filled it a capture
+    counts nothing. The capture reads the live log, so take its length
+    before the next one clears it.
+    """
+    connection.queries_log.clear()
+    with CaptureQueriesContext(connection) as queries:
+        yield queries
+
+
+def make_fixtures(sensors=4, items=2):
+    tag = uuid.uuid4().hex[:8]
+    user = CustomUser.objects.create_user(
+        email=f"bench-{tag}@example.com", username=f"bench-{tag}", password=tag
+    )
+    plant = Plant.objects.create(name=f"Bench {tag}", location="bench", plant_type="recycling", user=user)
+    sensor_objs = [
+        Sensor.objects.create(name=f"S{i}", plant=plant, location_type=Sensor.LOCATION_CHOICES[i % 5][0])
+        for i in range(sensors)
+    ]
+    item_objs = [Item.objects.create(plant=plant, name=f"Item {i}") for i in range(items)]
+    return user, plant, sensor_objs, item_objs
+
+
+def authenticated_client(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+def fake_reading(sensor, timestamp=None):
+    return {
+        "sensor": sensor.id,
+        "timestamp": (timestamp or timezone.now()).isoformat(),
+        "items_scanned": random.randint(50, 150),
+        "items_processed": random.randint(40, 120),
+        "items_discarded": random.randint(0, 10),
+        "processed_with_errors": random.randint(0, 5),
+        "current_weight_kg": f"{random.uniform(10, 500):.2f}",
+        "category_a": random.randint(0, 40),
+        "category_b": random.randint(0, 30),
+        "category_c": random.randint(0, 20),
+        "category_d": random.randint(0, 10),
+    }
+
+
+def seed_sensor_data(sensors, items, rows):
+    now = timezone.now()
+    readings = []
+    for n in range(rows):
+        sensor = random.choice(sensors)
+        data = fake_reading(sensor, now - timedelta(minutes=n))
+        data.pop("sensor")
+        readings.append(SensorData(
+            sensor=sensor, plant_id=sensor.plant_id, owner_id=sensor.plant.user_id,
+            item=random.choice(items + [None]), **data
+        ))
+    SensorData.objects.bulk_create(readings, batch_size=1000)
+
+
+def report(out, label, rows, seconds):
+    rate = rows / seconds if seconds else float("inf")
+    out.write(f"{label:<28} {rows:>8} rows  {seconds:>8.3f}s  {rate:>10.1f} rows/sec")
+    return rate
+
+
+# -----------------------
+# Scenarios
+# -----------------------
+def bench_ingest(out, rows=2000, batch_size=500, **options):
+    """Single-row POST /sensor-data/ vs batched POST /sensor-data/bulk/."""
+    with rolled_back():
+        user, plant, sensors, items = make_fixtures()
+        client = authenticated_client(user)
+        payload = [fake_reading(random.choice(sensors)) for _ in range(rows)]
+
+        start = time.perf_counter()
+        for row in payload:
+            response = client.post("/api/sensor-data/", row, format="json")
+            assert response.status_code == 201, response.content
+        single = report(out, "single-row POST", rows, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i in range(0, rows, batch_size):
+            response = client.post("/api/sensor-data/bulk/", payload[i:i + batch_size], format="json")
+            assert response.status_code == 201, response.content
+        bulk = report(out, f"bulk POST (batch={batch_size})", rows, time.perf_counter() - start)
+
+        out.write(f"speedup: {bulk / single:.1f}x")
+
+
+def bench_list(out, rows=2000, **options):
+    """ModelSerializer over lazy relations (before) vs values() + row serializer (now)."""
+    with rolled_back():
+        user, plant, sensors, items = make_fixtures()
+        seed_sensor_data(sensors, items, max(rows, 100))
+        client = authenticated_client(user)
+        base = SensorData.objects.filter(owner=user).order_by("-timestamp")
+        row_serializer = SensorDataRowSerializer()
+
+        endpoint_queries = {}
+        for size in (20, 50, 100):
+            repeat = max(rows // size, 1)
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                SensorDataSerializer(list(base[:size]), many=True).data
+            before = report(out, f"ModelSerializer page={size}", size * repeat, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                row_serializer.to_representation(row_serializer.values(base)[:size])
+            after = report(out, f"row serializer page={size}", size * repeat, time.perf_counter() - start)
+
+            # Queries are counted on a single page of each
+            with counting_queries() as queries:
+                SensorDataSerializer(list(base[:size]), many=True).data
+            before_queries = len(queries)
+            with counting_queries() as queries:
+                row_serializer.to_representation(row_serializer.values(base)[:size])
+            after_queries = len(queries)
+            with counting_queries() as queries:
+                client.get(f"/api/sensor-data/?page_size={size}")
+            endpoint_queries[size] = len(queries)
+
+            out.write(
+                f"  queries/page: {before_queries} -> {after_queries}, "
+                f"GET /sensor-data/: {endpoint_queries[size]}, speedup {after / before:.1f}x"
+            )
+            if after <= before:
+                raise CommandError(f"Row serializer is not faster at page size {size}")
+
+        if len(set(endpoint_queries.values())) != 1:
+            raise CommandError(f"List query count depends on page size: {endpoint_queries}")
+
+
+def bench_auth(out, rows=2000, **options):
+    """Per-request cost of resolving the user from a JWT: uncached vs cached."""
+    with rolled_back():
+        user, plant, sensors, items = make_fixtures()
+        token = str(RefreshToken.for_user(user).access_token)
+        request = RequestFactory().get("/api/plants/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        auth_cache().delete(user_cache_key(user.pk))
+
+        results = {}
+        for label, auth in (("JWTAuthentication", JWTAuthentication()), ("CachedJWTAuthentication", CachedJWTAuthentication())):
+            with counting_queries() as queries:
+                start = time.perf_counter()
+                for _ in range(rows):
+                    assert auth.authenticate(request)[0].pk == user.pk
+                elapsed = time.perf_counter() - start
+            results[label] = report(out, label, rows, elapsed)
+            out.write(f"  {elapsed / rows * 1e6:.0f} us/request, {len(queries) / rows:.3f} queries/request")
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        with counting_queries() as queries:
+            client.get("/api/plants/")
+        out.write(f"GET /plants/ with a warm user cache: {len(queries)} queries")
+
+        auth_cache().delete(user_cache_key(user.pk))
+        out.write(f"speedup: {results['CachedJWTAuthentication'] / results['JWTAuthentication']:.1f}x")
+
+
+@contextmanager
+def counting_hashes():
+    """Count PBKDF2 runs (verifications and rehashes) inside the block."""
+    calls = []
+    encode = ConfigurablePBKDF2PasswordHasher.encode
+
+    def counted(self, *args, **kwargs):
+        calls.append(1)
+        return encode(self, *args, **kwargs)
+
+    ConfigurablePBKDF2PasswordHasher.encode = counted
+    try:
+        yield calls
+    finally:
+        ConfigurablePBKDF2PasswordHasher.encode = encode
+
+
+def bench_login(out, rows=2000, **options):
+    """POST /auth/login/ throughput, at the configured and at a tenth of the hashing cost."""
+    logins = min(rows, 50)
+    with rolled_back():
+        user, plant, sensors, items = make_fixtures()
+        password = uuid.uuid4().hex
+        user.set_password(password)
+        user.save()
+        client = APIClient()
+        credentials = {"email": user.email, "password": password}
+
+        iterations = ConfigurablePBKDF2PasswordHasher().iterations
+        rates = {}
+        for cost in (iterations, max(iterations // 10, 1)):
+            with override_settings(PASSWORD_HASH_ITERATIONS=cost):
+                # The first login after a cost change rehashes the stored password
+                with counting_hashes() as calls:
+                    response = client.post("/api/auth/login/", credentials, format="json")
+                assert response.status_code == 200, response.content
+                user.refresh_from_db()
+                out.write(
+                    f"iterations={cost}: first login ran {len(calls)} hashes, "
+                    f"stored hash now {user.password.split('$')[1]} iterations"
+                )
+
+                with counting_hashes() as calls:
+                    start = time.perf_counter()
+                    for _ in range(logins):
+                        response = client.post("/api/auth/login/", credentials, format="json")
+                        assert response.status_code == 200, response.content
+                    elapsed = time.perf_counter() - start
+                rates[cost] = report(out, f"login (iterations={cost})", logins, elapsed)
+                out.write(f"  {elapsed / logins * 1000:.1f} ms/login, {len(calls) / logins:.1f} hashes/login")
+
+            if len(calls) != logins:
+                raise CommandError("Each login should verify the password exactly once")
+
+        out.write(f"speedup at a tenth of the cost: {rates[min(rates)] / rates[iterations]:.1f}x")
+
+
+SEED_NOISY_SENSOR_DATA = """
+    INSERT INTO core_sensordata (
+        sensor_id, plant_id, owner_id, timestamp, items_scanned, items_processed,
+        items_discarded, processed_with_errors, current_weight_kg, category_a, category_b,
+        category_c, category_d, created_at, updated_at
+    )
+    SELECT s.id, s.plant_id, %(owner)s,
+           now() - (n * %(step)s * interval '1 second'),
+           100, 90,
+           CASE WHEN n %% 997 = 0 THEN 60 ELSE 3 + (random() * 4)::int END,
+           (random() * 4)::int,
+           CASE WHEN n %% 11 = 0 THEN NULL ELSE round((250 + random() * 10)::numeric, 2) END,
+           40, 30, 15, 5, now(), now()
+    FROM generate_series(1, %(rows)s) AS n
+    JOIN core_sensor s ON s.id = (%(sensor_ids)s::bigint[])[1 + n %% cardinality(%(sensor_ids)s::bigint[])]
+"""
+
+
+def python_zscores(sensor_ids, values, window):
+    """Row-by-row rolling z-score, the way it would be written without NumPy."""
+    flagged = 0
+    history, current = [], None
+    for sensor, value in zip(sensor_ids, values):
+        if sensor != current:
+            history, current = [], sensor
+        if value != value:  # NaN
+            continue
+        recent = history[-window:]
+        if len(recent) >= max(2, window // 2):
+            mean = sum(recent) / len(recent)
+            std = (sum((v - mean) ** 2 for v in recent) / (len(recent) - 1)) ** 0.5
+            if std and abs(value - mean) / std >= analytics.DEFAULT_Z:
+                flagged += 1
+        history.append(value)
+    return flagged
+
+
+def bench_anomalies(out, rows=2000, **options):
+    """Anomaly detection: one-query load + NumPy detectors vs a row-by-row Python z-score."""
+    if not analytics.available():
+        raise CommandError("The anomalies benchmark needs numpy")
+    with rolled_back():
+        user, plant, sensors, items = make_fixtures(sensors=8)
+        # Spread the readings over the last day
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_NOISY_SENSOR_DATA, {
+                "owner": user.pk, "rows": rows, "step": 86000 / rows,
+                "sensor_ids": [s.id for s in sensors],
+            })
+            cursor.execute("ANALYZE core_sensordata")
+        filters = sensor_data_filters(QueryDict(f"plant={plant.id}"))
+
+        start = time.perf_counter()
+        with counting_queries() as queries:
+            filters, sensor_ids, epoch, series = analytics.load_window(user, filters)
+        report(out, f"load window ({len(queries)} query)", len(sensor_ids), time.perf_counter() - start)
+
+        start = time.perf_counter()
+        counts, found = analytics.detect(sensor_ids, epoch, series)
+        vectorized = report(out, "NumPy detectors (3 series)", len(sensor_ids), time.perf_counter() - start)
+        for name, detectors in counts.items():
+            out.write(f"  {name:<13} " + ", ".join(f"{d}={n}" for d, n in detectors.items()))
+
+        sample = min(len(sensor_ids), 200000)
+        start = time.perf_counter()
+        python_zscores(sensor_ids[:sample].tolist(), series["discard_rate"][:sample].tolist(), analytics.DEFAULT_WINDOW)
+        python = report(out, "Python z-score (1 series)", sample, time.perf_counter() - start)
+
+        # The NumPy run covers three series with three detectors each
+        out.write(f"speedup per series: {vectorized * 3 / python:.1f}x")
+
+
+# (label, URL) pairs read against seeded data; {plant}, {sensor} and {day}
+# are filled in from the user's data.
+ENDPOINT_CASES = [
+    ("sensor-data list", "/api/sensor-data/?page_size=100"),
+    ("sensor-data keyset page", "/api/sensor-data/?pagination=cursor&page_size=100"),
+    ("sensor-data plant + day", "/api/sensor-data/?plant_id={plant}&start_date={day}&end_date={day}&page_size=100"),
+    ("sensor-data sensor + week", "/api/sensor-data/?sensor_id={sensor}&date_filter=week&page_size=100"),
+    ("metrics production (hour)", "/api/sensor-data/metrics/?metric=production&plant={plant}&resolution=hour&date_filter=week"),
+    ("metrics quality (day)", "/api/sensor-data/metrics/?metric=quality&resolution=day&date_filter=month"),
+    ("metrics weight (200 pts)", "/api/sensor-data/metrics/?metric=weight&plant={plant}&date_filter=week&max_points=200"),
+    ("energy list", "/api/energy/?page_size=100"),
+    ("energy plant + week", "/api/energy/?plant={plant}&date_filter=week&page_size=100"),
+    ("energy daily", "/api/energy/metrics/?metric=daily&date_filter=month"),
+    ("energy sensor-cost", "/api/energy/metrics/?metric=sensor-cost&plant={plant}"),
+    ("energy efficiency (day)", "/api/energy/metrics/?metric=efficiency&resolution=day&date_filter=month"),
+    ("plant summary (week)", "/api/plants/summary/?date_filter=week"),
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[round(pct / 100 * (len(ordered) - 1))]
+
+
+def rows_in(response):
+    data = getattr(response, "data", None)
+    if isinstance(data, dict):
+        for key in ("results", "plants", "anomalies"):
+            if key in data:
+                return len(data[key])
+        return 1
+    return len(data) if isinstance(data, list) else 0
+
+
+def timed_calls(out, label, call, repeat, rows_per_call=None):
+    """Run ``call`` once to warm up, then ``repeat`` times; report p50/p95, queries and rows/sec."""
+    call()
+    latencies, queries, rows = [], [], 0
+    for _ in range(repeat):
+        with counting_queries() as captured:
+            start = time.perf_counter()
+            response = call()
+            latencies.append(time.perf_counter() - start)
+        assert response.status_code < 300, (label, response.status_code, getattr(response, "data", None))
+        queries.append(len(captured))
+        rows += rows_per_call or rows_in(response)
+    total = sum(latencies)
+    out.write(
+        f"{label:<30} p50 {percentile(latencies, 50) * 1000:8.1f} ms  "
+        f"p95 {percentile(latencies, 95) * 1000:8.1f} ms  {percentile(queries, 50):>3} queries  "
+        f"{rows // repeat:>6} rows  {rows / total if total else 0:>10.0f} rows/sec"
+    )
+
+
+def seeded_user(email=None):
+    users = CustomUser.objects.all()
+    user = users.filter(email=email).first() if email else (
+        users.filter(email__startswith="seed-").order_by("-id").first()
+    )
+    if user is None:
+        raise CommandError("No seeded data; run `manage.py seed_data` first (or pass --user).")
+    return user
+
+
+def bench_endpoints(out, rows=2000, batch_size=500, repeat=20, user=None, **options):
+    """p50/p95 latency, queries and rows/sec of the main read and ingest calls on seeded data."""
+    user = seeded_user(user)
+    sensor = Sensor.objects.filter(plant__user=user, sensor_data__isnull=False).select_related("plant").first()
+    if sensor is None:
+        raise CommandError(f"{user.email} has no sensor data; run `manage.py seed_data --user {user.email}`.")
+    day = (timezone.localdate() - timedelta(days=1)).isoformat()
+    client = authenticated_client(user)
+    out.write(f"{user.email}: {SensorData.objects.filter(owner=user).count()} sensor-data rows, {repeat} calls each")
+
+    # Measure the queries, not the metrics cache
+    caches = {**settings.CACHES, "metrics": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+    with override_settings(CACHES=caches):
+        cases = ENDPOINT_CASES
+        if analytics.available():
+            cases = [*cases, ("anomalies (plant, day)", "/api/sensor-data/anomalies/?plant={plant}")]
+        for label, url in cases:
+            url = url.format(plant=sensor.plant_id, sensor=sensor.id, day=day)
+            timed_calls(out, label, lambda: client.get(url), repeat)
+
+        with rolled_back():
+            timed_calls(
+                out, "ingest single POST",
+                lambda: client.post("/api/sensor-data/", fake_reading(sensor), format="json"), repeat, 1,
+            )
+            timed_calls(
+                out, f"ingest bulk POST ({batch_size})",
+                lambda: client.post(
+                    "/api/sensor-data/bulk/", [fake_reading(sensor) for _ in range(batch_size)], format="json"
+                ),
+                repeat, batch_size,
+            )
+
+
+# (label, sync URL, async URL) compared under concurrent load; filled in as
+# for ENDPOINT_CASES.
+ASGI_CASES = [
+    ("plant summary (week)", "/api/plants/summary/?date_filter=week", "/api/async/dashboard/?date_filter=week"),
+    (
+        "metrics production (plant, day)",
+        "/api/sensor-data/metrics/?metric=production&plant={plant}&start_date={day}&end_date={day}",
+        "/api/async/sensor-data/metrics/?metric=production&plant={plant}&start_date={day}&end_date={day}",
+    ),
+    (
+        "metrics quality (day)",
+        "/api/sensor-data/metrics/?metric=quality&resolution=day&date_filter=month",
+        "/api/async/sensor-data/metrics/?metric=quality&resolution=day&date_filter=month",
+    ),
+    ("energy daily", "/api/energy/metrics/?metric=daily&date_filter=month",
+     "/api/async/energy/metrics/?metric=daily&date_filter=month"),
+]
+
+
+async def asgi_request(call):
+    """One request as the ASGI handler runs it: its own database thread, closed afterwards."""
+    async with ThreadSensitiveContext():
+        response = await call()
+        await sync_to_async(connections.close_all)()
+    return response
+
+
+async def under_load(call, concurrency, repeat):
+    """``concurrency`` clients each make ``repeat`` calls; returns (latencies, wall time)."""
+    latencies = []
+
+    async def client():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = await asgi_request(call)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code < 300, (response.status_code, response.content[:200])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+async def alongside(call, background, concurrency, repeat):
+    """Latencies of ``call`` while ``concurrency`` other clients keep making ``background`` calls."""
+    running = True
+
+    async def busy():
+        while running:
+            await asgi_request(background)
+
+    tasks = [asyncio.create_task(busy()) for _ in range(concurrency)]
+    try:
+        return await under_load(call, 1, repeat)
+    finally:
+        running = False
+        await asyncio.gather(*tasks)
+
+
+def bench_asgi(out, rows=2000, batch_size=500, repeat=20, user=None, concurrency=8, **options):
+    """
+    Sync DRF views vs core.async_views through the ASGI handler on seeded data:
+    latency and throughput with ``concurrency`` clients, then bulk ingest
+    latency while that many clients load the dashboard.
+    """
+    user = seeded_user(user)
+    sensor = Sensor.objects.filter(plant__user=user, sensor_data__isnull=False).first()
+    if sensor is None:
+        raise CommandError(f"{user.email} has no sensor data; run `manage.py seed_data --user {user.email}`.")
+    day = (timezone.localdate() - timedelta(days=1)).isoformat()
+    headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+    client = AsyncClient()
+    out.write(f"{user.email}: {concurrency} concurrent clients, {repeat} calls each")
+
+    def report_load(label, latencies, elapsed):
+        out.write(
+            f"{label:<40} p50 {percentile(latencies, 50) * 1000:8.1f} ms  "
+            f"p95 {percentile(latencies, 95) * 1000:8.1f} ms  {len(latencies) / elapsed:8.1f} req/s"
+        )
+
+    caches = {**settings.CACHES, "metrics": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+    with override_settings(CACHES=caches):
+        for label, sync_url, async_url in ASGI_CASES:
+            for kind, url in (("sync", sync_url), ("async", async_url)):
+                url = url.format(plant=sensor.plant_id, day=day)
+                call = partial(client.get, url, headers=headers)
+                asyncio.run(under_load(call, 1, 1))  # warm up
+                report_load(f"{label} [{kind}]", *asyncio.run(under_load(call, concurrency, repeat)))
+
+        payload = [fake_reading(sensor) for _ in range(batch_size)]
+        started = timezone.now()
+        try:
+            for kind, ingest_url, dashboard_url in (
+                ("sync", "/api/sensor-data/bulk/", "/api/plants/summary/?date_filter=week"),
+                ("async", "/api/async/sensor-data/bulk/", "/api/async/dashboard/?date_filter=week"),
+            ):
+                ingest = partial(client.post, ingest_url, payload, content_type="application/json", headers=headers)
+                dashboard = partial(client.get, dashboard_url, headers=headers)
+                report_load(
+                    f"bulk ingest ({batch_size}) under load [{kind}]",
+                    *asyncio.run(alongside(ingest, dashboard, concurrency, repeat)),
+                )
+        finally:
+            with transaction.atomic():
+                written = SensorData.objects.filter(sensor=sensor, created_at__gte=started)
+                retract_readings(list(written))
+                written.delete()
+            metrics_cache.invalidate(user, plants=[sensor.plant_id], sensors=[sensor.id])
+
+
+def server_timings(response):
+    """Durations (ms) from a response's Server-Timing header, by name."""
+    timings = {}
+    for entry in response["Server-Timing"].split(", "):
+        name, _, rest = entry.partition(";")
+        timings[name] = float(rest.rpartition("dur=")[2])
+    return timings
+
+
+def bench_formats(out, rows=2000, repeat=20, **options):
+    """
+    Bytes on the wire and server CPU for the production metrics series in each
+    encoding, shape and compression, normalized to 100k points. Pass
+    --rows 100000 for a full-size series.
+    """
+    encodings = ["json"] + (["msgpack"] if renderers.msgpack is not None else [])
+    compressions = ["identity", "gzip"] + (["br"] if middleware.brotli is not None else [])
+    with rolled_back():
+        user, plant, sensors, items = make_fixtures()
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_NOISY_SENSOR_DATA, {
+                "owner": user.pk, "rows": rows, "step": 86000 / rows,
+                "sensor_ids": [s.id for s in sensors],
+            })
+        client = authenticated_client(user)
+        scale = 100000 / rows
+        out.write(f"{rows} points per response, median of {repeat} calls, scaled to 100k points")
+
+        # Measure every call in full, not the metrics cache
+        caches = {**settings.CACHES, "metrics": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+        baseline = None
+        with override_settings(CACHES=caches):
+            for encoding in encodings:
+                for shape in renderers.SHAPES:
+                    for compression in compressions:
+                        url = f"/api/sensor-data/metrics/?metric=production&format={encoding}&shape={shape}"
+                        call = partial(client.get, url, HTTP_ACCEPT_ENCODING=compression)
+                        call()
+                        cpu, encode = [], []
+                        for _ in range(repeat):
+                            start = time.process_time()
+                            response = call()
+                            cpu.append(time.process_time() - start)
+                            timings = server_timings(response)
+                            encode.append(timings["render"] + timings["compress"])
+                        assert response.status_code == 200, (url, response.status_code)
+                        size = len(response.content)
+                        # Today's format: JSON rows, uncompressed
+                        baseline = baseline or size
+                        out.write(
+                            f"{encoding:<8} {shape:<8} {compression:<9} {size * scale / 1024:>9.0f} KiB "
+                            f"({size / baseline:>5.1%})  {percentile(cpu, 50) * 1000 * scale:>8.1f} ms CPU  "
+                            f"{percentile(encode, 50) * scale:>8.1f} ms render+compress"
+                        )
+
+
+SCENARIOS = {
+    "anomalies": bench_anomalies,
+    "asgi": bench_asgi,
+    "auth": bench_auth,
+    "endpoints": bench_endpoints,
+    "formats": bench_formats,
+    "login": bench_login,
+    "ingest": bench_ingest,
+    "list": bench_list,
+}
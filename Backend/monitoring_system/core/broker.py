@@ -0,0 +1,86 @@
+import asyncio
+import functools
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+# -------------------------
+# Pub/sub for live updates
+# -------------------------
+# Writers publish to channels such as "plant:3" and "sensor:12" and every
+# subscriber of those channels gets the message once. The default broker fans
+# out inside the process, which is enough when one ASGI server process serves
+# both the writes and the streams. Set REALTIME_BROKER to a class with the same
+# publish()/subscribe() interface (e.g. backed by Redis pub/sub) to fan out
+# across processes or hosts.
+DEFAULT_QUEUE_SIZE = 1000
+
+
+class Subscription:
+    def __init__(self, broker, channels, max_queue):
+        self.broker = broker
+        self.channels = set(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def deliver(self, message):
+        # Runs on the subscriber's event loop. A client that can't keep up
+        # loses its oldest messages rather than growing without bound.
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+
+    def subscribe(self, channels, max_queue=None):
+        """Call from the event loop that will read the messages."""
+        if max_queue is None:
+            max_queue = getattr(settings, "REALTIME_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)
+        subscription = Subscription(self, channels, max_queue)
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                subscribers = self.subscriptions.get(channel)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscriptions[channel]
+
+    def publish(self, channels, message):
+        """
+        Deliver ``message`` once to every subscriber of any of ``channels``.
+        Thread-safe; may be called from sync request threads.
+        """
+        with self.lock:
+            subscribers = set().union(*(self.subscriptions.get(c, ()) for c in channels))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(subscription)
+
+
+@functools.lru_cache(maxsize=None)
+def get_broker():
+    return import_string(getattr(settings, "REALTIME_BROKER", "core.broker.InProcessBroker"))()
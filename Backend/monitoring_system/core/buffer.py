@@ -0,0 +1,262 @@
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core import serializers
+from django.db import InterfaceError, OperationalError, close_old_connections, connection, transaction
+
+from . import metrics_cache
+from .models import EnergyConsumption, SensorData
+from .realtime import publish_energy, publish_sensor_data
+from .rollups import record_readings
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------
+# Write-behind ingestion buffer
+# -------------------------
+# With INGEST_BUFFERED on, POST /sensor-data/ and /energy/ validate the
+# reading, queue it here and answer 202 straight away. A background thread
+# writes the queue out with bulk_create every INGEST_BUFFER_BATCH_SIZE
+# readings or INGEST_BUFFER_FLUSH_INTERVAL seconds, whichever comes first.
+# A full buffer rejects new readings (the view answers 503 + Retry-After)
+# instead of growing. Whatever is still queued when the process exits is
+# written out by an atexit hook; a hard kill loses it.
+#
+# A batch mixes readings from many requests, so one the database rejects (a
+# sensor deleted since it was queued, a value out of range) must not take the
+# others with it: the batch is written again in halves down to single rows,
+# and only the rows that still fail are dropped. They are logged as a
+# loaddata fixture so they can be fixed up and written later. Connection
+# errors are retried for the whole batch instead.
+DEFAULT_SIZE = 10000
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL = 1.0
+FLUSH_ATTEMPTS = 3
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+
+class BufferFull(Exception):
+    pass
+
+
+class IngestBuffer:
+    def __init__(self, name, write, max_size=None, batch_size=None, flush_interval=None):
+        self.name = name
+        self.write = write
+        self.max_size = max_size or getattr(settings, "INGEST_BUFFER_SIZE", DEFAULT_SIZE)
+        self.batch_size = batch_size or getattr(settings, "INGEST_BUFFER_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+        self.flush_interval = flush_interval or getattr(
+            settings, "INGEST_BUFFER_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL
+        )
+
+        self.entries = deque()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopping = False
+        self.flush_lock = threading.Lock()
+
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        self.last_flush_seconds = None
+
+    def submit(self, entries):
+        """Queue ``entries`` (all or none); raises BufferFull when there's no room."""
+        with self.condition:
+            if len(self.entries) + len(entries) > self.max_size:
+                self.rejected += len(entries)
+                raise BufferFull(self.name)
+            now = time.monotonic()
+            self.entries.extend((now, entry) for entry in entries)
+            self.accepted += len(entries)
+            if len(self.entries) >= self.batch_size:
+                self.condition.notify()
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        # Started lazily so management commands and migrations don't spawn it
+        if self.thread is None:
+            with self.condition:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name=f"ingest-{self.name}", daemon=True)
+                    self.thread.start()
+                    atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self.stopping or len(self.entries) >= self.batch_size,
+                    timeout=self.flush_interval,
+                )
+                if self.stopping:
+                    break
+            self.flush_once()
+        connection.close()
+
+    def _take(self):
+        with self.condition:
+            count = min(len(self.entries), self.batch_size)
+            return [self.entries.popleft()[1] for _ in range(count)]
+
+    def flush_once(self):
+        """Write up to one batch; returns the number of entries taken from the queue."""
+        with self.flush_lock:
+            batch = self._take()
+            if not batch:
+                return 0
+            close_old_connections()
+            started = time.monotonic()
+            for attempt in range(1, FLUSH_ATTEMPTS + 1):
+                try:
+                    self.write(batch)
+                    failed = []
+                    break
+                except TRANSIENT_ERRORS:
+                    logger.exception("Flushing %d %s readings failed (attempt %d)", len(batch), self.name, attempt)
+                    close_old_connections()
+                    failed = batch
+                    if attempt < FLUSH_ATTEMPTS:
+                        time.sleep(0.5 * attempt)
+                except Exception:
+                    logger.exception("Flushing %d %s readings failed; writing them in smaller batches",
+                                     len(batch), self.name)
+                    close_old_connections()
+                    failed = self._write_split(batch)
+                    break
+            if failed:
+                self.failed += len(failed)
+                logger.error("Dropped %d %s readings; as a loaddata fixture: %s",
+                             len(failed), self.name, fixture(failed))
+            elapsed = time.monotonic() - started
+            self.written += len(batch) - len(failed)
+            self.flushes += 1
+            self.flush_seconds_total += elapsed
+            self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+            self.last_flush_seconds = elapsed
+            return len(batch)
+
+    def _write_split(self, batch):
+        """Write ``batch`` in halves, down to single rows; returns the entries that still fail."""
+        failed = []
+        middle = len(batch) // 2
+        for part in (batch[:middle], batch[middle:]):
+            if not part:
+                continue
+            try:
+                self.write(part)
+            except Exception:
+                close_old_connections()
+                failed += part if len(part) == 1 else self._write_split(part)
+        return failed
+
+    def flush(self):
+        """Write out everything queued so far."""
+        while self.flush_once():
+            pass
+
+    def stop(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=30)
+        self.flush()
+
+    def retry_after(self):
+        # Roughly how long until a flush makes room
+        return max(1, round(self.flush_interval))
+
+    def stats(self):
+        with self.condition:
+            depth = len(self.entries)
+            oldest = self.entries[0][0] if self.entries else None
+        return {
+            "depth": depth,
+            "capacity": self.max_size,
+            "oldest_age_seconds": round(time.monotonic() - oldest, 3) if oldest is not None else None,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "written": self.written,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "flush_seconds_last": self.last_flush_seconds,
+            "flush_seconds_avg": self.flush_seconds_total / self.flushes if self.flushes else None,
+            "flush_seconds_max": self.flush_seconds_max,
+        }
+
+
+def fixture(entries):
+    """The rows of (user, unsaved row) ``entries`` as JSON that loaddata accepts."""
+    rows = [row for _, row in entries]
+    for row in rows:
+        # Ids handed out to inserts that were rolled back
+        row.pk = None
+    return serializers.serialize("json", rows)
+
+
+# -------------------------
+# Writers (same steps as the synchronous bulk endpoint)
+# -------------------------
+def _invalidate(entries, plant_and_sensor):
+    scopes = defaultdict(lambda: (set(), set()))
+    users = {}
+    for user, row in entries:
+        users[user.pk] = user
+        plants, sensors = scopes[user.pk]
+        plant_id, sensor_id = plant_and_sensor(row)
+        plants.add(plant_id)
+        sensors.add(sensor_id)
+    for pk, (plants, sensors) in scopes.items():
+        transaction.on_commit(lambda u=users[pk], p=plants, s=sensors: metrics_cache.invalidate(u, p, s))
+
+
+def write_sensor_data(entries):
+    """``entries`` are (user, unsaved SensorData) pairs."""
+    readings = [reading for _, reading in entries]
+    with transaction.atomic():
+        SensorData.objects.bulk_create(readings, batch_size=1000)
+        record_readings(readings)
+        _invalidate(entries, lambda r: (r.plant_id, r.sensor_id))
+        publish_sensor_data(readings)
+
+
+def write_energy(entries):
+    """``entries`` are (user, unsaved EnergyConsumption) pairs."""
+    rows = [row for _, row in entries]
+    with transaction.atomic():
+        EnergyConsumption.objects.bulk_create(rows, batch_size=1000)
+        _invalidate(entries, lambda r: (r.plant_id, r.sensor_id))
+        publish_energy(rows)
+
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+WRITERS = {
+    "sensor-data": write_sensor_data,
+    "energy": write_energy,
+}
+
+
+def get_buffer(name):
+    with _buffers_lock:
+        if name not in _buffers:
+            _buffers[name] = IngestBuffer(name, WRITERS[name])
+        return _buffers[name]
+
+
+def is_enabled():
+    return getattr(settings, "INGEST_BUFFERED", False)
+
+
+def stats():
+    return {name: get_buffer(name).stats() for name in WRITERS}
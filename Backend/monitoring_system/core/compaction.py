@@ -0,0 +1,183 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import NotSupportedError, connection, transaction
+from django.utils import timezone
+
+from . import metrics_cache
+from .models import EnergyConsumption, Sensor, SensorData
+
+
+# -------------------------
+# Compaction of old raw readings
+# -------------------------
+# Raw rows older than COMPACTION_AGE_DAYS are folded into one row per hour
+# (and sensor/item or sensor/plant) in the same table, flagged `compacted`.
+# Totals are preserved, so sums, daily energy metrics and the SensorData
+# rollups (which this doesn't touch) give the same answers on both sides of
+# the boundary. SensorData also keeps the number of raw readings behind each
+# row, so per-reading averages stay exact.
+#
+# Work is done one sensor and one window of at most ~batch_size raw rows at a
+# time, each in its own short transaction, so only the rows being moved are
+# locked and an interrupted run simply continues where it stopped.
+DEFAULT_AGE_DAYS = 30
+DEFAULT_BATCH_SIZE = 5000
+
+COMPACTED_TABLES = {
+    "sensor-data": {
+        "model": SensorData,
+        "group": ["sensor_id", "item_id", "plant_id", "owner_id"],
+        # Readings without a weight get their own row, so the weighted
+        # average below also keeps the count of readings that had one.
+        "split": ["current_weight_kg IS NULL"],
+        "aggregates": {
+            "items_scanned": "sum(items_scanned)",
+            "items_processed": "sum(items_processed)",
+            "items_discarded": "sum(items_discarded)",
+            "processed_with_errors": "sum(processed_with_errors)",
+            "category_a": "sum(category_a)",
+            "category_b": "sum(category_b)",
+            "category_c": "sum(category_c)",
+            "category_d": "sum(category_d)",
+            "current_weight_kg": (
+                "round(sum(current_weight_kg * readings) / "
+                "nullif(sum(readings) FILTER (WHERE current_weight_kg IS NOT NULL), 0), 2)"
+            ),
+            "readings": "sum(readings)",
+        },
+    },
+    "energy": {
+        "model": EnergyConsumption,
+        "group": ["sensor_id", "plant_id"],
+        "aggregates": {
+            "energy_kwh": "sum(energy_kwh)",
+            "cost": "sum(cost)",
+        },
+    },
+}
+
+
+def hour_start(value):
+    # Hours in the project time zone, so compacted rows never straddle a local day
+    return timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+
+
+def _compact_sql(table, spec):
+    group = ", ".join(spec["group"])
+    columns = ", ".join(spec["aggregates"])
+    aggregates = ", ".join(spec["aggregates"].values())
+    # The hour is the select-list column right after the group columns
+    hour = str(len(spec["group"]) + 1)
+    grouping = ", ".join([*spec["group"], hour, *spec.get("split", [])])
+    return f"""
+        WITH raw AS (
+            DELETE FROM {table}
+            WHERE sensor_id = %(sensor)s AND NOT compacted
+              AND "timestamp" >= %(start)s AND "timestamp" < %(end)s
+            RETURNING *
+        ), hourly AS (
+            INSERT INTO {table} ({group}, "timestamp", {columns}, compacted, created_at, updated_at)
+            SELECT {group}, date_trunc('hour', "timestamp" AT TIME ZONE %(tz)s) AT TIME ZONE %(tz)s,
+                   {aggregates}, true, now(), now()
+            FROM raw
+            GROUP BY {grouping}
+            RETURNING 1
+        )
+        SELECT (SELECT count(*) FROM raw), (SELECT count(*) FROM hourly)
+    """
+
+
+def _next_window(cursor, table, sensor_id, cutoff, batch_size):
+    """[start, end) hour-aligned window holding the sensor's next ~batch_size raw rows."""
+    cursor.execute(
+        f'SELECT min("timestamp") FROM {table} '
+        f'WHERE sensor_id = %s AND NOT compacted AND "timestamp" < %s',
+        [sensor_id, cutoff],
+    )
+    first = cursor.fetchone()[0]
+    if first is None:
+        return None
+
+    start = hour_start(first)
+    cursor.execute(
+        f'SELECT "timestamp" FROM {table} '
+        f'WHERE sensor_id = %s AND NOT compacted AND "timestamp" >= %s AND "timestamp" < %s '
+        f'ORDER BY "timestamp" OFFSET %s LIMIT 1',
+        [sensor_id, start, cutoff, batch_size],
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return start, cutoff
+    # Hours are never split; one busier than batch_size is compacted on its own
+    return start, max(hour_start(row[0]), start + timedelta(hours=1))
+
+
+def _average_row_bytes(cursor, table):
+    cursor.execute(
+        """
+        SELECT sum(pg_total_relation_size(tree.relid)), sum(greatest(c.reltuples, 0))
+        FROM pg_partition_tree(%s) tree JOIN pg_class c ON c.oid = tree.relid
+        WHERE tree.isleaf
+        """,
+        [table],
+    )
+    size, tuples = cursor.fetchone()
+    if not tuples:
+        # Never analyzed; fall back to the width of a sample of rows
+        cursor.execute(f"SELECT avg(pg_column_size(t.*)) FROM (SELECT * FROM {table} LIMIT 1000) t")
+        return int(cursor.fetchone()[0] or 0)
+    return int(float(size) / tuples)
+
+
+def compact_table(name, cutoff, batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """Compact one table's rows older than ``cutoff``. Returns a report dict."""
+    spec = COMPACTED_TABLES[name]
+    table = spec["model"]._meta.db_table
+    sql = _compact_sql(table, spec)
+    tz = timezone.get_current_timezone_name()
+    report = {"table": name, "raw_rows": 0, "compacted_rows": 0, "batches": 0}
+
+    with connection.cursor() as cursor:
+        row_bytes = _average_row_bytes(cursor, table)
+
+    sensors = Sensor.objects.select_related("plant__user").order_by("id")
+    for sensor in sensors.iterator():
+        touched = False
+        while max_batches is None or report["batches"] < max_batches:
+            with transaction.atomic(), connection.cursor() as cursor:
+                window = _next_window(cursor, table, sensor.id, cutoff, batch_size)
+                if window is None:
+                    break
+                cursor.execute(sql, {"sensor": sensor.id, "start": window[0], "end": window[1], "tz": tz})
+                raw, hourly = cursor.fetchone()
+            report["raw_rows"] += raw
+            report["compacted_rows"] += hourly
+            report["batches"] += 1
+            touched = True
+        if touched:
+            metrics_cache.invalidate(sensor.plant.user, plants=[sensor.plant_id], sensors=[sensor.id])
+
+    # Space is reusable once vacuum has processed the deleted rows
+    report["bytes_reclaimed"] = (report["raw_rows"] - report["compacted_rows"]) * row_bytes
+    return report
+
+
+def compact(older_than_days=None, batch_size=None, max_batches=None, tables=None):
+    """
+    Entry point for cron/schedulers: compact every table (or ``tables``) and
+    return one report dict per table. ``max_batches`` bounds a single run;
+    the next run picks up the remaining rows.
+    """
+    if connection.vendor != "postgresql":
+        raise NotSupportedError("Compaction is only supported on PostgreSQL.")
+    if older_than_days is None:
+        older_than_days = getattr(settings, "COMPACTION_AGE_DAYS", DEFAULT_AGE_DAYS)
+    if batch_size is None:
+        batch_size = getattr(settings, "COMPACTION_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+
+    cutoff = hour_start(timezone.now() - timedelta(days=older_than_days))
+    return [
+        compact_table(name, cutoff, batch_size, max_batches)
+        for name in (tables or COMPACTED_TABLES)
+    ]
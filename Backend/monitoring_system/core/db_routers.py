@@ -0,0 +1,96 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+# -------------------------
+# Read replica routing
+# -------------------------
+# Reads go to the primary ("default") unless the current request has opted
+# in: core.middleware.ReplicaRoutingMiddleware opens a RoutingState for each
+# request, and ReplicaReadMixin marks it for read-only actions (list,
+# retrieve, metrics, exports, ...). Writes always go to the primary.
+#
+# Requests stay on the primary when they send "X-Read-Primary: 1", and for
+# REPLICA_STICKY_SECONDS after the same user's last successful write, so a
+# client reading back what it just wrote doesn't see replication lag.
+# Without a REPLICA_DATABASE entry in DATABASES everything uses the primary.
+DEFAULT_REPLICA = "replica"
+DEFAULT_STICKY_SECONDS = 5
+PRIMARY_HEADER = "X-Read-Primary"
+CACHE_ALIAS = "auth"
+
+_state = ContextVar("db_routing", default=None)
+
+
+class RoutingState:
+    def __init__(self):
+        self.replica = False
+
+
+def replica_alias():
+    """The configured replica alias, or None when there isn't one."""
+    alias = getattr(settings, "REPLICA_DATABASE", DEFAULT_REPLICA)
+    return alias if alias in settings.DATABASES else None
+
+
+def start_request():
+    return _state.set(RoutingState())
+
+
+def end_request(token):
+    _state.reset(token)
+
+
+def read_from_replica():
+    """Send the rest of the current request's reads to the replica, if any."""
+    state = _state.get()
+    if state is not None:
+        state.replica = True
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block, whatever the request chose."""
+    token = _state.set(None)
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+# -------------------------
+# Read-after-write stickiness
+# -------------------------
+def _sticky_key(user_id):
+    return f"db:primary:{user_id}"
+
+
+def stick_to_primary(user):
+    """Pin ``user``'s reads to the primary for REPLICA_STICKY_SECONDS."""
+    seconds = getattr(settings, "REPLICA_STICKY_SECONDS", DEFAULT_STICKY_SECONDS)
+    if seconds and replica_alias():
+        caches[CACHE_ALIAS].set(_sticky_key(user.pk), True, timeout=seconds)
+
+
+def is_pinned(request):
+    if request.headers.get(PRIMARY_HEADER, "").lower() in ("1", "true", "yes"):
+        return True
+    return bool(request.user.is_authenticated and caches[CACHE_ALIAS].get(_sticky_key(request.user.pk)))
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.replica:
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
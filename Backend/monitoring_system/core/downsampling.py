@@ -0,0 +1,158 @@
+import math
+
+from django.db.models import Case, DecimalField, F, FloatField, Func, Max, Min, Q, Sum, When, Window
+from django.db.models.functions import Cast, NullIf, Round, RowNumber
+
+
+# -------------------------
+# Downsampling for metrics charts
+# -------------------------
+DOWNSAMPLE_MODES = ("avg", "lttb")
+
+# Series used to pick the representative points in LTTB mode
+LTTB_SERIES = {
+    "production": lambda row: row["items_processed"],
+    "weight": lambda row: row["current_weight_kg"],
+    "quality": lambda row: row["category_a"] + row["category_b"] + row["category_c"] + row["category_d"],
+}
+
+# The same series per raw or compacted row, in SQL; counters are divided by
+# `readings` so hourly compacted rows compare with single readings.
+LTTB_SQL_SERIES = {
+    "production": lambda: Cast("items_processed", FloatField()) / F("readings"),
+    "weight": lambda: Cast("current_weight_kg", FloatField()),
+    "quality": lambda: Cast(
+        F("category_a") + F("category_b") + F("category_c") + F("category_d"), FloatField()
+    ) / F("readings"),
+}
+
+# LTTB runs over the first, last, lowest and highest row of this many SQL
+# buckets per requested point instead of over every reading in the window.
+LTTB_BUCKETS_PER_POINT = 4
+
+
+class EpochBucket(Func):
+    # Index of the fixed-width time bucket a timestamp falls into
+    template = "FLOOR(EXTRACT(EPOCH FROM %(expressions)s) / %(width)s)"
+    output_field = FloatField()
+
+
+def bucket_width(qs, filters, max_points):
+    """Bucket width in whole seconds so the window touches at most max_points buckets."""
+    start, end = filters["start"], filters["end"]
+    if not (start and end):
+        bounds = qs.aggregate(first=Min("timestamp"), last=Max("timestamp"))
+        start, end = start or bounds["first"], end or bounds["last"]
+    if not (start and end):
+        return None
+    # Buckets are aligned to the epoch, so the window can straddle one extra
+    return max(math.ceil((end - start).total_seconds() / (max_points - 1)), 1)
+
+
+def per_reading_avg(field):
+    # Compacted rows hold the totals of `readings` raw readings (and their
+    # average weight), so weight by it to get the same mean as the raw data.
+    if field == "current_weight_kg":
+        return Sum(F(field) * F("readings"), output_field=DecimalField()) / NullIf(
+            Sum(Case(When(current_weight_kg__isnull=False, then="readings"), default=0)), 0
+        )
+    return Cast(Sum(field), DecimalField(max_digits=20, decimal_places=4)) / Sum("readings")
+
+
+def average_buckets(qs, fields, filters, max_points):
+    """Average each field per time bucket in SQL; one output row per non-empty bucket."""
+    width = bucket_width(qs, filters, max_points)
+    if width is None:
+        return []
+    rows = qs.annotate(
+        bucket=EpochBucket("timestamp", width=width)
+    ).values("bucket").annotate(
+        first_ts=Min("timestamp"),
+        **{f"avg_{f}": Round(per_reading_avg(f), 2) for f in fields}
+    ).order_by("-bucket")
+    return [
+        {"timestamp": row["first_ts"], **{f: row[f"avg_{f}"] for f in fields}}
+        for row in rows
+    ]
+
+
+def lttb(rows, threshold, series):
+    """
+    Largest-Triangle-Three-Buckets: keep ``threshold`` of the time-ordered rows
+    that best preserve the visual shape of ``series(row)``. Returns the rows
+    themselves, so every field of a kept point is a real reading.
+    """
+    n = len(rows)
+    if threshold >= n or threshold < 3:
+        return rows
+
+    # Points without a value (e.g. no weight reading) are not drawn
+    rows = [row for row in rows if series(row) is not None]
+    n = len(rows)
+    if threshold >= n:
+        return rows
+
+    xs = [row["timestamp"].timestamp() for row in rows]
+    ys = [float(series(row)) for row in rows]
+
+    sampled = [rows[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        span = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / span
+        avg_y = sum(ys[avg_start:avg_end]) / span
+
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(rows[best])
+        a = best
+
+    sampled.append(rows[-1])
+    return sampled
+
+
+def bucket_extremes(qs, fields, metric_type, width):
+    """
+    The first, last, lowest and highest row of every time bucket, oldest
+    first, with the LTTB series as ``value``. Chooses the candidates in SQL so
+    only a few rows per bucket reach Python.
+    """
+    qs = qs.order_by().annotate(
+        value=LTTB_SQL_SERIES[metric_type](),
+        bucket=EpochBucket("timestamp", width=width),
+    ).filter(value__isnull=False)
+    ranks = {
+        "first_rank": F("timestamp").asc(),
+        "last_rank": F("timestamp").desc(),
+        "low_rank": F("value").asc(),
+        "high_rank": F("value").desc(),
+    }
+    qs = qs.annotate(**{
+        name: Window(RowNumber(), partition_by=F("bucket"), order_by=[order, F("id").asc()])
+        for name, order in ranks.items()
+    }).filter(Q(first_rank=1) | Q(last_rank=1) | Q(low_rank=1) | Q(high_rank=1))
+    return list(qs.values("timestamp", *fields, "readings", "compacted", "value").order_by("timestamp", "id"))
+
+
+def lttb_rows(qs, fields, metric_type, filters, max_points):
+    """LTTB over the bucket extremes of the readings, returned newest first like the raw endpoint."""
+    width = bucket_width(qs, filters, max_points * LTTB_BUCKETS_PER_POINT)
+    if width is None:
+        return []
+    rows = lttb(bucket_extremes(qs, fields, metric_type, width), max_points, lambda row: row["value"])
+    for row in rows:
+        del row["value"]
+    return rows[::-1]
+
+
+def downsample(qs, metric_type, fields, filters, max_points, mode):
+    if mode == "lttb":
+        return lttb_rows(qs, fields, metric_type, filters, max_points)
+    return average_buckets(qs.order_by(), fields, filters, max_points)
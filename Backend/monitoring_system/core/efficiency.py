@@ -0,0 +1,73 @@
+from django.db import connection
+from django.db.models import F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import SensorData
+
+
+# -------------------------
+# Energy per processed item
+# -------------------------
+# Both tables are bucketed to the same grain and grouped per plant and sensor
+# location in the database; the two grouped results are then joined there
+# too, so only one row per (bucket, plant, location) comes back. The grouped
+# querysets keep the usual ownership and window filters, and with them the
+# (plant, timestamp) index scans and partition pruning.
+GRAINS = ("hour", "day", "week", "month")
+
+
+def _grouped(qs, grain, **totals):
+    return qs.order_by().annotate(
+        bucket=Trunc("timestamp", grain), location=F("sensor__location_type")
+    ).values("bucket", "plant_id", "location").annotate(**totals)
+
+
+def efficiency_series(energy, user, filters, grain):
+    """
+    kWh per processed item per bucket, plant and sensor location. ``energy``
+    is the user's filtered EnergyConsumption queryset; ``filters`` the
+    normalized energy filters, applied to SensorData as well.
+    """
+    readings = SensorData.objects.filter(owner=user)
+    if filters["plant_id"]:
+        readings = readings.filter(plant_id=filters["plant_id"])
+    if filters["sensor_id"]:
+        readings = readings.filter(sensor_id=filters["sensor_id"])
+    if filters["start"]:
+        readings = readings.filter(timestamp__gte=filters["start"])
+    if filters["end"]:
+        readings = readings.filter(timestamp__lt=filters["end"])
+
+    energy_sql, energy_params = _grouped(
+        energy, grain, energy_kwh=Sum("energy_kwh")
+    ).query.sql_with_params()
+    readings_sql, readings_params = _grouped(
+        readings, grain, items_processed=Sum("items_processed")
+    ).query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT bucket, plant_id, location,
+                   coalesce(e.energy_kwh, 0), coalesce(r.items_processed, 0)
+            FROM ({energy_sql}) e
+            FULL JOIN ({readings_sql}) r USING (bucket, plant_id, location)
+            ORDER BY bucket, plant_id, location
+            """,
+            [*energy_params, *readings_params],
+        )
+        rows = cursor.fetchall()
+
+    return [
+        {
+            # Trunc gives local wall-clock times; raw rows skip its conversion
+            "timestamp": timezone.make_aware(bucket),
+            "plant": plant_id,
+            "location_type": location,
+            "energy_kwh": float(energy_kwh),
+            "items_processed": items_processed,
+            "kwh_per_item": round(float(energy_kwh) / items_processed, 6) if items_processed else None,
+        }
+        for bucket, plant_id, location, energy_kwh, items_processed in rows
+    ]
@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .models import Sensor, SensorData, EnergyConsumption
+
+
+# -------------------------
+# Query-param filters shared by the sensor-data and energy endpoints
+# -------------------------
+CATEGORY_FIELDS = {
+    "A": "category_a__gt",
+    "B": "category_b__gt",
+    "C": "category_c__gt",
+    "D": "category_d__gt"
+}
+
+
+def parse_date_safe(date_str):
+    dt = parse_datetime(date_str)
+    if not dt:
+        try:
+            dt = datetime.strptime(date_str, "%Y-%m-%d")
+        except ValueError:
+            return None
+    return timezone.make_aware(dt) if timezone.is_naive(dt) else dt
+
+
+def start_of_day(value, param):
+    if isinstance(value, str):
+        try:
+            value = parse_date(value)
+        except ValueError:
+            value = None
+        if value is None:
+            raise ValidationError({param: "Expected a date in YYYY-MM-DD format."})
+    return timezone.make_aware(datetime.combine(value, datetime.min.time()))
+
+
+def sensor_data_filters(params):
+    """Normalize sensor-data query params into plain filter values."""
+    sensor_id = params.get("sensor") or params.get("sensor_id")
+    plant_id = params.get("plant") or params.get("plant_id")
+    item_id = params.get("item") or params.get("item_id")
+    start = params.get("start") or params.get("start_date")
+    end = params.get("end") or params.get("end_date")
+    date_filter = params.get("date_filter")  # today, week, month
+    categories = params.getlist("category")
+
+    # Safe parsing
+    if isinstance(start, str):
+        start = parse_date_safe(start)
+    if isinstance(end, str):
+        end = parse_date_safe(end)
+        if end:
+            # Extend end to end of day
+            end = end.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+    now = timezone.now()
+    if not start and date_filter == "today":
+        start = now.replace(hour=0, minute=0, second=0)
+    elif not start and date_filter == "week":
+        start = now - timedelta(days=7)
+    elif not start and date_filter == "month":
+        start = now - timedelta(days=30)
+
+    if start and timezone.is_naive(start):
+        start = timezone.make_aware(start)
+    if end and timezone.is_naive(end):
+        end = timezone.make_aware(end)
+
+    return {
+        "sensor_id": sensor_id,
+        "plant_id": plant_id,
+        "item_id": item_id,
+        "start": start,
+        "end": end,
+        "categories": [c for c in categories if c in CATEGORY_FIELDS],
+    }
+
+
+def filter_by_sensor_or_plant(qs, filters):
+    # For tables keyed by sensor only (the rollups); SensorData filters its
+    # own plant column in filter_sensor_data.
+    sensor_id, plant_id = filters["sensor_id"], filters["plant_id"]
+    if plant_id and not sensor_id:
+        # Filter on the plant's sensor ids rather than joining through
+        # sensor__plant_id, so Postgres walks the (sensor, timestamp) index
+        # once per sensor instead of scanning the whole table.
+        qs = qs.filter(sensor__in=Sensor.objects.filter(plant_id=plant_id))
+    elif sensor_id:
+        qs = qs.filter(sensor_id=sensor_id)
+        if plant_id:
+            qs = qs.filter(sensor__plant_id=plant_id)
+    return qs
+
+
+def filter_sensor_data(qs, filters):
+    # SensorData carries its own plant column; no join or subquery needed
+    if filters["plant_id"]:
+        qs = qs.filter(plant_id=filters["plant_id"])
+    if filters["sensor_id"]:
+        qs = qs.filter(sensor_id=filters["sensor_id"])
+
+    if filters["item_id"]:
+        qs = qs.filter(item_id=filters["item_id"])
+    if filters["start"]:
+        qs = qs.filter(timestamp__gte=filters["start"])
+    if filters["end"]:
+        qs = qs.filter(timestamp__lte=filters["end"])
+
+    filter_map = {CATEGORY_FIELDS[c]: 0 for c in filters["categories"]}
+    if filter_map:
+        qs = qs.filter(**filter_map)
+
+    return qs
+
+
+def sensor_data_queryset(user, params):
+    qs = SensorData.objects.filter(owner=user)
+    return filter_sensor_data(qs, sensor_data_filters(params)).order_by("-timestamp")
+
+
+def energy_filters(params):
+    """Normalize energy query params; dates become [start, end) datetimes."""
+    start_date = params.get("start_date")  # Changed to match frontend
+    end_date = params.get("end_date")      # Changed to match frontend
+    date_filter = params.get("date_filter")
+
+    now = timezone.now()
+    if date_filter == "today":
+        start_date = now.replace(hour=0, minute=0, second=0, microsecond=0).date()
+        end_date = now.date()
+    elif date_filter == "week":
+        start_date = (now - timedelta(days=now.weekday())).date()  # Start of current week
+        end_date = now.date()
+    elif date_filter == "month":
+        start_date = now.replace(day=1).date()  # Start of current month
+        end_date = now.date()
+
+    # Day boundaries rather than __date lookups, so the
+    # (sensor|plant, timestamp) indexes stay usable.
+    return {
+        "sensor_id": params.get("sensor"),
+        "plant_id": params.get("plant"),
+        "start": start_of_day(start_date, "start_date") if start_date else None,
+        "end": start_of_day(end_date, "end_date") + timedelta(days=1) if end_date else None,
+    }
+
+
+def filter_energy(qs, filters):
+    if filters["sensor_id"]:
+        qs = qs.filter(sensor_id=filters["sensor_id"])
+    if filters["plant_id"]:
+        qs = qs.filter(plant_id=filters["plant_id"])
+    if filters["start"]:
+        qs = qs.filter(timestamp__gte=filters["start"])
+    if filters["end"]:
+        qs = qs.filter(timestamp__lt=filters["end"])
+    return qs
+
+
+def energy_queryset(user, params):
+    qs = EnergyConsumption.objects.filter(plant__user=user)
+    return filter_energy(qs, energy_filters(params)).order_by("-timestamp")
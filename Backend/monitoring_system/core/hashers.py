@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+# -------------------------
+# Password hashing cost
+# -------------------------
+# Same algorithm and hash format as Django's default PBKDF2 hasher, with the
+# iteration count taken from PASSWORD_HASH_ITERATIONS. Hashes made with a
+# different count still verify; Django re-encodes them with the current
+# count on the user's next successful login (must_update), so raising or
+# lowering the setting takes effect without a migration.
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return getattr(settings, "PASSWORD_HASH_ITERATIONS", PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,87 @@
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+
+from .models import EnergyConsumption, Item, Plant, Sensor, SensorData
+from .serializers import EnergyConsumptionBulkSerializer, SensorDataBulkSerializer
+
+
+# -------------------------
+# Bulk ingestion: validation and ownership
+# -------------------------
+# Shared by POST /sensor-data/bulk/ and the async ingest views, which only
+# differ in how they write. Every row is validated first, so ownership is
+# checked with one query per table for the distinct sensors/items/plants
+# instead of one per reading. Rows that fail either step are reported by
+# index; the rest are returned unsaved.
+DEFAULT_MAX_ROWS = 5000
+
+
+def max_rows():
+    return getattr(settings, "BULK_MAX_ROWS", DEFAULT_MAX_ROWS)
+
+
+def payload_error(rows):
+    """Why ``rows`` can't be taken as a bulk payload, or None."""
+    if not isinstance(rows, list):
+        return "Expected a list of readings"
+    if len(rows) > max_rows():
+        return f"At most {max_rows()} readings per request"
+    return None
+
+
+def validate_rows(serializer, rows):
+    """([(index, validated data)], [errors]) for ``rows``."""
+    valid, errors = [], []
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, serializer.run_validation(row)))
+        except ValidationError as e:
+            errors.append({"index": index, "errors": e.detail})
+    return valid, errors
+
+
+def sensor_data_readings(user, rows):
+    """Unsaved SensorData for the valid rows on ``user``'s sensors and items, and the errors."""
+    valid, errors = validate_rows(SensorDataBulkSerializer(), rows)
+    sensor_ids = {data["sensor"] for _, data in valid}
+    item_ids = {data["item"] for _, data in valid if data.get("item") is not None}
+    sensors = Sensor.objects.filter(plant__user=user).in_bulk(sensor_ids)
+    items = Item.objects.filter(plant__user=user).in_bulk(item_ids) if item_ids else {}
+
+    readings = []
+    for index, data in valid:
+        sensor = sensors.get(data.pop("sensor"))
+        item_id = data.pop("item", None)
+        if sensor is None:
+            errors.append({"index": index, "errors": {"sensor": ["Invalid sensor or not owned by you"]}})
+        elif item_id is not None and item_id not in items:
+            errors.append({"index": index, "errors": {"item": ["Invalid item or not owned by you"]}})
+        else:
+            readings.append(SensorData(
+                sensor=sensor, plant_id=sensor.plant_id, owner=user, item_id=item_id, **data
+            ))
+    return readings, errors
+
+
+def energy_rows(user, rows):
+    """Unsaved EnergyConsumption for the valid rows on ``user``'s sensors and plants, and the errors."""
+    valid, errors = validate_rows(EnergyConsumptionBulkSerializer(), rows)
+    sensors = Sensor.objects.filter(plant__user=user).in_bulk({data["sensor"] for _, data in valid})
+    plants = Plant.objects.filter(user=user).in_bulk({data["plant"] for _, data in valid})
+
+    energy = []
+    for index, data in valid:
+        sensor = sensors.get(data.pop("sensor"))
+        plant = plants.get(data.pop("plant"))
+        if sensor is None or plant is None:
+            errors.append({"index": index, "errors": {"error": ["Invalid sensor or plant for this user."]}})
+        else:
+            energy.append(EnergyConsumption(sensor=sensor, plant=plant, **data))
+    return energy, errors
+
+
+def bulk_result(created, errors):
+    """Response body and status: 201, or 207 when some rows were rejected."""
+    errors.sort(key=lambda e: e["index"])
+    body = {"created": created, "failed": len(errors), "errors": errors}
+    return body, 207 if errors else 201
@@ -0,0 +1,232 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+slow_query_logger = logging.getLogger("core.slow_queries")
+
+
+# -------------------------
+# Per-request performance instrumentation
+# -------------------------
+# core.middleware.InstrumentationMiddleware opens a RequestStats for every
+# request. Queries run while it is open (on any thread the request hands work
+# to) add to its count and DB time; auth, row serialization, rendering and
+# compression time themselves with timed(). The totals go into a Server-Timing header and into per-route
+# histograms that GET /metrics serves in the Prometheus text format.
+#
+# The histograms live in the process; with several worker processes,
+# scrape each worker (or run one per port) to get the full picture.
+DEFAULT_SLOW_QUERY_MS = 200
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    def __init__(self, route=""):
+        self.route = route
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.timings = defaultdict(float)
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Add the block's duration to the current request's ``name`` timing."""
+    stats = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.timings[name] += time.perf_counter() - start
+
+
+# -------------------------
+# Query recording
+# -------------------------
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        # Only requests are tracked; migrations and batch commands are expected to be slow
+        if stats is not None:
+            stats.queries += 1
+            stats.db += elapsed
+            if elapsed * 1000 >= getattr(settings, "SLOW_QUERY_MS", DEFAULT_SLOW_QUERY_MS):
+                slow_query_logger.warning(
+                    "Slow query (%.1f ms) in %s: %s", elapsed * 1000, stats.route or "-", sql[:2000],
+                )
+
+
+def instrument(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    instrument(connection)
+
+
+connection_created.connect(_on_connection_created)
+
+
+# -------------------------
+# Per-route aggregates
+# -------------------------
+class RouteHistogram:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.render_seconds = 0.0
+        self.auth_seconds = 0.0
+        self.response_bytes = 0
+
+    def observe(self, stats, seconds, size):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.queries += stats.queries
+        self.db_seconds += stats.db
+        self.serialize_seconds += stats.timings["serialize"]
+        self.render_seconds += stats.timings["render"]
+        self.auth_seconds += stats.timings["auth"]
+        self.response_bytes += size
+
+
+_routes = defaultdict(RouteHistogram)
+_routes_lock = threading.Lock()
+
+
+def observe(stats, method, status, size):
+    """Record a finished request; returns its total duration in seconds."""
+    seconds = time.perf_counter() - stats.started
+    with _routes_lock:
+        _routes[(stats.route or "unmatched", method, str(status))].observe(stats, seconds, size)
+    return seconds
+
+
+def server_timing(stats, total):
+    """Server-Timing header value: db, auth, serialize, render, compress and the remainder as app time (ms)."""
+    auth, serialize = stats.timings["auth"], stats.timings["serialize"]
+    render, compress = stats.timings["render"], stats.timings["compress"]
+    app = max(total - stats.db - auth - serialize - render - compress, 0)
+    return ", ".join([
+        f'db;desc="{stats.queries} queries";dur={stats.db * 1000:.1f}',
+        f"auth;dur={auth * 1000:.1f}",
+        f"serialize;dur={serialize * 1000:.1f}",
+        f"render;dur={render * 1000:.1f}",
+        f"compress;dur={compress * 1000:.1f}",
+        f"app;dur={app * 1000:.1f}",
+        f"total;dur={total * 1000:.1f}",
+    ])
+
+
+def reset():
+    with _routes_lock:
+        _routes.clear()
+
+
+# -------------------------
+# Prometheus text endpoint
+# -------------------------
+def _labels(**labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def render_prometheus():
+    from . import buffer, metrics_cache  # imported late; both pull in the models
+
+    with _routes_lock:
+        routes = {key: vars(histogram).copy() for key, histogram in _routes.items()}
+        for value in routes.values():
+            value["buckets"] = list(value["buckets"])
+
+    lines = [
+        "# HELP http_request_duration_seconds Request latency per route.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (route, method, status), h in sorted(routes.items()):
+        labels = _labels(route=route, method=method, status=status)
+        for bound, count in zip(LATENCY_BUCKETS, h["buckets"]):
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {h["count"]}')
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {h['seconds']:.6f}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {h['count']}")
+
+    counters = [
+        ("http_request_db_queries_total", "SQL queries run by requests.", "queries", "{}"),
+        ("http_request_db_seconds_total", "Time spent in SQL queries.", "db_seconds", "{:.6f}"),
+        ("http_request_auth_seconds_total", "Time spent authenticating.", "auth_seconds", "{:.6f}"),
+        ("http_request_serialize_seconds_total", "Time spent serializing rows.", "serialize_seconds", "{:.6f}"),
+        ("http_request_render_seconds_total", "Time spent rendering responses.", "render_seconds", "{:.6f}"),
+        ("http_response_bytes_total", "Response body bytes (streams excluded).", "response_bytes", "{}"),
+    ]
+    for name, help_text, field, fmt in counters:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (route, method, status), h in sorted(routes.items()):
+            labels = _labels(route=route, method=method, status=status)
+            lines.append(f"{name}{{{labels}}} {fmt.format(h[field])}")
+
+    lines += [
+        "# HELP metrics_cache_requests_total Metrics cache lookups.",
+        "# TYPE metrics_cache_requests_total counter",
+    ]
+    for name, counts in metrics_cache.stats().items():
+        for outcome in ("hits", "misses"):
+            lines.append(f"metrics_cache_requests_total{{{_labels(metric=name, outcome=outcome)}}} {counts[outcome]}")
+
+    if buffer.is_enabled():
+        lines += [
+            "# HELP ingest_buffer_depth Readings waiting in the write-behind buffer.",
+            "# TYPE ingest_buffer_depth gauge",
+        ]
+        buffers = buffer.stats()
+        for name, stats in buffers.items():
+            lines.append(f'ingest_buffer_depth{{buffer="{name}"}} {stats["depth"]}')
+        for field in ("accepted", "rejected", "written", "failed"):
+            lines += [f"# TYPE ingest_buffer_{field}_total counter"]
+            for name, stats in buffers.items():
+                lines.append(f'ingest_buffer_{field}_total{{buffer="{name}"}} {stats[field]}')
+
+    return "\n".join(lines) + "\n"
+
+
+def prometheus(request):
+    """
+    GET /metrics. Open to the addresses in METRICS_ALLOWED_IPS, or to anyone
+    sending ``Authorization: Bearer <METRICS_AUTH_TOKEN>`` when that is set.
+    """
+    token = getattr(settings, "METRICS_AUTH_TOKEN", None)
+    allowed = request.META.get("REMOTE_ADDR") in getattr(settings, "METRICS_ALLOWED_IPS", ["127.0.0.1", "::1"])
+    if token and request.headers.get("Authorization") == f"Bearer {token}":
+        allowed = True
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_test_environment
+
+from core.benchmarks import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = "Run an API performance benchmark. Writes are rolled back afterwards."
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=sorted(SCENARIOS))
+        parser.add_argument("--rows", type=int, default=2000)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--repeat", type=int, default=20,
+                            help="Calls per endpoint (per client in the asgi scenario).")
+        parser.add_argument("--user", help="Email of the seeded user for the endpoints and asgi scenarios "
+                                           "(default: the latest seed_data user).")
+        parser.add_argument("--concurrency", type=int, default=8,
+                            help="Concurrent clients in the asgi scenario.")
+
+    def handle(self, *args, **options):
+        # Allows the in-process test client's "testserver" host.
+        setup_test_environment()
+        SCENARIOS[options["scenario"]](
+            self.stdout,
+            rows=options["rows"],
+            batch_size=options["batch_size"],
+            repeat=options["repeat"],
+            user=options["user"],
+            concurrency=options["concurrency"],
+        )
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.benchmarks import rolled_back
+from core.query_plans import check_plans
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed sensor-data/energy tables inside a rolled-back transaction, EXPLAIN the "
+        "list queries and fail if any of them falls back to a sequential scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200000,
+                            help="Rows to seed per table (spread over several plants).")
+        parser.add_argument("--verbose-plans", action="store_true")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Query plan checks need PostgreSQL.")
+
+        with rolled_back():
+            checks = check_plans(options["rows"])
+
+        failures = []
+        for check in checks:
+            self.stdout.write(f"{'SEQ ' if check.seq_scan else 'ok  '} {check.label}")
+            if options["verbose_plans"] or check.seq_scan:
+                self.stdout.write(check.plan)
+            if check.seq_scan:
+                failures.append(check.label)
+
+        if failures:
+            raise CommandError(f"{len(failures)} queries fell back to a sequential scan.")
+        self.stdout.write(self.style.SUCCESS("All list queries use an index."))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError, connection
+
+from core.compaction import COMPACTED_TABLES, compact
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold raw SensorData/EnergyConsumption rows older than COMPACTION_AGE_DAYS "
+        "into hourly rows. Safe to interrupt and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=int,
+                            help="Compact rows older than this many days (default: COMPACTION_AGE_DAYS).")
+        parser.add_argument("--batch-size", type=int,
+                            help="Raw rows per transaction (default: COMPACTION_BATCH_SIZE).")
+        parser.add_argument("--max-batches", type=int,
+                            help="Stop after this many batches per table; the next run continues.")
+        parser.add_argument("--table", choices=sorted(COMPACTED_TABLES), action="append", dest="tables",
+                            help="Only compact this table (repeatable).")
+        parser.add_argument("--vacuum", action="store_true",
+                            help="VACUUM the compacted tables afterwards so the space is reused right away.")
+
+    def handle(self, *args, **options):
+        if options["older_than_days"] is not None and options["older_than_days"] < 1:
+            raise CommandError("--older-than-days must be at least 1.")
+        try:
+            reports = compact(
+                older_than_days=options["older_than_days"],
+                batch_size=options["batch_size"],
+                max_batches=options["max_batches"],
+                tables=options["tables"],
+            )
+        except NotSupportedError as e:
+            raise CommandError(str(e))
+
+        for report in reports:
+            self.stdout.write(
+                f"{report['table']}: {report['raw_rows']} raw rows -> {report['compacted_rows']} hourly rows "
+                f"in {report['batches']} batches, ~{report['bytes_reclaimed'] / 1024 / 1024:.1f} MiB reclaimed"
+            )
+            if options["vacuum"] and report["raw_rows"]:
+                table = COMPACTED_TABLES[report["table"]]["model"]._meta.db_table
+                with connection.cursor() as cursor:
+                    cursor.execute(f"VACUUM (ANALYZE) {table}")
+        self.stdout.write(self.style.SUCCESS("Compaction finished."))
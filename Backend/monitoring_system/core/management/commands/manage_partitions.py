@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.partitions import (
+    PARTITIONED_TABLES, drop_expired, ensure_partitions, expired_partitions,
+    is_partitioned, missing_months, partition_name,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create monthly SensorData/EnergyConsumption partitions ahead of time and "
+        "detach or drop expired ones. Meant to run daily from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead", type=int, default=3,
+                            help="Months of partitions to keep created ahead of the current one (default 3).")
+        parser.add_argument("--retain-months", type=int,
+                            help="Remove partitions entirely older than this many months. Nothing is removed if omitted.")
+        parser.add_argument("--detach-only", action="store_true",
+                            help="Detach expired partitions instead of dropping them (e.g. to archive them first).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only print what would be created or removed.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Partitioning is only supported on PostgreSQL.")
+        if options["retain_months"] is not None and options["retain_months"] < 1:
+            raise CommandError("--retain-months must be at least 1.")
+
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(table):
+                raise CommandError(f"{table} is not partitioned; run migrate first.")
+            if options["dry_run"]:
+                self.dry_run(table, options)
+                continue
+
+            for name in ensure_partitions(table, options["ahead"]):
+                self.stdout.write(f"Created {name}")
+            if options["retain_months"] is not None:
+                removed = drop_expired(
+                    table, options["retain_months"], detach_only=options["detach_only"]
+                )
+                verb = "Detached" if options["detach_only"] else "Dropped"
+                for name in removed:
+                    self.stdout.write(f"{verb} {name}")
+        self.stdout.write(self.style.SUCCESS("Partitions are up to date."))
+
+    def dry_run(self, table, options):
+        for month in missing_months(table, options["ahead"]):
+            self.stdout.write(f"Would create {partition_name(table, month)}")
+        if options["retain_months"] is not None:
+            for name in expired_partitions(table, options["retain_months"]):
+                self.stdout.write(f"Would remove {name}")
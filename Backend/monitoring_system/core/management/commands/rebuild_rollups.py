@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the minute/hour/day SensorData rollups from raw readings (backfill)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sensor", type=int, action="append", dest="sensors",
+                            help="Only rebuild this sensor (repeatable). Defaults to all sensors.")
+
+    def handle(self, *args, **options):
+        created = rebuild_rollups(sensor_ids=options["sensors"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {created} rollup rows."))
@@ -0,0 +1,164 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core import metrics_cache
+from core.models import CustomUser, Item, Plant, Sensor
+from core.partitions import PARTITIONED_TABLES, ensure_range, is_partitioned
+from core.rollups import rebuild_rollups
+
+
+# Readings are generated by PostgreSQL itself (generate_series), one plant per
+# statement, so millions of rows never pass through Python. Production follows
+# a day/night cycle with noise; weight is only reported by weighing sensors;
+# energy costs more in the evening peak.
+LOAD = "greatest(0, 0.55 + 0.35 * sin(2 * pi() * (extract(hour FROM ts) - 6) / 24) + 0.1 * random())"
+
+SEED_SENSOR_DATA = f"""
+    WITH plant_items AS (
+        SELECT array_agg(id ORDER BY id) AS ids FROM core_item WHERE plant_id = %(plant)s
+    ), readings AS (
+        SELECT s.id AS sensor_id, s.location_type, ts, {LOAD} AS load, row_number() OVER () AS n
+        FROM core_sensor s
+        CROSS JOIN generate_series(%(start)s::timestamptz, %(end)s::timestamptz, %(interval)s::interval) AS ts
+        WHERE s.plant_id = %(plant)s
+    ), counts AS (
+        SELECT *, round(120 * load)::int AS scanned, 0.85 + 0.1 * random() AS yield FROM readings
+    )
+    INSERT INTO core_sensordata (
+        sensor_id, plant_id, owner_id, item_id, timestamp, items_scanned, items_processed,
+        items_discarded, processed_with_errors, current_weight_kg, category_a, category_b,
+        category_c, category_d, readings, compacted, created_at, updated_at
+    )
+    SELECT sensor_id, %(plant)s, %(owner)s,
+           CASE WHEN n %% 4 <> 0 AND cardinality(i.ids) > 0 THEN i.ids[1 + n %% cardinality(i.ids)] END,
+           ts, scanned, round(scanned * yield), round(scanned * (0.02 + 0.04 * random())),
+           round(scanned * yield * 0.03 * random()),
+           CASE WHEN location_type IN ('weighing_machine', 'output_weighing')
+                THEN round((200 + 100 * load + 10 * random())::numeric, 2) END,
+           round(scanned * yield * (0.35 + 0.1 * random())), round(scanned * yield * 0.3),
+           round(scanned * yield * (0.15 + 0.05 * random())), round(scanned * yield * 0.1),
+           1, false, now(), now()
+    FROM counts CROSS JOIN plant_items i
+"""
+
+SEED_ENERGY = f"""
+    WITH readings AS (
+        SELECT s.id AS sensor_id, ts, {LOAD} AS load
+        FROM core_sensor s
+        CROSS JOIN generate_series(%(start)s::timestamptz, %(end)s::timestamptz, %(interval)s::interval) AS ts
+        WHERE s.plant_id = %(plant)s
+    ), usage AS (
+        SELECT *, round((0.5 + 2 * load + 0.2 * random())::numeric, 2) AS kwh FROM readings
+    )
+    INSERT INTO core_energyconsumption (
+        sensor_id, plant_id, timestamp, energy_kwh, cost, compacted, created_at, updated_at
+    )
+    SELECT sensor_id, %(plant)s, ts, kwh,
+           round(kwh * %(tariff)s * CASE WHEN extract(hour FROM ts) BETWEEN 18 AND 21 THEN 1.5 ELSE 1 END, 2),
+           false, now(), now()
+    FROM usage
+"""
+
+TARIFF = 8.0  # currency units per kWh off-peak
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed realistic plants, sensors, items and SensorData/EnergyConsumption history "
+        "for load testing (see `manage.py benchmark endpoints`). Not for production databases."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Email of the owner; a new seed user is created if omitted.")
+        parser.add_argument("--plants", type=int, default=5)
+        parser.add_argument("--sensors-per-plant", type=int, default=5)
+        parser.add_argument("--items-per-plant", type=int, default=4)
+        parser.add_argument("--days", type=int, default=30, help="Days of history, ending now (default 30).")
+        parser.add_argument("--interval", type=int, default=60,
+                            help="Seconds between readings of one sensor (default 60).")
+        parser.add_argument("--energy-interval", type=int, default=900,
+                            help="Seconds between energy readings of one sensor (default 900).")
+        parser.add_argument("--skip-rollups", action="store_true",
+                            help="Don't rebuild the SensorData rollups for the seeded sensors.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Seeding is only supported on PostgreSQL.")
+        for name in ("plants", "sensors_per_plant", "days", "interval", "energy_interval"):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1.")
+
+        user = self.get_user(options["user"])
+        end = timezone.now().replace(second=0, microsecond=0)
+        start = end - timedelta(days=options["days"])
+        for table in PARTITIONED_TABLES:
+            if is_partitioned(table):
+                for name in ensure_range(table, start, end):
+                    self.stdout.write(f"Created {name}")
+
+        plants = self.create_plants(user, options)
+        started = time.perf_counter()
+        totals = {"sensor-data": 0, "energy": 0}
+        for plant in plants:
+            with transaction.atomic(), connection.cursor() as cursor:
+                params = {"plant": plant.id, "owner": user.id, "start": start, "end": end}
+                cursor.execute(SEED_SENSOR_DATA, {**params, "interval": timedelta(seconds=options["interval"])})
+                totals["sensor-data"] += cursor.rowcount
+                cursor.execute(SEED_ENERGY, {
+                    **params, "interval": timedelta(seconds=options["energy_interval"]), "tariff": TARIFF,
+                })
+                totals["energy"] += cursor.rowcount
+            self.stdout.write(f"Seeded {plant.name}")
+        elapsed = time.perf_counter() - started
+        rows = sum(totals.values())
+        self.stdout.write(
+            f"{totals['sensor-data']} sensor-data and {totals['energy']} energy rows "
+            f"in {elapsed:.1f}s ({rows / elapsed:.0f} rows/sec)"
+        )
+
+        if not options["skip_rollups"]:
+            started = time.perf_counter()
+            created = rebuild_rollups(Sensor.objects.filter(plant__in=plants).values_list("id", flat=True))
+            self.stdout.write(f"Built {created} rollup rows in {time.perf_counter() - started:.1f}s")
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE core_sensordata, core_energyconsumption, core_sensordatarollup")
+        metrics_cache.invalidate(user, plants=[p.id for p in plants])
+        self.stdout.write(self.style.SUCCESS(f"Seeded data for {user.email}"))
+
+    def get_user(self, email):
+        if email:
+            try:
+                return CustomUser.objects.get(email=email)
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"No user with email {email}.")
+        tag = uuid.uuid4().hex[:8]
+        user = CustomUser.objects.create_user(
+            email=f"seed-{tag}@example.com", username=f"seed-{tag}", password=tag
+        )
+        self.stdout.write(f"Created user {user.email} with password {tag}")
+        return user
+
+    def create_plants(self, user, options):
+        tag = uuid.uuid4().hex[:6]
+        plants = Plant.objects.bulk_create([
+            Plant(name=f"Seed {tag} #{n}", location=f"Site {n}",
+                  plant_type=Plant.PLANT_TYPE_CHOICES[n % 2][0], user=user)
+            for n in range(options["plants"])
+        ])
+        locations = [choice for choice, _ in Sensor.LOCATION_CHOICES]
+        Sensor.objects.bulk_create([
+            Sensor(name=f"{plant.name} S{n}", plant=plant, location_type=locations[n % len(locations)],
+                   is_active=n % 10 != 9)
+            for plant in plants for n in range(options["sensors_per_plant"])
+        ])
+        Item.objects.bulk_create([
+            Item(plant=plant, name=f"Item {n}")
+            for plant in plants for n in range(options["items_per_plant"])
+        ])
+        return plants
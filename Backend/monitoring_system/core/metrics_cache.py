@@ -0,0 +1,173 @@
+import hashlib
+import math
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+
+# -------------------------
+# Cache for the metrics endpoints
+# -------------------------
+# Entries are keyed on the user, a version marker for the narrowest scope the
+# request filters on (sensor, plant or the whole user) and the normalized query
+# params. Writes bump the markers of every scope they touch, which orphans the
+# affected entries without having to find or delete them.
+CACHE_ALIAS = "metrics"
+DEFAULT_TTL = 60
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _version_key(scope, pk):
+    return f"metrics:version:{scope}:{pk}"
+
+
+def request_scope(params, user):
+    sensor_id = params.get("sensor") or params.get("sensor_id")
+    plant_id = params.get("plant") or params.get("plant_id")
+    if sensor_id:
+        return "sensor", sensor_id
+    if plant_id:
+        return "plant", plant_id
+    return "user", user.pk
+
+
+def scope_version(scope, pk):
+    """Current marker for a scope; a missing marker (never written, or evicted) starts a new one."""
+    cache = get_cache()
+    key = _version_key(scope, pk)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        # A cache that keeps nothing (DummyCache) gets a fresh marker every time
+        version = cache.get(key) or time.time_ns()
+    return version
+
+
+def invalidate(user, plants=(), sensors=()):
+    """Call after writing readings for ``sensors`` / ``plants`` owned by ``user``."""
+    version = time.time_ns()
+    keys = [_version_key("user", user.pk)]
+    keys += [_version_key("plant", pk) for pk in set(plants)]
+    keys += [_version_key("sensor", pk) for pk in set(sensors)]
+    get_cache().set_many({key: version for key in keys}, timeout=None)
+
+
+def _ttl(metric_type):
+    ttls = getattr(settings, "METRICS_CACHE_TTLS", {})
+    return ttls.get(metric_type, getattr(settings, "METRICS_CACHE_TTL", DEFAULT_TTL))
+
+
+# Hit/miss counters live in process memory, like the request histograms in
+# core.instrumentation: counting must not cost a cache write per request.
+_counts = Counter()
+_counts_lock = threading.Lock()
+
+
+def _count(outcome, name):
+    with _counts_lock:
+        _counts[outcome, name] += 1
+
+
+def _digest(params):
+    query = "&".join(
+        f"{k}={','.join(sorted(params.getlist(k)))}"
+        for k in sorted(params)
+    )
+    return hashlib.md5(query.encode()).hexdigest()
+
+
+def lookup(endpoint, user, params):
+    """
+    The cache key for a metrics request and its cached data (None on a
+    miss). Counts the hit or miss.
+    """
+    metric_type = params.get("metric", "")
+    scope, pk = request_scope(params, user)
+    key = (
+        f"metrics:{endpoint}:{user.pk}:{scope}:{pk}:"
+        f"{scope_version(scope, pk)}:{_digest(params)}"
+    )
+
+    data = get_cache().get(key)
+    _count("hits" if data is not None else "misses", f"{endpoint}:{metric_type}")
+    return key, data
+
+
+def store(key, data, metric_type):
+    get_cache().set(key, data, timeout=_ttl(metric_type))
+
+
+def cached_response(request, endpoint, compute):
+    """
+    Serve ``compute(request)`` from the cache. Only 200 responses are stored;
+    their data is materialized first so lazy querysets aren't pickled.
+    """
+    key, data = lookup(endpoint, request.user, request.query_params)
+    if data is not None:
+        return Response(data, status=status.HTTP_200_OK)
+
+    response = compute(request)
+    if response.status_code == status.HTTP_200_OK:
+        response.data = list(response.data)
+        store(key, response.data, request.query_params.get("metric", ""))
+    return response
+
+
+# -------------------------
+# Conditional GET validators
+# -------------------------
+# The same scope markers make an ETag and Last-Modified for any read of the
+# user's data: they change whenever a write touches the scope. Relative
+# windows (date_filter) also move with the clock, so their ETag changes at
+# least once per metric TTL, as a cached response would expire.
+#
+# Last-Modified only has whole seconds, so it is rounded up and left out
+# until that second has passed: a later write in the same second would
+# otherwise keep it unchanged and answer If-Modified-Since with a stale 304.
+def validators(endpoint, user, params):
+    """(ETag, Last-Modified as a Unix timestamp or None) for ``endpoint`` read with ``params``."""
+    scope, pk = request_scope(params, user)
+    version = scope_version(scope, pk)
+    modified = version / 1e9
+    parts = [endpoint, user.pk, scope, pk, version, _digest(params)]
+    if "date_filter" in params:
+        ttl = _ttl(params.get("metric", ""))
+        bucket = int(time.time() // ttl)
+        parts.append(bucket)
+        modified = max(modified, bucket * ttl)
+    etag = hashlib.md5(":".join(map(str, parts)).encode()).hexdigest()
+    modified = math.ceil(modified)
+    return f'"{etag}"', modified if modified <= time.time() else None
+
+
+def stats():
+    """Hit/miss counts of this process since it started."""
+    names = [
+        f"{endpoint}:{metric}"
+        for endpoint, metrics in (
+            ("sensor-data", ("production", "weight", "quality")),
+            ("energy", ("daily", "sensor-cost", "efficiency")),
+        )
+        for metric in metrics
+    ]
+    with _counts_lock:
+        counters = _counts.copy()
+    result = {}
+    for name in names:
+        hits = counters["hits", name]
+        misses = counters["misses", name]
+        total = hits + misses
+        result[name] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 3) if total else None,
+        }
+    return result
@@ -0,0 +1,180 @@
+import gzip
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+from . import db_routers, instrumentation
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+
+# -------------------------
+# Request instrumentation
+# -------------------------
+class InstrumentationMiddleware:
+    """
+    Counts each request's queries and DB time, times auth and rendering, adds
+    a Server-Timing header and feeds the per-route histograms behind /metrics.
+    Place it near the top of MIDDLEWARE so it covers the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        instrumentation.instrument(connection)
+        stats, token = instrumentation.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats, token = instrumentation.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self.finish(request, response, stats)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = instrumentation._current.get()
+        if stats is not None and request.resolver_match:
+            stats.route = request.resolver_match.view_name
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered by the handler after this returns
+        if instrumentation._current.get() is not None:
+            render = response.render
+
+            def timed_render():
+                with instrumentation.timed("render"):
+                    return render()
+            response.render = timed_render
+        return response
+
+    def finish(self, request, response, stats):
+        size = 0 if response.streaming else len(response.content)
+        total = instrumentation.observe(stats, request.method, response.status_code, size)
+        response["Server-Timing"] = instrumentation.server_timing(stats, total)
+        return response
+
+
+# -------------------------
+# Read replica routing
+# -------------------------
+class ReplicaRoutingMiddleware:
+    """
+    Gives each request its own routing state (see core.db_routers), kept
+    until the response is rendered, and pins the user to the primary for a
+    few seconds after a successful write.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = db_routers.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            db_routers.end_request(token)
+        self.finish(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = db_routers.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            db_routers.end_request(token)
+        await sync_to_async(self.finish)(request, response)
+        return response
+
+    def finish(self, request, response):
+        user = getattr(request, "user", None)
+        if (request.method not in SAFE_METHODS and response.status_code < 400
+                and user is not None and user.is_authenticated):
+            db_routers.stick_to_primary(user)
+
+
+# -------------------------
+# Response compression
+# -------------------------
+DEFAULT_COMPRESSION_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def accepted_encodings(header):
+    """Content codings named in an Accept-Encoding header, minus those sent with q=0."""
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses bodies of COMPRESSION_MIN_BYTES or more: brotli when the
+    client takes it and the brotli package is installed, gzip otherwise.
+    Streams (exports, SSE) pass through untouched. Place it below
+    InstrumentationMiddleware so response sizes count bytes on the wire.
+    """
+    def process_response(self, request, response):
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if (response.streaming or response.has_header("Content-Encoding")
+                or len(response.content) < getattr(settings, "COMPRESSION_MIN_BYTES", DEFAULT_COMPRESSION_MIN_BYTES)):
+            return response
+
+        accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        with instrumentation.timed("compress"):
+            if brotli is not None and "br" in accepted:
+                encoding, content = "br", brotli.compress(response.content, quality=BROTLI_QUALITY)
+            elif "gzip" in accepted:
+                encoding, content = "gzip", gzip.compress(response.content, compresslevel=GZIP_LEVEL, mtime=0)
+            else:
+                return response
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response["Content-Length"] = str(len(content))
+        response["Content-Encoding"] = encoding
+        # The representation changed, so a strong validator no longer holds
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
@@ -0,0 +1,118 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:21
+#
+# The schema the app had before it shipped migrations. Databases created from
+# those models already have these tables: record this migration as applied
+# without running it, then migrate as usual:
+#
+#   python manage.py migrate core 0001 --fake-initial
+#   python manage.py migrate
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('username', models.CharField(max_length=255, unique=True)),
+                ('role', models.CharField(choices=[('admin', 'Admin'), ('user', 'User')], default='user', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_staff', models.BooleanField(default=False)),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Plant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('location', models.CharField(max_length=255)),
+                ('plant_type', models.CharField(choices=[('recycling', 'Recycling Plant'), ('manufacturing', 'Manufacturing Plant')], max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plants', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Item',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('plant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='core.plant')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Sensor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('location_type', models.CharField(choices=[('input', 'Input'), ('conveyer_belt', 'Conveyer Belt'), ('weighing_machine', 'Weighing Machine'), ('output_conveyer', 'Output Conveyer'), ('output_weighing', 'Output Weighing')], max_length=50)),
+                ('is_active', models.BooleanField(default=True)),
+                ('installed_at', models.DateTimeField(auto_now_add=True)),
+                ('last_maintenance', models.DateTimeField(blank=True, null=True)),
+                ('plant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sensors', to='core.plant')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EnergyConsumption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('energy_kwh', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('cost', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('plant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='energy_consumptions', to='core.plant')),
+                ('sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='energy_consumptions', to='core.sensor')),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SensorData',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('items_scanned', models.PositiveIntegerField(default=0)),
+                ('items_processed', models.PositiveIntegerField(default=0)),
+                ('items_discarded', models.PositiveIntegerField(default=0)),
+                ('processed_with_errors', models.PositiveIntegerField(default=0)),
+                ('current_weight_kg', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('category_a', models.PositiveIntegerField(default=0)),
+                ('category_b', models.PositiveIntegerField(default=0)),
+                ('category_c', models.PositiveIntegerField(default=0)),
+                ('category_d', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sensor_data', to='core.item')),
+                ('sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sensor_data', to='core.sensor')),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built without locking out writes on databases that already hold readings
+    atomic = False
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='energyconsumption',
+            index=models.Index(fields=['sensor', 'timestamp'], name='energy_sensor_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='energyconsumption',
+            index=models.Index(fields=['plant', 'timestamp'], name='energy_plant_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='energyconsumption',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['timestamp'], name='energy_ts_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='sensordata',
+            index=models.Index(fields=['sensor', 'timestamp'], name='sensordata_sensor_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='sensordata',
+            index=models.Index(fields=['item', 'timestamp'], name='sensordata_item_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='sensordata',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['timestamp'], name='sensordata_ts_brin'),
+        ),
+    ]
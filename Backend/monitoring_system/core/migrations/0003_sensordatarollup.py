@@ -0,0 +1,36 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_time_series_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorDataRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('bucket', models.DateTimeField()),
+                ('readings', models.IntegerField(default=0)),
+                ('items_scanned', models.BigIntegerField(default=0)),
+                ('items_processed', models.BigIntegerField(default=0)),
+                ('items_discarded', models.BigIntegerField(default=0)),
+                ('processed_with_errors', models.BigIntegerField(default=0)),
+                ('weight_kg_sum', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('weight_readings', models.IntegerField(default=0)),
+                ('category_a', models.BigIntegerField(default=0)),
+                ('category_b', models.BigIntegerField(default=0)),
+                ('category_c', models.BigIntegerField(default=0)),
+                ('category_d', models.BigIntegerField(default=0)),
+                ('sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='core.sensor')),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'constraints': [models.UniqueConstraint(fields=('sensor', 'resolution', 'bucket'), name='sensordata_rollup_bucket_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,159 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations, transaction
+from django.utils import timezone
+
+
+# -------------------------
+# Monthly range partitions for SensorData and EnergyConsumption
+# -------------------------
+# Each table becomes a partitioned parent with the same name. The existing
+# table is attached as <table>_legacy (everything before the first monthly
+# partition), so no rows are copied. Everything that has to read or index the
+# existing rows runs first, without blocking writes:
+#
+#   1. a unique (id, "timestamp") index for the legacy partition's primary key
+#      is built CONCURRENTLY
+#   2. a NOT VALID CHECK on the legacy bound is added and then validated,
+#      which lets ATTACH PARTITION skip its own scan (rows past the bound are
+#      rejected from then until the swap, so run it outside bulk loads)
+#
+# The swap itself is one short transaction per table that only touches the
+# catalog. The SQL is spelled out here rather than taken from core.partitions
+# or the schema editor so the migration keeps doing the same thing as the
+# code changes.
+MONTHS_AHEAD = 3
+
+TABLES = {
+    "core_sensordata": {
+        "foreign_keys": [("item_id", "core_item"), ("sensor_id", "core_sensor")],
+        "indexes": [
+            'CREATE INDEX core_sensordata_item_id_7240c1c5 ON core_sensordata (item_id)',
+            'CREATE INDEX core_sensordata_sensor_id_66c90586 ON core_sensordata (sensor_id)',
+            'CREATE INDEX sensordata_sensor_ts_idx ON core_sensordata (sensor_id, "timestamp")',
+            'CREATE INDEX sensordata_item_ts_idx ON core_sensordata (item_id, "timestamp")',
+            'CREATE INDEX sensordata_ts_brin ON core_sensordata USING brin ("timestamp")',
+        ],
+    },
+    "core_energyconsumption": {
+        "foreign_keys": [("plant_id", "core_plant"), ("sensor_id", "core_sensor")],
+        "indexes": [
+            'CREATE INDEX core_energyconsumption_plant_id_6e129dcb ON core_energyconsumption (plant_id)',
+            'CREATE INDEX core_energyconsumption_sensor_id_c9aec2ba ON core_energyconsumption (sensor_id)',
+            'CREATE INDEX energy_sensor_ts_idx ON core_energyconsumption (sensor_id, "timestamp")',
+            'CREATE INDEX energy_plant_ts_idx ON core_energyconsumption (plant_id, "timestamp")',
+            'CREATE INDEX energy_ts_brin ON core_energyconsumption USING brin ("timestamp")',
+        ],
+    },
+}
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def first_partition_month(cursor, table):
+    # Monthly partitions start at the current month, or after the newest
+    # existing row if the table already holds later timestamps.
+    first_month = month_start(timezone.now())
+    cursor.execute(f'SELECT max("timestamp") FROM {table}')
+    newest = cursor.fetchone()[0]
+    if newest and newest >= first_month:
+        first_month = add_months(month_start(newest), 1)
+    return first_month
+
+
+def partition_table(connection, table, spec):
+    legacy = f"{table}_legacy"
+    bound = f"{table}_legacy_bound"
+
+    with connection.cursor() as cursor:
+        first_month = first_partition_month(cursor, table)
+        cursor.execute(f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {legacy}_pkey ON {table} (id, "timestamp")')
+        cursor.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {bound} CHECK ("timestamp" < %s) NOT VALID', [first_month]
+        )
+        cursor.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {bound}")
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"SELECT max(id) FROM {table}")
+        max_id = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'", [table]
+        )
+        (primary_key,) = cursor.fetchone()
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexname NOT IN (%s, %s)",
+            [table, primary_key, f"{legacy}_pkey"],
+        )
+        index_names = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        # The partition key has to be part of every unique constraint
+        cursor.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {primary_key}")
+        cursor.execute(f"ALTER TABLE {legacy} ADD CONSTRAINT {legacy}_pkey PRIMARY KEY USING INDEX {legacy}_pkey")
+        # Index names are schema-wide; free them up for the parent's indexes
+        for name in index_names:
+            cursor.execute(f"ALTER INDEX {name} RENAME TO {name[:55]}_legacy")
+        # Partitions can't bring their own identity column
+        cursor.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+
+        cursor.execute(
+            f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {bound}")
+        cursor.execute(f"CREATE SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        cursor.execute(f"SELECT setval('{table}_id_seq', %s, false)", [(max_id or 0) + 1])
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')")
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, "timestamp")')
+        for column, target in spec["foreign_keys"]:
+            cursor.execute(
+                f"ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fk "
+                f"FOREIGN KEY ({column}) REFERENCES {target} (id) DEFERRABLE INITIALLY DEFERRED"
+            )
+        for sql in spec["indexes"]:
+            cursor.execute(sql)
+
+        # Matching indexes, the primary key and foreign keys of the legacy
+        # table are attached rather than rebuilt, and the validated bound
+        # check stands in for the scan of its rows.
+        cursor.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {legacy} FOR VALUES FROM (MINVALUE) TO (%s)", [first_month]
+        )
+        cursor.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {bound}")
+        cursor.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+        for n in range(MONTHS_AHEAD + 1):
+            month = add_months(first_month, n)
+            cursor.execute(
+                f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+                [month, add_months(month, 1)],
+            )
+
+
+def partition_tables(apps, schema_editor):
+    # Declarative partitioning is PostgreSQL-only; other backends keep plain tables
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, spec in TABLES.items():
+        partition_table(schema_editor.connection, table, spec)
+
+
+class Migration(migrations.Migration):
+    # Steps 1 and 2 above can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("core", "0003_sensordatarollup"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_partition_time_series'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='energyconsumption',
+            name='compacted',
+            field=models.BooleanField(db_default=False, default=False),
+        ),
+        migrations.AddField(
+            model_name='sensordata',
+            name='compacted',
+            field=models.BooleanField(db_default=False, default=False),
+        ),
+        migrations.AddField(
+            model_name='sensordata',
+            name='readings',
+            field=models.PositiveIntegerField(db_default=1, default=1),
+        ),
+    ]
@@ -0,0 +1,61 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models, transaction
+
+
+def backfill_plant_and_owner(apps, schema_editor):
+    # One UPDATE per sensor, each committed on its own: every statement stays
+    # on the (sensor, timestamp) index and only one sensor's rows are locked
+    # at a time. Stop writers running older code while it runs: rows they
+    # insert without a plant/owner would make the NOT NULL step below fail.
+    Sensor = apps.get_model("core", "Sensor")
+    SensorData = apps.get_model("core", "SensorData")
+    db = schema_editor.connection.alias
+    sensors = Sensor.objects.using(db).values_list("id", "plant_id", "plant__user_id")
+    for sensor_id, plant_id, user_id in sensors.iterator():
+        with transaction.atomic(using=db):
+            SensorData.objects.using(db).filter(sensor_id=sensor_id, plant__isnull=True).update(
+                plant_id=plant_id, owner_id=user_id
+            )
+
+
+class Migration(migrations.Migration):
+    # Without a migration-wide transaction the backfill can commit per sensor
+    atomic = False
+
+    dependencies = [
+        ('core', '0005_compaction_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensordata',
+            name='plant',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sensor_data', to='core.plant'),
+        ),
+        migrations.AddField(
+            model_name='sensordata',
+            name='owner',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sensor_data', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_plant_and_owner, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='sensordata',
+            name='plant',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='sensor_data', to='core.plant'),
+        ),
+        migrations.AlterField(
+            model_name='sensordata',
+            name='owner',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='sensor_data', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='sensordata',
+            index=models.Index(fields=['plant', 'timestamp'], name='sensordata_plant_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sensordata',
+            index=models.Index(fields=['owner', 'timestamp'], name='sensordata_owner_ts_idx'),
+        ),
+    ]
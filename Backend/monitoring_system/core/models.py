@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.contrib.postgres.indexes import BrinIndex
 from django.db import models
 from django.utils import timezone
 
@@ -93,11 +94,20 @@ class EnergyConsumption(models.Model):
     timestamp = models.DateTimeField(default=timezone.now)
     energy_kwh = models.DecimalField(max_digits=10, decimal_places=2)
     cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Hourly total written by core.compaction in place of the raw readings
+    compacted = models.BooleanField(default=False, db_default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Time-series lookups: "this sensor/plant, newest first, within a range"
+            models.Index(fields=['sensor', 'timestamp'], name='energy_sensor_ts_idx'),
+            models.Index(fields=['plant', 'timestamp'], name='energy_plant_ts_idx'),
+            # Append-only table, so timestamps follow the physical row order
+            BrinIndex(fields=['timestamp'], name='energy_ts_brin'),
+        ]
 
     def __str__(self):
         return f"{self.sensor.name} - {self.energy_kwh} kWh"
@@ -121,6 +131,10 @@ class Item(models.Model):
 # -----------------------
 class SensorData(models.Model):
     sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE, related_name='sensor_data')
+    # Copies of sensor.plant and sensor.plant.user, set on every write, so
+    # scoping and plant filters don't have to join through Sensor and Plant
+    plant = models.ForeignKey(Plant, on_delete=models.CASCADE, related_name='sensor_data', db_index=False)
+    owner = models.ForeignKey('CustomUser', on_delete=models.CASCADE, related_name='sensor_data', db_index=False)
     item = models.ForeignKey(Item, on_delete=models.SET_NULL, null=True, blank=True, related_name='sensor_data')
     timestamp = models.DateTimeField(default=timezone.now)
 
@@ -139,6 +153,11 @@ class SensorData(models.Model):
     category_c = models.PositiveIntegerField(default=0)
     category_d = models.PositiveIntegerField(default=0)
 
+    # Compacted rows (see core.compaction) hold the hourly totals of
+    # `readings` raw readings and their average weight.
+    readings = models.PositiveIntegerField(default=1, db_default=1)
+    compacted = models.BooleanField(default=False, db_default=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -152,6 +171,57 @@ class SensorData(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Time-series lookups: "this owner/plant/sensor/item, newest first, within a range"
+            models.Index(fields=['sensor', 'timestamp'], name='sensordata_sensor_ts_idx'),
+            models.Index(fields=['item', 'timestamp'], name='sensordata_item_ts_idx'),
+            models.Index(fields=['plant', 'timestamp'], name='sensordata_plant_ts_idx'),
+            models.Index(fields=['owner', 'timestamp'], name='sensordata_owner_ts_idx'),
+            # Append-only table, so timestamps follow the physical row order
+            BrinIndex(fields=['timestamp'], name='sensordata_ts_brin'),
+        ]
+
+    def __str__(self):
+        return f"{self.sensor.name} - {self.timestamp}"
+
+# -----------------------
+# Sensor Data Rollup
+# -----------------------
+class SensorDataRollup(models.Model):
+    # Per-sensor totals of SensorData readings for one minute/hour/day bucket,
+    # kept up to date by core.rollups as readings are written.
+    RESOLUTION_CHOICES = [
+        ('minute', 'Minute'),
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE, related_name='rollups')
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES)
+    bucket = models.DateTimeField()
+    readings = models.IntegerField(default=0)
+
+    # Production Metrics
+    items_scanned = models.BigIntegerField(default=0)
+    items_processed = models.BigIntegerField(default=0)
+    items_discarded = models.BigIntegerField(default=0)
+    processed_with_errors = models.BigIntegerField(default=0)
+
+    # Weight Metrics (readings without a weight are not counted)
+    weight_kg_sum = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    weight_readings = models.IntegerField(default=0)
+
+    # Quality Metrics
+    category_a = models.BigIntegerField(default=0)
+    category_b = models.BigIntegerField(default=0)
+    category_c = models.BigIntegerField(default=0)
+    category_d = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['sensor', 'resolution', 'bucket'], name='sensordata_rollup_bucket_uniq'),
+        ]
 
     def __str__(self):
-        return f"{self.sensor.name} - {self.timestamp}"
\ No newline at end of file
+        return f"{self.sensor_id} {self.resolution} {self.bucket}"
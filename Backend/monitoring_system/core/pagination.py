@@ -0,0 +1,143 @@
+import base64
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _value(row, name):
+    # Pages may hold model instances or .values() dicts
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+# -------------------------
+# Keyset pagination on (timestamp, id)
+# -------------------------
+class KeysetPagination(BasePagination):
+    """
+    Newest-first pages addressed by the (timestamp, id) of the last row seen,
+    so every page is an index range scan no matter how deep it is. The total
+    count is only computed when the client asks for it with ?count=true.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-timestamp', '-id')
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = queryset.count()
+
+        queryset = self.after(queryset, self.decode_cursor(request))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = (_value(rows[-1], 'timestamp'), _value(rows[-1], 'id')) if self.has_next else None
+        return rows
+
+    def after(self, queryset, position):
+        """Rows of the newest-first ``queryset`` that come after ``position``."""
+        if not position:
+            return queryset
+        timestamp, pk = position
+        # The OR alone is only applied as a filter, so the scan would start at
+        # the newest row on every page; the redundant upper bound becomes an
+        # index condition and prunes newer partitions.
+        return queryset.filter(
+            Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk), timestamp__lte=timestamp
+        )
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            timestamp, pk = base64.urlsafe_b64decode(encoded.encode()).decode().split('|')
+            timestamp, pk = parse_datetime(timestamp), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound("Invalid cursor")
+        if timestamp is None:
+            raise NotFound("Invalid cursor")
+        return timestamp, pk
+
+    def encode_cursor(self, position):
+        timestamp, pk = position
+        return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{pk}".encode()).decode()
+
+    def get_next_link(self):
+        if not self.next_position:
+            return None
+        # The count only needs to be fetched once, with the first page
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        url = remove_query_param(url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        body = OrderedDict([('next', self.get_next_link())])
+        if self.count is not None:
+            body['count'] = self.count
+        body['results'] = data
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+
+class PageNumberOrKeysetPagination(BasePagination):
+    """
+    Page-number pagination by default (what the frontend tables use); switches
+    to keyset pagination when the request has ?cursor= or ?pagination=cursor.
+    """
+    page_number_class = PageNumberPagination
+    keyset_class = KeysetPagination
+
+    @property
+    def page_size(self):
+        # Default page size of both modes, for callers that slice querysets
+        return self.page_number_class.page_size
+
+    def use_keyset(self, request):
+        params = request.query_params
+        return self.keyset_class.cursor_query_param in params or params.get('pagination') == 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_keyset(request):
+            self.paginator = self.keyset_class()
+            # Same page size limits in both modes
+            for attr in ('page_size', 'page_size_query_param', 'max_page_size'):
+                setattr(self.paginator, attr, getattr(self.page_number_class, attr))
+        else:
+            self.paginator = self.page_number_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
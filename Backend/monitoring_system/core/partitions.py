@@ -0,0 +1,173 @@
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+# -------------------------
+# Monthly range partitions on PostgreSQL
+# -------------------------
+# SensorData and EnergyConsumption are partitioned by RANGE ("timestamp"), one
+# partition per calendar month (UTC) named <table>_pYYYY_MM. Rows that were in
+# the table before partitioning live in <table>_legacy, and rows whose month has
+# no partition yet land in <table>_default until ensure_partitions() moves them.
+PARTITIONED_TABLES = ["core_sensordata", "core_energyconsumption"]
+
+_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+def month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def is_partitioned(table):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s", [table])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def list_partitions(table):
+    """(name, upper bound) for each partition; the upper bound is None for the default one."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            WHERE parent.relname = %s
+            ORDER BY child.relname
+            """,
+            [table],
+        )
+        rows = cursor.fetchall()
+    partitions = []
+    for name, bound in rows:
+        match = _UPPER_BOUND.search(bound)
+        partitions.append((name, parse_datetime(match.group(1)) if match else None))
+    return partitions
+
+
+def create_partition(table, month):
+    """Create the partition for ``month``; returns False if it already exists."""
+    name = partition_name(table, month)
+    lower, upper = month, add_months(month, 1)
+    default = f"{table}_default"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0]:
+            return False
+
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM {default} WHERE "timestamp" >= %s AND "timestamp" < %s)',
+            [lower, upper],
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+                [lower, upper],
+            )
+            return True
+
+        # Rows for this month arrived before its partition existed; move them
+        # out of the default partition, which must not overlap the new one.
+        cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {default}")
+        cursor.execute(
+            f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+            [lower, upper],
+        )
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {default} WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+            f"INSERT INTO {name} SELECT * FROM moved",
+            [lower, upper],
+        )
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT")
+    return True
+
+
+def missing_months(table, months_ahead=3, now=None):
+    """Months from the current one through ``months_ahead`` ahead that have no partition yet."""
+    current = month_start(now or timezone.now())
+    partitions = dict(list_partitions(table))
+    # The legacy partition may reach past the current month
+    legacy_upper = partitions.get(f"{table}_legacy")
+    months = [add_months(current, n) for n in range(months_ahead + 1)]
+    return [
+        month for month in months
+        if partition_name(table, month) not in partitions
+        and not (legacy_upper and month < legacy_upper)
+    ]
+
+
+def ensure_range(table, start, end):
+    """Create the partitions for every month from ``start`` through ``end``, e.g. before loading history."""
+    partitions = dict(list_partitions(table))
+    legacy_upper = partitions.get(f"{table}_legacy")
+    created = []
+    month = month_start(start)
+    while month <= end:
+        if (
+            partition_name(table, month) not in partitions
+            and not (legacy_upper and month < legacy_upper)
+            and create_partition(table, month)
+        ):
+            created.append(partition_name(table, month))
+        month = add_months(month, 1)
+    return created
+
+
+def ensure_partitions(table, months_ahead=3, now=None):
+    return [
+        partition_name(table, month)
+        for month in missing_months(table, months_ahead, now)
+        if create_partition(table, month)
+    ]
+
+
+def expired_partitions(table, retain_months, now=None):
+    """Partitions whose whole range is older than ``retain_months`` full months."""
+    cutoff = add_months(month_start(now or timezone.now()), -retain_months)
+    return [
+        name for name, upper in list_partitions(table)
+        if upper is not None and upper <= cutoff
+    ]
+
+
+def drop_expired(table, retain_months, now=None, detach_only=False):
+    """
+    Detach (and unless ``detach_only``, drop) expired partitions. Retention
+    becomes a catalog operation instead of a large DELETE.
+    """
+    removed = []
+    for name in expired_partitions(table, retain_months, now):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            if not detach_only:
+                cursor.execute(f"DROP TABLE {name}")
+                removed.append(name)
+                continue
+            # A detached table keeps copies of the parent's foreign keys, which
+            # would stop plants and sensors from being deleted later.
+            cursor.execute(
+                "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+                [name],
+            )
+            for (constraint,) in cursor.fetchall():
+                cursor.execute(f"ALTER TABLE {name} DROP CONSTRAINT {constraint}")
+        removed.append(name)
+    return removed
+
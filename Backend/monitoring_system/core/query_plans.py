@@ -0,0 +1,134 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .benchmarks import make_fixtures
+from .models import EnergyConsumption, SensorData
+from .pagination import KeysetPagination
+from .views import SensorDataViewSet, EnergyConsumptionViewSet
+
+
+# -------------------------
+# Query plan checks for the list endpoints
+# -------------------------
+# Seeds both time-series tables, EXPLAINs the first-page list query for the
+# filter combinations the frontend sends and flags any that fall back to a
+# sequential scan. Used by `manage.py check_query_plans` and core.tests; the
+# caller provides the transaction that rolls the seed rows back.
+
+# (viewset, query params) pairs covering the filter combinations the
+# frontend sends to the list endpoints.
+CASES = [
+    (SensorDataViewSet, {"sensor_id": "{sensor}"}),
+    (SensorDataViewSet, {"sensor_id": "{sensor}", "start_date": "{start}", "end_date": "{end}"}),
+    (SensorDataViewSet, {"plant_id": "{plant}"}),
+    (SensorDataViewSet, {"plant_id": "{plant}", "start_date": "{start}", "end_date": "{end}"}),
+    (SensorDataViewSet, {"item_id": "{item}"}),
+    (SensorDataViewSet, {"date_filter": "today"}),
+    (SensorDataViewSet, {"cursor": "{sensor_data_cursor}"}),
+    (EnergyConsumptionViewSet, {"sensor": "{sensor}"}),
+    (EnergyConsumptionViewSet, {"sensor": "{sensor}", "start_date": "{start}", "end_date": "{end}"}),
+    (EnergyConsumptionViewSet, {"plant": "{plant}"}),
+    (EnergyConsumptionViewSet, {"plant": "{plant}", "start_date": "{start}", "end_date": "{end}"}),
+    (EnergyConsumptionViewSet, {"date_filter": "today"}),
+    (EnergyConsumptionViewSet, {"cursor": "{energy_cursor}"}),
+]
+
+SEED_SENSOR_DATA = """
+    INSERT INTO core_sensordata (
+        sensor_id, plant_id, owner_id, item_id, timestamp, items_scanned, items_processed,
+        items_discarded, processed_with_errors, current_weight_kg, category_a, category_b,
+        category_c, category_d, created_at, updated_at
+    )
+    SELECT s.id, s.plant_id, p.user_id, CASE WHEN n %% 3 = 0 THEN %(item)s END,
+           now() - (n * interval '1 minute'), 100, 90, 5, 5, 250.00, 40, 30, 15, 5, now(), now()
+    FROM generate_series(1, %(rows)s) AS n
+    JOIN core_sensor s ON s.id = (%(sensor_ids)s::bigint[])[1 + n %% cardinality(%(sensor_ids)s::bigint[])]
+    JOIN core_plant p ON p.id = s.plant_id
+"""
+
+SEED_ENERGY = """
+    INSERT INTO core_energyconsumption (
+        sensor_id, plant_id, timestamp, energy_kwh, cost, created_at, updated_at
+    )
+    SELECT s.id, s.plant_id, now() - (n * interval '1 minute'), 12.50, 100.00, now(), now()
+    FROM generate_series(1, %(rows)s) AS n
+    JOIN core_sensor s ON s.id = (%(sensor_ids)s::bigint[])[1 + n %% cardinality(%(sensor_ids)s::bigint[])]
+"""
+
+
+class PlanCheck:
+    def __init__(self, viewset, query, plan):
+        self.viewset = viewset
+        self.query = query
+        self.plan = plan
+        self.table = viewset.serializer_class.Meta.model._meta.db_table
+
+    @property
+    def label(self):
+        return f"{self.viewset.__name__} {self.query}"
+
+    @property
+    def seq_scan(self):
+        # Partitions that are still empty (cost 0.00) are fine to scan
+        return any(
+            f"Seq Scan on {self.table}" in line and "cost=0.00..0.00 " not in line
+            for line in self.plan.splitlines()
+        )
+
+
+def seed(rows):
+    """Spread ``rows`` readings and energy rows over ten plants; returns the case placeholders and user."""
+    fixtures = [make_fixtures(sensors=8) for _ in range(10)]
+    user, plant, sensors, items = fixtures[0]
+    sensor_ids = [s.id for _, _, sensor_objs, _ in fixtures for s in sensor_objs]
+    with connection.cursor() as cursor:
+        params = {"rows": rows, "sensor_ids": sensor_ids, "item": items[0].id}
+        cursor.execute(SEED_SENSOR_DATA, params)
+        cursor.execute(SEED_ENERGY, params)
+        cursor.execute("ANALYZE core_sensordata, core_energyconsumption, core_sensor, core_plant")
+
+    # Keyset cursors halfway through the user's rows
+    depth = rows // len(fixtures) // 2
+    keyset = KeysetPagination()
+    sensor_data = SensorData.objects.filter(owner=user)
+    energy = EnergyConsumption.objects.filter(plant__user=user)
+    values = {
+        "sensor": sensors[0].id, "plant": plant.id, "item": items[0].id,
+        "start": (timezone.now() - timedelta(days=3)).date().isoformat(),
+        "end": timezone.now().date().isoformat(),
+        **{
+            f"{name}_cursor": keyset.encode_cursor(
+                qs.order_by("-timestamp", "-id").values_list("timestamp", "id")[depth]
+            )
+            for name, qs in (("sensor_data", sensor_data), ("energy", energy))
+        },
+    }
+    return user, values
+
+
+def explain(viewset, query, user):
+    """EXPLAIN of the first page of ``viewset``'s list query for ``query`` (or the page at its cursor)."""
+    view = viewset()
+    view.request = Request(APIRequestFactory().get("/", query))
+    view.request.user = user
+    view.format_kwarg = None
+    view.kwargs = {}
+    queryset = view.get_queryset()
+    if "cursor" in query:
+        keyset = view.paginator.keyset_class()
+        queryset = keyset.after(queryset.order_by("-timestamp", "-id"), keyset.decode_cursor(view.request))
+    return queryset[:view.paginator.page_size].explain()
+
+
+def check_plans(rows):
+    """Seed ``rows`` rows per table and return a PlanCheck for every case."""
+    user, values = seed(rows)
+    checks = []
+    for viewset, case in CASES:
+        query = {k: v.format(**values) for k, v in case.items()}
+        checks.append(PlanCheck(viewset, query, explain(viewset, query, user)))
+    return checks
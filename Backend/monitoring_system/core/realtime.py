@@ -0,0 +1,142 @@
+import asyncio
+import json
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+
+from .authentication import CachedJWTAuthentication
+from .broker import get_broker
+from .models import Plant, Sensor
+from .rollups import COUNTER_FIELDS
+
+
+# -------------------------
+# Live readings over Server-Sent Events
+# -------------------------
+# GET /api/stream/?plant=<id>&sensor=<id>... streams every SensorData and
+# EnergyConsumption row written for those plants/sensors after the client
+# connected, as `sensor-data` / `energy` events holding a list of rows for one
+# sensor. Serve it through the ASGI application so a stream doesn't tie up a
+# worker thread.
+DEFAULT_HEARTBEAT = 15
+
+
+def _publish_after_commit(event, rows_by_sensor):
+    def publish():
+        broker = get_broker()
+        for (plant_id, sensor_id), rows in rows_by_sensor.items():
+            broker.publish(
+                [f"plant:{plant_id}", f"sensor:{sensor_id}"],
+                {"event": event, "data": rows},
+            )
+    transaction.on_commit(publish)
+
+
+def publish_sensor_data(readings):
+    """Push newly saved readings to the streams; sent once the transaction commits."""
+    rows_by_sensor = defaultdict(list)
+    for reading in readings:
+        rows_by_sensor[(reading.plant_id, reading.sensor_id)].append({
+            "id": reading.id,
+            "sensor": reading.sensor_id,
+            "plant": reading.plant_id,
+            "item": reading.item_id,
+            "timestamp": reading.timestamp,
+            **{f: getattr(reading, f) for f in COUNTER_FIELDS},
+            "current_weight_kg": reading.current_weight_kg,
+        })
+    _publish_after_commit("sensor-data", rows_by_sensor)
+
+
+def publish_energy(rows):
+    rows_by_sensor = defaultdict(list)
+    for row in rows:
+        rows_by_sensor[(row.plant_id, row.sensor_id)].append({
+            "id": row.id,
+            "sensor": row.sensor_id,
+            "plant": row.plant_id,
+            "timestamp": row.timestamp,
+            "energy_kwh": row.energy_kwh,
+            "cost": row.cost,
+        })
+    _publish_after_commit("energy", rows_by_sensor)
+
+
+def _error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+def _ids(values):
+    try:
+        return {int(v) for v in values}
+    except ValueError:
+        return None
+
+
+@sync_to_async
+def _authenticate(request):
+    # EventSource can't set headers, so the access token may also come as ?token=
+    auth = CachedJWTAuthentication()
+    raw = request.GET.get("token")
+    if raw is None:
+        header = auth.get_header(request)
+        raw = auth.get_raw_token(header) if header else None
+    if raw is None:
+        return None
+    try:
+        return auth.get_user(auth.get_validated_token(raw))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def _format(message):
+    payload = json.dumps(message["data"], cls=DjangoJSONEncoder)
+    return f"event: {message['event']}\ndata: {payload}\n\n"
+
+
+async def stream(request):
+    if request.method != "GET":
+        return _error("Method not allowed", 405)
+    user = await _authenticate(request)
+    if user is None:
+        return _error("Authentication credentials were not provided or are invalid", 401)
+
+    plant_ids = _ids(request.GET.getlist("plant"))
+    sensor_ids = _ids(request.GET.getlist("sensor"))
+    if plant_ids is None or sensor_ids is None:
+        return _error("plant and sensor must be ids", 400)
+    if not (plant_ids or sensor_ids):
+        return _error("Subscribe to at least one plant or sensor", 400)
+
+    owned_plants = await Plant.objects.filter(user=user, id__in=plant_ids).acount()
+    owned_sensors = await Sensor.objects.filter(plant__user=user, id__in=sensor_ids).acount()
+    if owned_plants != len(plant_ids) or owned_sensors != len(sensor_ids):
+        return _error("Invalid plant or sensor or not owned by you", 404)
+
+    channels = [f"plant:{pk}" for pk in plant_ids] + [f"sensor:{pk}" for pk in sensor_ids]
+    heartbeat = getattr(settings, "REALTIME_HEARTBEAT", DEFAULT_HEARTBEAT)
+
+    async def events():
+        subscription = get_broker().subscribe(channels)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _format(message)
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
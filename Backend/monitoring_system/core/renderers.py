@@ -0,0 +1,56 @@
+from rest_framework.renderers import BaseRenderer, BrowsableAPIRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:  # optional; without it only JSON is offered
+    msgpack = None
+
+
+# -------------------------
+# Response formats for time-series endpoints
+# -------------------------
+# Lists and metrics can be asked for in two independent ways:
+#
+#   encoding  Accept: application/msgpack (or ?format=msgpack) for MessagePack,
+#             JSON otherwise
+#   shape     ?shape=columns for one array per field,
+#             {"timestamp": [...], "items_scanned": [...]}, instead of one
+#             object per row; paginated lists keep their envelope and get
+#             the columns under "results"
+#
+# Both apply to the same data, so any encoding can carry either shape
+# (core.views.ResponseFormatMixin). Large bodies are then compressed by
+# core.middleware.CompressionMiddleware.
+SHAPES = ("rows", "columns")
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        # Timestamps, dates and decimals come out as they do in JSON
+        return msgpack.packb(data, default=JSONEncoder().default)
+
+
+def renderer_classes():
+    classes = [JSONRenderer, BrowsableAPIRenderer]
+    if msgpack is not None:
+        classes.append(MessagePackRenderer)
+    return classes
+
+
+def to_columns(rows, names):
+    """
+    One list per field of ``rows`` (dicts sharing their keys), in field order.
+    ``names`` are the fields to give an empty result, so it keeps its columns.
+    """
+    if not rows:
+        return {name: [] for name in names}
+    return {name: [row[name] for row in rows] for name in rows[0]}
+
@@ -0,0 +1,154 @@
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.db.models.functions import Coalesce, NullIf, Round, Trunc
+
+from .filters import filter_by_sensor_or_plant
+from .models import SensorData, SensorDataRollup
+
+
+# -------------------------
+# Minute/hour/day rollups of SensorData
+# -------------------------
+RESOLUTIONS = ("minute", "hour", "day")
+
+COUNTER_FIELDS = [
+    "items_scanned", "items_processed", "items_discarded", "processed_with_errors",
+    "category_a", "category_b", "category_c", "category_d",
+]
+
+# Rollup columns that hold additive totals, in upsert order
+TOTAL_COLUMNS = ["readings", *COUNTER_FIELDS, "weight_kg_sum", "weight_readings"]
+
+METRIC_COLUMNS = {
+    "production": ["items_scanned", "items_processed", "items_discarded", "processed_with_errors"],
+    "quality": ["category_a", "category_b", "category_c", "category_d"],
+}
+
+
+def bucket_start(ts, resolution):
+    ts = ts.astimezone(dt_timezone.utc)
+    if resolution == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if resolution == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _bucket_totals(readings, sign):
+    totals = defaultdict(lambda: [0] * len(TOTAL_COLUMNS))
+    for reading in readings:
+        # A compacted reading stands for `readings` raw ones at their average weight
+        weight, n = reading.current_weight_kg, reading.readings
+        values = [
+            n,
+            *(getattr(reading, f) for f in COUNTER_FIELDS),
+            (weight or 0) * n,
+            0 if weight is None else n,
+        ]
+        for resolution in RESOLUTIONS:
+            row = totals[(reading.sensor_id, resolution, bucket_start(reading.timestamp, resolution))]
+            for i, value in enumerate(values):
+                row[i] += sign * value
+    return totals
+
+
+def _apply(readings, sign):
+    totals = _bucket_totals(readings, sign)
+    if not totals:
+        return
+
+    table = SensorDataRollup._meta.db_table
+    columns = ["sensor_id", "resolution", "bucket", *TOTAL_COLUMNS]
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT (sensor_id, resolution, bucket) DO UPDATE SET "
+        + ", ".join(f"{c} = {table}.{c} + EXCLUDED.{c}" for c in TOTAL_COLUMNS)
+    )
+    # Sorted keys make concurrent writers lock buckets in the same order.
+    params = [[*key, *values] for key, values in sorted(totals.items())]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def record_readings(readings):
+    """Add saved readings to their rollup buckets. Call inside the write's transaction."""
+    _apply(readings, 1)
+
+
+def retract_readings(readings):
+    """Remove readings (as they were stored) from their rollup buckets."""
+    _apply(readings, -1)
+
+
+def rebuild_rollups(sensor_ids=None):
+    """Recompute rollups from the raw readings, e.g. to backfill existing history."""
+    readings = SensorData.objects.all()
+    rollups = SensorDataRollup.objects.all()
+    if sensor_ids is not None:
+        readings = readings.filter(sensor_id__in=sensor_ids)
+        rollups = rollups.filter(sensor_id__in=sensor_ids)
+
+    # Aggregated and inserted by the database in one statement per resolution.
+    # Target columns and the SELECT list both come from `totals`, so the
+    # INSERT doesn't depend on the column order Django compiles.
+    table = SensorDataRollup._meta.db_table
+    created = 0
+    with transaction.atomic():
+        rollups.delete()
+        for resolution in RESOLUTIONS:
+            totals = {
+                "resolution": Value(resolution),
+                "readings": Sum("readings"),
+                **{f: Sum(f) for f in COUNTER_FIELDS},
+                "weight_kg_sum": Coalesce(
+                    Sum(F("current_weight_kg") * F("readings"), output_field=DecimalField()), Value(0),
+                    output_field=DecimalField(),
+                ),
+                "weight_readings": Sum(Case(When(current_weight_kg__isnull=False, then="readings"), default=0)),
+            }
+            # Annotations can't reuse the model's field names
+            rows = readings.annotate(
+                bucket=Trunc("timestamp", resolution, tzinfo=dt_timezone.utc)
+            ).values("sensor_id", "bucket").annotate(
+                **{f"total_{column}": expression for column, expression in totals.items()}
+            ).order_by()
+            columns = ["sensor_id", "bucket", *totals]
+            aliases = ["sensor_id", "bucket", *(f"total_{column}" for column in totals)]
+            sql, params = rows.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {table} ({', '.join(columns)}) "
+                    f"SELECT {', '.join(connection.ops.quote_name(a) for a in aliases)} FROM ({sql}) AS totals",
+                    params,
+                )
+                created += cursor.rowcount
+    return created
+
+
+def rollup_metrics(user, filters, resolution, metric_type):
+    """Per-bucket totals for a metrics chart, summed over the sensors in scope."""
+    qs = SensorDataRollup.objects.filter(
+        sensor__plant__user=user, resolution=resolution, readings__gt=0
+    )
+    qs = filter_by_sensor_or_plant(qs, filters)
+    if filters["start"]:
+        qs = qs.filter(bucket__gte=bucket_start(filters["start"], resolution))
+    if filters["end"]:
+        qs = qs.filter(bucket__lte=filters["end"])
+
+    qs = qs.values("bucket").order_by("-bucket")
+    if metric_type == "weight":
+        rows = qs.annotate(
+            avg_weight=Round(Sum("weight_kg_sum") / NullIf(Sum("weight_readings"), 0), 2)
+        )
+        return [{"timestamp": row["bucket"], "current_weight_kg": row["avg_weight"]} for row in rows]
+
+    columns = METRIC_COLUMNS[metric_type]
+    rows = qs.annotate(**{f"sum_{c}": Sum(c) for c in columns})
+    return [
+        {"timestamp": row["bucket"], **{c: row[f"sum_{c}"] for c in columns}}
+        for row in rows
+    ]
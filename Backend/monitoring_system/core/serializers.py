@@ -1,7 +1,9 @@
 from rest_framework import serializers
+from django.db.models import F
 from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import check_password, make_password
 from .models import CustomUser, Plant, Sensor, EnergyConsumption, Item, SensorData
+from . import instrumentation
 
 
 # ------------------------
@@ -51,12 +53,14 @@ class LoginSerializer(serializers.Serializer):
         if not email or not password:
             raise serializers.ValidationError("Email and password are required")
 
-        user = authenticate(username=email, password=password)
+        # The one password check of a login; the view takes the user from here
+        user = authenticate(self.context.get('request'), username=email, password=password)
         if not user:
             raise serializers.ValidationError("Invalid credentials")
         if not user.is_active:
             raise serializers.ValidationError("User is inactive")
 
+        data['user'] = user
         return data
 
 
@@ -98,8 +102,10 @@ class EnergyConsumptionSerializer(serializers.ModelSerializer):
             'id', 'sensor', 'sensor_name',
             'plant', 'plant_name',
             'timestamp', 'energy_kwh', 'cost',
+            'compacted',      # hourly total written by compaction
             'created_at', 'updated_at'
         ]
+        read_only_fields = ['compacted']
 
 
 class ItemSerializer(serializers.ModelSerializer):
@@ -110,7 +116,7 @@ class ItemSerializer(serializers.ModelSerializer):
 
 class SensorDataSerializer(serializers.ModelSerializer):
     sensor_name = serializers.CharField(source='sensor.name', read_only=True)
-    plant_name = serializers.CharField(source='sensor.plant.name', read_only=True)
+    plant_name = serializers.CharField(source='plant.name', read_only=True)
     item_name = serializers.CharField(source='item.name', read_only=True, default=None)
 
     class Meta:
@@ -132,6 +138,102 @@ class SensorDataSerializer(serializers.ModelSerializer):
             'category_b',
             'category_c',
             'category_d',
+            'readings',       # raw readings behind the row (>1 once compacted)
+            'compacted',      # hourly total written by compaction
             'created_at',
             'updated_at',
         ]
+        read_only_fields = ['readings', 'compacted']
+
+
+class SensorDataBulkSerializer(serializers.ModelSerializer):
+    # Plain IDs so validating a batch doesn't run a lookup per row;
+    # ownership is checked once per distinct sensor/item in the view.
+    sensor = serializers.IntegerField()
+    item = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = SensorData
+        fields = [
+            'sensor',
+            'item',
+            'timestamp',
+            'items_scanned',
+            'items_processed',
+            'items_discarded',
+            'processed_with_errors',
+            'current_weight_kg',
+            'category_a',
+            'category_b',
+            'category_c',
+            'category_d',
+        ]
+
+
+class EnergyConsumptionBulkSerializer(serializers.ModelSerializer):
+    # Plain IDs, as in SensorDataBulkSerializer; ownership is checked in the view.
+    sensor = serializers.IntegerField()
+    plant = serializers.IntegerField()
+
+    class Meta:
+        model = EnergyConsumption
+        fields = ['sensor', 'plant', 'timestamp', 'energy_kwh', 'cost']
+
+
+# ------------------------
+# Read-only row serializers for list endpoints
+# ------------------------
+class ValuesRowSerializer:
+    """
+    Produces the same output as ``serializer_class`` for rows fetched with
+    ``.values()``: related names come from the same query as joined columns
+    and each value goes through one conversion instead of a full
+    ModelSerializer per row.
+    """
+    serializer_class = None
+    # Output field -> ORM lookup, for fields whose source is a relation
+    lookups = {}
+
+    def __init__(self):
+        fields = self.serializer_class().fields
+        self.names = list(fields)
+        # Only dates and decimals need converting; ids, ints and strings pass through
+        self.converters = [
+            (name, fields[name].to_representation)
+            for name in self.names
+            if isinstance(fields[name], (serializers.DateTimeField, serializers.DecimalField))
+        ]
+
+    def values(self, queryset):
+        plain = [name for name in self.names if name not in self.lookups]
+        joined = {name: F(lookup) for name, lookup in self.lookups.items()}
+        return queryset.values(*plain, **joined)
+
+    def to_representation(self, rows):
+        names, converters = self.names, self.converters
+        rows = list(rows)  # runs a pending query outside the serialize timing
+        data = []
+        with instrumentation.timed("serialize"):
+            for row in rows:
+                for name, convert in converters:
+                    if row[name] is not None:
+                        row[name] = convert(row[name])
+                data.append({name: row[name] for name in names})
+        return data
+
+
+class SensorDataRowSerializer(ValuesRowSerializer):
+    serializer_class = SensorDataSerializer
+    lookups = {
+        'sensor_name': 'sensor__name',
+        'plant_name': 'plant__name',
+        'item_name': 'item__name',
+    }
+
+
+class EnergyConsumptionRowSerializer(ValuesRowSerializer):
+    serializer_class = EnergyConsumptionSerializer
+    lookups = {
+        'sensor_name': 'sensor__name',
+        'plant_name': 'plant__name',
+    }
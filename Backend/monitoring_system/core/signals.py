@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import forget_user
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def forget_cached_user(sender, instance, **kwargs):
+    # Profile updates, password changes and deactivation must not be masked
+    # by the cached copy CachedJWTAuthentication holds.
+    forget_user(instance.pk)
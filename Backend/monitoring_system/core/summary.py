@@ -0,0 +1,110 @@
+from django.db.models import Count, Q, Sum
+
+from .filters import sensor_data_filters
+from .models import EnergyConsumption, Plant, SensorData
+from .rollups import COUNTER_FIELDS
+
+
+# -------------------------
+# Per-plant dashboard summary
+# -------------------------
+# Three grouped queries whatever the number of plants or sensors: plants with
+# their active/inactive sensor counts, SensorData totals per plant and energy
+# totals per plant. Both time-series queries use the (owner|plant, timestamp)
+# indexes and only scan the partitions inside the window. Readings and energy
+# share one window, resolved like the sensor-data endpoints do (start/end or
+# start_date/end_date, date_filter=week is the last 7 days), so every total in
+# a response covers the start/end it reports.
+CATEGORIES = {"A": "category_a", "B": "category_b", "C": "category_c", "D": "category_d"}
+
+
+def _window(qs, filters):
+    if filters["start"]:
+        qs = qs.filter(timestamp__gte=filters["start"])
+    if filters["end"]:
+        qs = qs.filter(timestamp__lte=filters["end"])
+    return qs
+
+
+def _ratio(part, whole, digits=4):
+    return round(part / whole, digits) if whole else None
+
+
+def _kpis(totals):
+    categorized = sum(totals[field] for field in CATEGORIES.values())
+    return {
+        "items_scanned": totals["items_scanned"],
+        "items_processed": totals["items_processed"],
+        "items_discarded": totals["items_discarded"],
+        "processed_with_errors": totals["processed_with_errors"],
+        "error_rate": _ratio(totals["processed_with_errors"], totals["items_processed"]),
+        "categories": {label: totals[field] for label, field in CATEGORIES.items()},
+        "category_mix": {label: _ratio(totals[field], categorized) for label, field in CATEGORIES.items()},
+        "active_sensors": totals["active_sensors"],
+        "inactive_sensors": totals["inactive_sensors"],
+        "energy_kwh": round(totals["energy_kwh"], 2),
+        "cost": round(totals["cost"], 2),
+    }
+
+
+def summary_querysets(user, filters):
+    """The three independent queries behind plant_summary(), unevaluated."""
+    plants = Plant.objects.filter(user=user)
+    readings = SensorData.objects.filter(owner=user)
+    energy = EnergyConsumption.objects.filter(plant__user=user)
+    if filters["plant_id"]:
+        plants = plants.filter(id=filters["plant_id"])
+        readings = readings.filter(plant_id=filters["plant_id"])
+        energy = energy.filter(plant_id=filters["plant_id"])
+
+    plants = plants.annotate(
+        active_sensors=Count("sensors", filter=Q(sensors__is_active=True)),
+        inactive_sensors=Count("sensors", filter=Q(sensors__is_active=False)),
+    ).values("id", "name", "plant_type", "active_sensors", "inactive_sensors").order_by("id")
+    readings = _window(readings, filters).values("plant_id").annotate(
+        **{field: Sum(field) for field in COUNTER_FIELDS}
+    ).order_by()
+    energy = _window(energy, filters).values("plant_id").annotate(
+        energy_kwh=Sum("energy_kwh"), cost=Sum("cost"),
+    ).order_by()
+    return plants, readings, energy
+
+
+def build_summary(filters, plants, readings, energy):
+    """Combine the rows of the summary_querysets() queries."""
+    reading_totals = {row.pop("plant_id"): row for row in readings}
+    energy_totals = {row.pop("plant_id"): row for row in energy}
+
+    overall = dict.fromkeys([*COUNTER_FIELDS, "active_sensors", "inactive_sensors", "energy_kwh", "cost"], 0)
+    results = []
+    for plant in plants:
+        totals = {
+            **dict.fromkeys(COUNTER_FIELDS, 0),
+            **reading_totals.get(plant["id"], {}),
+            "active_sensors": plant["active_sensors"],
+            "inactive_sensors": plant["inactive_sensors"],
+        }
+        plant_energy = energy_totals.get(plant["id"], {})
+        totals["energy_kwh"] = float(plant_energy.get("energy_kwh") or 0)
+        totals["cost"] = float(plant_energy.get("cost") or 0)
+        for key in overall:
+            overall[key] += totals[key]
+        results.append({
+            "plant": plant["id"],
+            "name": plant["name"],
+            "plant_type": plant["plant_type"],
+            **_kpis(totals),
+        })
+
+    return {
+        "start": filters["start"],
+        "end": filters["end"],
+        "totals": _kpis(overall),
+        "plants": results,
+    }
+
+
+def plant_summary(user, params):
+    """KPIs per plant owned by ``user`` (optionally just the ``plant`` param) plus overall totals."""
+    filters = sensor_data_filters(params)
+    return build_summary(filters, *summary_querysets(user, filters))
@@ -1,3 +1,809 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core import serializers
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import F, Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+try:
+    import msgpack
+except ImportError:  # optional; the MessagePack tests are skipped without it
+    msgpack = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional; the Arrow and Parquet tests are skipped without it
+    pa = pq = None
+
+from . import metrics_cache
+from .authentication import get_cache as auth_cache, user_cache_key
+from .benchmarks import authenticated_client, counting_hashes, fake_reading, make_fixtures, seed_sensor_data
+from .buffer import IngestBuffer, write_sensor_data
+from .compaction import compact, hour_start
+from .db_routers import PRIMARY_HEADER
+from .exports import SENSOR_DATA_EXPORT_COLUMNS
+from .models import EnergyConsumption, SensorData
+from .query_plans import check_plans
+from .renderers import to_columns
+from .serializers import SensorDataRowSerializer
+from .views import SensorDataViewSet
+
+# Per-process caches, so tests don't share state with a running server
+TEST_CACHES = {
+    alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"tests-{alias}"}
+    for alias in ("default", "metrics", "auth")
+}
+
+
+# -------------------------
+# Migrations
+# -------------------------
+class MigrationTests(TestCase):
+    databases = "__all__"
+
+    def test_models_match_migrations(self):
+        # A model change committed without its migration fails here
+        try:
+            call_command("makemigrations", "core", check=True, dry_run=True, verbosity=0)
+        except SystemExit:
+            self.fail("core models have changes without a migration; run makemigrations")
+
+
+# -------------------------
+# Query plans of the list endpoints
+# -------------------------
+@skipUnless(connection.vendor == "postgresql", "Query plans are checked on PostgreSQL.")
+class QueryPlanTests(TestCase):
+    """EXPLAIN the list queries against seeded, partitioned tables."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.checks = check_plans(rows=50000)
+
+    def test_list_queries_use_an_index(self):
+        for check in self.checks:
+            with self.subTest(check.label):
+                self.assertFalse(check.seq_scan, check.plan)
+
+    def test_date_filters_prune_partitions(self):
+        for check in self.checks:
+            if "start_date" not in check.query:
+                continue
+            with self.subTest(check.label):
+                self.assertNotIn(f"{check.table}_legacy", check.plan)
+                self.assertNotIn(f"{check.table}_default", check.plan)
+
+    def test_deep_cursor_pages_bound_the_index_scan(self):
+        # The cursor sits halfway through the user's rows; without a timestamp
+        # bound in the index condition every page scans from the newest row.
+        for check in self.checks:
+            if "cursor" not in check.query:
+                continue
+            with self.subTest(check.label):
+                index_conds = [line for line in check.plan.splitlines() if "Index Cond:" in line]
+                self.assertTrue(any('"timestamp" <=' in line for line in index_conds), check.plan)
+
+
+# -------------------------
+# Primary/replica routing
+# -------------------------
+# The test settings add a "replica" alias that mirrors "default", so both
+# aliases reach the same test database and only the connection a query ran on
+# tells them apart.
+@override_settings(CACHES=TEST_CACHES)
+class ReplicaRoutingTests(TestCase):
+    """Reads go to the replica; writes, pinned requests and recent writers stay on the primary."""
+
+    databases = {"default", "replica"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.plant, cls.sensors, items = make_fixtures()
+        seed_sensor_data(cls.sensors, items, rows=20)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = authenticated_client(self.user)
+
+    def request(self, method, url, **kwargs):
+        """Send a request; returns the response and the queries run on each alias."""
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections["replica"]) as replica:
+            response = getattr(self.client, method)(url, **kwargs)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        return response, len(primary), len(replica)
+
+    def assertReadsFrom(self, alias, method, url, **kwargs):
+        response, primary, replica = self.request(method, url, **kwargs)
+        self.assertLess(response.status_code, 500)
+        if alias == "replica":
+            self.assertGreater(replica, 0)
+            self.assertEqual(primary, 0)
+        else:
+            self.assertGreater(primary, 0)
+            self.assertEqual(replica, 0)
+        return response
+
+    def test_reads_use_the_replica(self):
+        urls = {
+            "list": "/api/sensor-data/",
+            "retrieve": f"/api/plants/{self.plant.id}/",
+            "metrics": "/api/sensor-data/metrics/?metric=production",
+            "export": "/api/sensor-data/export/",
+        }
+        for action, url in urls.items():
+            with self.subTest(action):
+                self.assertReadsFrom("replica", "get", url)
+
+    def test_writes_use_the_primary(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.assertReadsFrom(
+                "default", "post", "/api/sensor-data/", data=fake_reading(self.sensors[0]), format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+
+    def test_header_pins_reads_to_the_primary(self):
+        self.assertReadsFrom("default", "get", "/api/sensor-data/", headers={PRIMARY_HEADER: "1"})
+
+    def test_reads_after_a_write_stay_on_the_primary(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/sensor-data/", data=fake_reading(self.sensors[0]), format="json")
+        self.assertReadsFrom("default", "get", "/api/sensor-data/")
+
+        caches["auth"].clear()  # the sticky window has passed
+        self.assertReadsFrom("replica", "get", "/api/sensor-data/")
+
+
+# -------------------------
+# Endpoint behaviour
+# -------------------------
+# The mirrored replica can't see a TestCase's uncommitted rows, so these tests
+# read from the primary; replica routing has its own tests above.
+@override_settings(CACHES=TEST_CACHES, REPLICA_DATABASE=None)
+class EndpointTestCase(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+
+# -------------------------
+# Bulk ingestion
+# -------------------------
+class BulkIngestTests(EndpointTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.plant, cls.sensors, cls.items = make_fixtures()
+        other_user, other_plant, cls.other_sensors, cls.other_items = make_fixtures()
+
+    def setUp(self):
+        super().setUp()
+        self.client = authenticated_client(self.user)
+
+    def post(self, rows):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/sensor-data/bulk/", rows, format="json")
+
+    def test_valid_rows_are_created(self):
+        response = self.post([fake_reading(sensor) for sensor in self.sensors])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {"created": 4, "failed": 0, "errors": []})
+        self.assertEqual(SensorData.objects.filter(owner=self.user, plant=self.plant).count(), 4)
+
+    def test_rejected_rows_are_reported_by_index(self):
+        rows = [
+            fake_reading(self.sensors[0]),
+            {**fake_reading(self.sensors[0]), "items_scanned": "many"},
+            fake_reading(self.other_sensors[0]),
+            {**fake_reading(self.sensors[1]), "item": self.other_items[0].id},
+            {**fake_reading(self.sensors[1]), "item": self.items[0].id},
+        ]
+        response = self.post(rows)
+        self.assertEqual(response.status_code, 207)
+        body = response.json()
+        self.assertEqual((body["created"], body["failed"]), (2, 3))
+        self.assertEqual([error["index"] for error in body["errors"]], [1, 2, 3])
+        self.assertIn("items_scanned", body["errors"][0]["errors"])
+        self.assertIn("sensor", body["errors"][1]["errors"])
+        self.assertIn("item", body["errors"][2]["errors"])
+        # Nothing lands on another user's sensors
+        self.assertEqual(SensorData.objects.filter(owner=self.user).count(), 2)
+        self.assertFalse(SensorData.objects.filter(sensor__in=self.other_sensors).exists())
+
+    @override_settings(BULK_MAX_ROWS=2)
+    def test_payload_must_be_a_short_list(self):
+        self.assertEqual(self.post(fake_reading(self.sensors[0])).status_code, 400)
+        self.assertEqual(self.post([fake_reading(self.sensors[0])] * 3).status_code, 400)
+        self.assertFalse(SensorData.objects.filter(owner=self.user).exists())
+
+
+# -------------------------
+# Metrics downsampling
+# -------------------------
+class DownsamplingTests(EndpointTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.plant, sensors, items = make_fixtures()
+        seed_sensor_data(sensors, items, 500)
+
+    def setUp(self):
+        super().setUp()
+        self.client = authenticated_client(self.user)
+
+    def points(self, **query):
+        response = self.client.get("/api/sensor-data/metrics/", query)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_every_reading_without_max_points(self):
+        self.assertEqual(len(self.points(metric="production")), 500)
+
+    def test_downsampled_series_stay_within_max_points(self):
+        for mode in ("avg", "lttb"):
+            for metric in ("production", "weight", "quality"):
+                for max_points in (3, 50, 120):
+                    with self.subTest(mode=mode, metric=metric, max_points=max_points):
+                        points = self.points(metric=metric, max_points=max_points, downsample=mode)
+                        self.assertTrue(0 < len(points) <= max_points, len(points))
+
+    def test_max_points_must_be_in_range(self):
+        response = self.client.get("/api/sensor-data/metrics/", {"metric": "production", "max_points": 2})
+        self.assertEqual(response.status_code, 400)
+
+
+# -------------------------
+# Streaming exports
+# -------------------------
+# Small chunk sizes so every export spans several chunks
+@mock.patch.object(SensorDataViewSet, "export_chunk_size", 7)
+@mock.patch.object(SensorDataViewSet, "arrow_chunk_size", 16)
+class ExportTests(EndpointTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.plant, sensors, items = make_fixtures()
+        seed_sensor_data(sensors, items, 40)
+        other_user, other_plant, other_sensors, other_items = make_fixtures()
+        seed_sensor_data(other_sensors, other_items, 5)
+
+    def setUp(self):
+        super().setUp()
+        self.client = authenticated_client(self.user)
+
+    def export(self, export_format):
+        response = self.client.get("/api/sensor-data/export/", {"export_format": export_format})
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def expected(self):
+        return list(
+            SensorData.objects.filter(owner=self.user).values_list(
+                "id", "sensor__name", "item_id", "timestamp", "items_scanned", "current_weight_kg"
+            )
+        )
+
+    def test_csv_round_trips_the_rows(self):
+        rows = list(csv.DictReader(io.StringIO(self.export("csv").decode())))
+        self.assertEqual(list(rows[0]), [name for name, _ in SENSOR_DATA_EXPORT_COLUMNS])
+        self.assertEqual(
+            [
+                (
+                    int(row["id"]), row["sensor_name"], int(row["item"]) if row["item"] else None,
+                    datetime.fromisoformat(row["timestamp"]), int(row["items_scanned"]),
+                    Decimal(row["current_weight_kg"]),
+                )
+                for row in rows
+            ],
+            self.expected(),
+        )
+
+    def test_ndjson_round_trips_the_rows(self):
+        rows = [json.loads(line) for line in self.export("ndjson").decode().splitlines()]
+        # DjangoJSONEncoder writes timestamps to the millisecond
+        expected = [
+            (*row[:3], row[3].replace(microsecond=row[3].microsecond // 1000 * 1000), *row[4:])
+            for row in self.expected()
+        ]
+        self.assertEqual(
+            [
+                (
+                    row["id"], row["sensor_name"], row["item"], datetime.fromisoformat(row["timestamp"]),
+                    row["items_scanned"], Decimal(row["current_weight_kg"]),
+                )
+                for row in rows
+            ],
+            expected,
+        )
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get("/api/sensor-data/export/", {"export_format": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    def arrow_rows(self, table):
+        return [
+            (row["id"], row["sensor_name"], row["item"], row["timestamp"], row["items_scanned"],
+             row["current_weight_kg"])
+            for row in table.to_pylist()
+        ]
+
+    def assert_arrow_schema(self, schema):
+        self.assertEqual(schema.names, [name for name, _ in SENSOR_DATA_EXPORT_COLUMNS])
+        self.assertEqual(schema.field("current_weight_kg").type, pa.decimal128(10, 2))
+        self.assertEqual(schema.field("timestamp").type, pa.timestamp("us", tz="UTC"))
+
+    @skipUnless(pa, "pyarrow is not installed")
+    def test_arrow_round_trips_the_rows(self):
+        reader = pa.ipc.open_stream(self.export("arrow"))
+        self.assert_arrow_schema(reader.schema)
+        batches = list(reader)
+        # 40 rows in record batches of 16
+        self.assertEqual([batch.num_rows for batch in batches], [16, 16, 8])
+        self.assertEqual(self.arrow_rows(pa.Table.from_batches(batches)), self.expected())
+
+    @skipUnless(pa, "pyarrow is not installed")
+    def test_parquet_round_trips_the_rows(self):
+        parquet = pq.ParquetFile(io.BytesIO(self.export("parquet")))
+        self.assert_arrow_schema(parquet.schema_arrow)
+        self.assertEqual(parquet.num_row_groups, 3)
+        self.assertEqual(self.arrow_rows(parquet.read()), self.expected())
+
+    def test_arrow_formats_need_pyarrow(self):
+        with mock.patch("core.views.arrow_available", return_value=False):
+            for export_format in ("arrow", "parquet"):
+                response = self.client.get("/api/sensor-data/export/", {"export_format": export_format})
+                self.assertEqual(response.status_code, 501)
+
+
+# -------------------------
+# Metrics cache
+# -------------------------
+class MetricsCacheTests(EndpointTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.plant, cls.sensors, items = make_fixtures(sensors=2)
+        seed_sensor_data(cls.sensors, items, 20)
+
+    def setUp(self):
+        super().setUp()
+        self.client = authenticated_client(self.user)
+
+    def metrics(self, **query):
+        response = self.client.get("/api/sensor-data/metrics/", {"metric": "production", **query})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def hits(self):
+        return metrics_cache.stats()["sensor-data:production"]["hits"]
+
+    def write(self, sensor):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/sensor-data/", fake_reading(sensor), format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_repeated_request_is_served_from_the_cache(self):
+        first = self.metrics()
+        hits = self.hits()
+        self.assertEqual(self.metrics(), first)
+        self.assertEqual(self.hits(), hits + 1)
+
+    def test_a_write_changes_the_cached_metrics(self):
+        sensor = self.sensors[0]
+        for query in ({}, {"plant": self.plant.id}, {"sensor": sensor.id}):
+            with self.subTest(query=query):
+                before = self.metrics(**query)
+                self.write(sensor)
+                after = self.metrics(**query)
+                self.assertEqual(len(after), len(before) + 1)
+
+    def test_a_write_keeps_other_sensors_cached(self):
+        cached = self.metrics(sensor=self.sensors[1].id)
+        self.write(self.sensors[0])
+        hits = self.hits()
+        self.assertEqual(self.metrics(sensor=self.sensors[1].id), cached)
+        self.assertEqual(self.hits(), hits + 1)
+
+
+# -------------------------
+# Compaction
+# -------------------------
+COUNTERS = (
+    "items_scanned", "items_processed", "items_discarded", "processed_with_errors",
+    "category_a", "category_b", "category_c", "category_d", "readings",
+)
+
+
+class CompactionTests(EndpointTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.plant, sensors, items = make_fixtures(sensors=2)
+        old = timezone.now() - timedelta(days=40)
+        readings, energy = [], []
+        for sensor in sensors:
+            # 30 readings 7 minutes apart: four hours, two items, every fifth without a weight
+            for n in range(30):
+                data = fake_reading(sensor, old + timedelta(minutes=7 * n))
+                data.pop("sensor")
+                if n % 5 == 0:
+                    data["current_weight_kg"] = None
+                readings.append(SensorData(
+                    sensor=sensor, plant=cls.plant, owner=cls.user, item=items[n % 2], **data
+                ))
+                energy.append(EnergyConsumption(
+                    sensor=sensor, plant=cls.plant, timestamp=old + timedelta(minutes=7 * n),
+                    energy_kwh=Decimal(n) / 4, cost=Decimal(n) / 10,
+                ))
+        SensorData.objects.bulk_create(readings)
+        EnergyConsumption.objects.bulk_create(energy)
+        seed_sensor_data(sensors, items, 10)
+
+    def totals(self):
+        sensor_data = SensorData.objects.filter(owner=self.user)
+        weighed = sensor_data.filter(current_weight_kg__isnull=False)
+        return {
+            **sensor_data.aggregate(*(Sum(name) for name in COUNTERS)),
+            "weighed_readings": weighed.aggregate(n=Sum("readings"))["n"],
+            "weight": float(weighed.aggregate(w=Sum(F("current_weight_kg") * F("readings")))["w"]),
+            **EnergyConsumption.objects.filter(plant=self.plant).aggregate(Sum("energy_kwh"), Sum("cost")),
+        }
+
+    def test_compaction_preserves_totals_and_reading_counts(self):
+        before = self.totals()
+        # Small batches, so each sensor is compacted over several windows
+        reports = {report["table"]: report for report in compact(older_than_days=30, batch_size=8)}
+
+        self.assertEqual(reports["sensor-data"]["raw_rows"], 60)
+        self.assertEqual(reports["energy"]["raw_rows"], 60)
+        self.assertGreater(reports["sensor-data"]["batches"], 2)
+        self.assertLess(SensorData.objects.filter(owner=self.user, compacted=True).count(), 60)
+        # Recent readings are left alone
+        self.assertEqual(SensorData.objects.filter(owner=self.user, compacted=False).count(), 10)
+
+        after = self.totals()
+        # Compacted weights are averages rounded to the cent
+        self.assertAlmostEqual(after.pop("weight"), before.pop("weight"), delta=0.005 * 60)
+        self.assertEqual(after, before)
+
+    def test_compacted_rows_are_hourly_per_sensor_and_item(self):
+        compact(older_than_days=30, batch_size=8)
+        rows = SensorData.objects.filter(owner=self.user, compacted=True)
+        for row in rows:
+            self.assertEqual(row.timestamp, hour_start(row.timestamp))
+        # One row per sensor, item and hour, and another for the readings without a weight
+        keys = [(row.sensor_id, row.item_id, row.timestamp, row.current_weight_kg is None) for row in rows]
+        self.assertEqual(len(keys), len(set(keys)))
+
+    def test_a_second_run_has_nothing_to_do(self):
+        compact(older_than_days=30, batch_size=8)
+        before = self.totals()
+        self.assertEqual([report["raw_rows"] for report in compact(older_than_days=30)], [0, 0])
+        self.assertEqual(self.totals(), before)
+
+
+# -------------------------
+# Authentication
+# -------------------------
+class AuthCacheTests(EndpointTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, plant, sensors, items = make_fixtures(sensors=0, items=0)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        self.key = user_cache_key(self.user.pk)
+
+    def me(self):
+        return self.client.get("/api/auth/me/")
+
+    def test_requests_reuse_the_cached_user(self):
+        self.assertEqual(self.me().status_code, 200)
+        self.assertIsNotNone(auth_cache().get(self.key))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.me().status_code, 200)
+        self.assertEqual(len(queries), 0)
+
+    def test_profile_update_clears_the_cached_user(self):
+        self.me()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put("/api/auth/update_profile/", {"username": "renamed"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(auth_cache().get(self.key))
+        self.assertEqual(self.me().json()["username"], "renamed")
+
+    def test_deactivation_clears_the_cached_user(self):
+        self.me()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertIsNone(auth_cache().get(self.key))
+        self.assertEqual(self.me().status_code, 401)
+
+
+# A cheap hashing cost; the tests count hashes, not time
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class LoginTests(EndpointTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, plant, sensors, items = make_fixtures(sensors=0, items=0)
+        cls.user.set_password("correct horse")
+        cls.user.save()
+
+    def login(self, password="correct horse"):
+        with counting_hashes() as hashes:
+            response = APIClient().post(
+                "/api/auth/login/", {"email": self.user.email, "password": password}, format="json"
+            )
+        return response.status_code, len(hashes)
+
+    def stored_iterations(self):
+        self.user.refresh_from_db()
+        return int(self.user.password.split("$")[1])
+
+    def test_a_login_hashes_the_password_once(self):
+        self.assertEqual(self.login(), (200, 1))
+        self.assertEqual(self.login("wrong"), (400, 1))
+
+    def test_a_new_iteration_count_rehashes_on_the_next_login(self):
+        self.assertEqual(self.stored_iterations(), 1000)
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            # Verify with the old count, then store a hash with the new one
+            self.assertEqual(self.login(), (200, 2))
+            self.assertEqual(self.stored_iterations(), 2000)
+            self.assertEqual(self.login(), (200, 1))
+
+
+# -------------------------
+# Conditional GET
+# -------------------------
+class ConditionalGetTests(EndpointTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.plant, cls.sensors, items = make_fixtures(sensors=1)
+        seed_sensor_data(cls.sensors, items, 5)
+
+    def setUp(self):
+        super().setUp()
+        self.client = authenticated_client(self.user)
+
+    def test_unchanged_data_answers_304_then_a_write_changes_the_etag(self):
+        for url, query in (
+            ("/api/sensor-data/", {}),
+            ("/api/sensor-data/metrics/", {"metric": "production"}),
+            ("/api/plants/summary/", {}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url, query)
+                self.assertEqual(response.status_code, 200)
+                etag = response["ETag"]
+
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, query, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+                # Answered before the readings are read
+                self.assertFalse(any("core_sensordata" in q["sql"] for q in queries.captured_queries))
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.post("/api/sensor-data/", fake_reading(self.sensors[0]), format="json")
+                response = self.client.get(url, query, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_depends_on_the_query(self):
+        production = self.client.get("/api/sensor-data/metrics/", {"metric": "production"})
+        weight = self.client.get("/api/sensor-data/metrics/", {"metric": "weight"})
+        self.assertNotEqual(production["ETag"], weight["ETag"])
+        response = self.client.get(
+            "/api/sensor-data/metrics/", {"metric": "weight"}, HTTP_IF_NONE_MATCH=production["ETag"]
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+# -------------------------
+# Response formats
+# -------------------------
+class ResponseFormatTests(EndpointTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.plant, sensors, items = make_fixtures()
+        seed_sensor_data(sensors, items, 30)
+
+    def setUp(self):
+        super().setUp()
+        self.client = authenticated_client(self.user)
+
+    def get(self, url, query, **headers):
+        response = self.client.get(url, query, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_columns_hold_the_same_values_as_rows(self):
+        rows = self.get("/api/sensor-data/", {}).json()
+        columns = self.get("/api/sensor-data/", {"shape": "columns"}).json()
+        self.assertEqual(columns["count"], rows["count"])
+        self.assertEqual(columns["results"], to_columns(rows["results"], []))
+
+        query = {"metric": "weight"}
+        rows = self.get("/api/sensor-data/metrics/", query).json()
+        columns = self.get("/api/sensor-data/metrics/", {**query, "shape": "columns"}).json()
+        self.assertEqual(list(columns), ["timestamp", "current_weight_kg", "readings", "compacted"])
+        self.assertEqual(columns, to_columns(rows, []))
+
+    def test_empty_results_keep_their_columns(self):
+        # Nothing is that old
+        query = {"shape": "columns", "end": "2000-01-01"}
+        self.assertEqual(
+            self.get("/api/sensor-data/", query).json()["results"],
+            {name: [] for name in SensorDataRowSerializer().names},
+        )
+        self.assertEqual(
+            self.get("/api/sensor-data/metrics/", {**query, "metric": "quality"}).json(),
+            {name: [] for name in ("timestamp", "category_a", "category_b", "category_c", "category_d",
+                                   "readings", "compacted")},
+        )
+        self.assertEqual(
+            self.get("/api/sensor-data/metrics/", {**query, "metric": "production", "max_points": 10}).json(),
+            {name: [] for name in ("timestamp", "items_scanned", "items_processed", "items_discarded",
+                                   "processed_with_errors")},
+        )
+
+    def test_unknown_shape_is_rejected(self):
+        response = self.client.get("/api/sensor-data/", {"shape": "cube"})
+        self.assertEqual(response.status_code, 400)
+
+    @skipUnless(msgpack, "msgpack is not installed")
+    def test_msgpack_carries_the_json_data(self):
+        for query in ({}, {"shape": "columns"}, {"shape": "columns", "end": "2000-01-01"}):
+            for url, extra in (("/api/sensor-data/", {}), ("/api/sensor-data/metrics/", {"metric": "production"})):
+                with self.subTest(url=url, query=query):
+                    expected = self.get(url, {**query, **extra}).json()
+                    response = self.get(url, {**query, **extra}, HTTP_ACCEPT="application/msgpack")
+                    self.assertEqual(response["Content-Type"], "application/msgpack")
+                    self.assertEqual(msgpack.unpackb(response.content), expected)
+
+
+# -------------------------
+# Plant summary
+# -------------------------
+class PlantSummaryTests(EndpointTestCase):
+    """Readings and energy totals cover the same window."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.plant, sensors, items = make_fixtures(sensors=1)
+        now = timezone.now()
+        # 2 days ago: inside every window below; 6 days ago: in the last week
+        # but not the last 3 days; 20 days ago: outside both
+        for days, scanned, kwh in ((2, 10, "1.50"), (6, 5, "0.25"), (20, 100, "20.00")):
+            timestamp = now - timedelta(days=days)
+            SensorData.objects.create(
+                sensor=sensors[0], plant=cls.plant, owner=cls.user, timestamp=timestamp, items_scanned=scanned
+            )
+            EnergyConsumption.objects.create(
+                sensor=sensors[0], plant=cls.plant, timestamp=timestamp, energy_kwh=Decimal(kwh), cost=Decimal("1.00")
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.client = authenticated_client(self.user)
+
+    def totals(self, query):
+        response = self.client.get("/api/plants/summary/", query)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["totals"]
+
+    def test_start_and_end_window_both_totals(self):
+        today = timezone.localdate()
+        totals = self.totals({"start": (today - timedelta(days=3)).isoformat(), "end": today.isoformat()})
+        self.assertEqual(totals["items_scanned"], 10)
+        self.assertEqual(totals["energy_kwh"], 1.5)
+        self.assertEqual(totals["cost"], 1.0)
+
+    def test_date_filter_windows_both_totals(self):
+        totals = self.totals({"date_filter": "week"})
+        self.assertEqual(totals["items_scanned"], 15)
+        self.assertEqual(totals["energy_kwh"], 1.75)
+        self.assertEqual(totals["cost"], 2.0)
+
+    def test_no_window_sums_everything(self):
+        totals = self.totals({})
+        self.assertEqual(totals["items_scanned"], 115)
+        self.assertEqual(totals["energy_kwh"], 21.75)
+
+
+# -------------------------
+# Write-behind ingestion buffer
+# -------------------------
+class IngestBufferTests(EndpointTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.plant, cls.sensors, items = make_fixtures()
+
+    def setUp(self):
+        super().setUp()
+        # The flush thread drops broken connections; here that would close the
+        # test's own transaction
+        patcher = mock.patch("core.buffer.close_old_connections")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def buffered(self, *scanned):
+        """A buffer holding one reading per ``scanned`` value; no flush thread."""
+        buffer = IngestBuffer("sensor-data", write_sensor_data, batch_size=100)
+        with mock.patch.object(buffer, "_ensure_thread"):
+            buffer.submit([
+                (self.user, SensorData(sensor=self.sensors[0], plant=self.plant, owner=self.user, items_scanned=n))
+                for n in scanned
+            ])
+        return buffer
+
+    def written(self):
+        return sorted(SensorData.objects.filter(owner=self.user).values_list("items_scanned", flat=True))
+
+    def serving(self, **options):
+        """Route buffered POSTs to a fresh sensor-data buffer; no flush thread."""
+        buffer = IngestBuffer("sensor-data", write_sensor_data, **options)
+        for patcher in (
+            mock.patch.dict("core.buffer._buffers", {"sensor-data": buffer}),
+            mock.patch.object(buffer, "_ensure_thread"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return buffer
+
+    def post(self, scanned):
+        client = authenticated_client(self.user)
+        reading = {**fake_reading(self.sensors[0]), "items_scanned": scanned}
+        return client.post("/api/sensor-data/", reading, format="json")
+
+    def test_a_rejected_row_only_drops_itself(self):
+        buffer = self.buffered(1, 2, -1, 3, 4)
+        with self.assertLogs("core.buffer", "ERROR") as logs:
+            buffer.flush()
+
+        self.assertEqual(self.written(), [1, 2, 3, 4])
+        self.assertEqual((buffer.stats()["written"], buffer.stats()["failed"]), (4, 1))
+        # The dropped row is logged in a form loaddata can write back
+        dropped = [obj.object for obj in serializers.deserialize("json", logs.records[-1].args[-1])]
+        self.assertEqual([(row.pk, row.items_scanned) for row in dropped], [(None, -1)])
+
+    def test_flush_writes_the_queue_in_batches(self):
+        buffer = self.buffered(1, 2, 3, 4, 5)
+        buffer.batch_size = 2
+        self.assertEqual([buffer.flush_once() for _ in range(4)], [2, 2, 1, 0])
+        self.assertEqual(self.written(), [1, 2, 3, 4, 5])
+        stats = buffer.stats()
+        self.assertEqual((stats["depth"], stats["written"], stats["failed"], stats["flushes"]), (0, 5, 0, 3))
+
+    @override_settings(INGEST_BUFFERED=True)
+    def test_posts_are_queued_until_flushed(self):
+        buffer = self.serving()
+        self.assertEqual(self.post(7).status_code, 202)
+        self.assertEqual(self.written(), [])
+        buffer.flush()
+        self.assertEqual(self.written(), [7])
+
+    @override_settings(INGEST_BUFFERED=True)
+    def test_full_buffer_answers_503_with_retry_after(self):
+        buffer = self.serving(max_size=1, flush_interval=3)
+        self.assertEqual(self.post(1).status_code, 202)
+        response = self.post(2)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "3")
+        self.assertEqual((buffer.stats()["accepted"], buffer.stats()["rejected"]), (1, 1))
+        # Room again once the queue is written out
+        buffer.flush()
+        self.assertEqual(self.post(3).status_code, 202)
@@ -8,8 +8,10 @@ from rest_framework_simplejwt.views import TokenRefreshView
 # )
 
 from .views import (
-    AuthViewSet,PlantViewSet,SensorViewSet,ItemViewSet,SensorDataViewSet ,EnergyConsumptionViewSet
+    AuthViewSet,PlantViewSet,SensorViewSet,ItemViewSet,SensorDataViewSet ,EnergyConsumptionViewSet,
+    MetricsCacheViewSet, IngestBufferViewSet
 )
+from . import async_views, realtime
 
 router = DefaultRouter()
 router.register('plants', PlantViewSet,basename='plants')
@@ -18,8 +20,17 @@ router.register('energy', EnergyConsumptionViewSet , basename='energy')
 router.register('items', ItemViewSet, basename='items')
 router.register('sensor-data', SensorDataViewSet ,basename='sensor-data')
 router.register('auth', AuthViewSet, basename='auth')  # 👈 Auth using ViewSet
+router.register('metrics-cache', MetricsCacheViewSet, basename='metrics-cache')
+router.register('ingest-buffer', IngestBufferViewSet, basename='ingest-buffer')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('stream/', realtime.stream, name='stream'),  # live readings (SSE)
+    # Async variants for ASGI deployments (core.async_views)
+    path('async/sensor-data/metrics/', async_views.sensor_data_metrics, name='async-sensor-data-metrics'),
+    path('async/sensor-data/bulk/', async_views.sensor_data_bulk, name='async-sensor-data-bulk'),
+    path('async/energy/metrics/', async_views.energy_metrics, name='async-energy-metrics'),
+    path('async/energy/bulk/', async_views.energy_bulk, name='async-energy-bulk'),
+    path('async/dashboard/', async_views.dashboard, name='async-dashboard'),
 ]
@@ -1,23 +1,34 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import PageNumberPagination
-from django.utils import timezone
-from django.utils.dateparse import parse_datetime
-from datetime import timedelta
-from datetime import datetime
-from django.db.models.functions import TruncDate
-from django.db.models import Sum
+from django.db.models.functions import Cast, Coalesce, TruncDate
+from django.db.models import F, FloatField, Sum
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from copy import copy
 
 
-from django.contrib.auth import authenticate
-from django.contrib.auth.hashers import check_password, make_password
-
 from .models import CustomUser, Plant, Sensor,Item, SensorData,EnergyConsumption
+from .filters import sensor_data_filters, sensor_data_queryset, energy_filters, energy_queryset
+from .exports import (
+    ARROW_FORMATS, EXPORT_FORMATS, SENSOR_DATA_EXPORT_COLUMNS, ENERGY_EXPORT_COLUMNS,
+    arrow_available, streaming_export
+)
+from .downsampling import DOWNSAMPLE_MODES, LTTB_SERIES, downsample, lttb
+from .efficiency import GRAINS as EFFICIENCY_GRAINS, efficiency_series
+from .pagination import PageNumberOrKeysetPagination
+from .renderers import SHAPES, renderer_classes, to_columns
+from . import analytics, buffer, db_routers, ingest, metrics_cache
+from .authentication import forget_user
+from .realtime import publish_energy, publish_sensor_data
+from .rollups import RESOLUTIONS, record_readings, retract_readings, rollup_metrics
+from .summary import plant_summary
 from .serializers import (
     RegisterSerializer,
     LoginSerializer,
@@ -28,7 +39,9 @@ from .serializers import (
     MeSerializer,
     ItemSerializer,
     SensorDataSerializer,
-    EnergyConsumptionSerializer
+    SensorDataRowSerializer,
+    EnergyConsumptionSerializer,
+    EnergyConsumptionRowSerializer
 )
 
 class AuthViewSet(viewsets.ViewSet):
@@ -47,22 +60,16 @@ class AuthViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
     def login(self, request):
-        serializer = LoginSerializer(data=request.data)
+        serializer = LoginSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            email = serializer.validated_data['email']
-            password = serializer.validated_data['password']
-            
-            user = authenticate(request, username=email, password=password)  
-            
-            if user:
-                refresh = RefreshToken.for_user(user)
-                return Response({
-                    "user": UserSerializer(user).data,
-                    "access_token": str(refresh.access_token),
-                    "refresh_token": str(refresh)
-                }, status=status.HTTP_200_OK)
-            return Response({"error": "Invalid Credentials"}, status=status.HTTP_400_BAD_REQUEST)
-        
+            user = serializer.validated_data['user']
+            refresh = RefreshToken.for_user(user)
+            return Response({
+                "user": UserSerializer(user).data,
+                "access_token": str(refresh.access_token),
+                "refresh_token": str(refresh)
+            }, status=status.HTTP_200_OK)
+
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
@@ -74,6 +81,7 @@ class AuthViewSet(viewsets.ViewSet):
                 return Response({"error": "Refresh token is required"}, status=status.HTTP_400_BAD_REQUEST)
             token = RefreshToken(refresh_token)
             token.blacklist()
+            forget_user(request.user.pk)
             return Response({"message": "Successfully logged out"}, status=status.HTTP_200_OK)
         except TokenError as e:
             return Response({"error": "Invalid token"}, status=status.HTTP_400_BAD_REQUEST)
@@ -92,7 +100,8 @@ class AuthViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['put'], permission_classes=[IsAuthenticated])
     def update_profile(self, request):
         try:
-            user = request.user
+            # request.user may come from the auth cache; save a fresh copy
+            user = CustomUser.objects.get(pk=request.user.pk)
             data = request.data
 
             # Update profile details
@@ -110,12 +119,12 @@ class AuthViewSet(viewsets.ViewSet):
             confirm_password = data.get("confirmPassword")
 
             if current_password and new_password:
-                if not check_password(current_password, user.password):
+                if not user.check_password(current_password):
                     return Response({"error": "Current password is incorrect"}, status=status.HTTP_400_BAD_REQUEST)
                 if new_password != confirm_password:
                     return Response({"error": "New passwords do not match"}, status=status.HTTP_400_BAD_REQUEST)
 
-                user.password = make_password(new_password)
+                user.set_password(new_password)
                 user.save()
 
             return Response({
@@ -132,10 +141,105 @@ class AuthViewSet(viewsets.ViewSet):
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
     
+# -------------------------
+# Read replica routing
+# -------------------------
+class ReplicaReadMixin:
+    # Safe requests to these actions read from the replica (core.db_routers)
+    # unless the user just wrote or asked for the primary.
+    replica_actions = ("list", "retrieve", "metrics", "get_metrics", "export", "summary", "anomalies")
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (request.method in permissions.SAFE_METHODS and self.action in self.replica_actions
+                and db_routers.replica_alias() and not db_routers.is_pinned(request)):
+            db_routers.read_from_replica()
+
+
+# -------------------------
+# Conditional GET
+# -------------------------
+class ConditionalResponse(Exception):
+    # A 304 (or 412 for a failed If-Match) answered before the handler runs
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class ConditionalGetMixin:
+    # GETs of these actions carry an ETag and, once its second has passed, a
+    # Last-Modified built from the metrics-cache scope markers
+    # (metrics_cache.validators). A request whose If-None-Match /
+    # If-Modified-Since still matches gets a 304 before the main query runs.
+    conditional_actions = ("list", "metrics", "get_metrics", "summary")
+    conditional_validators = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in ("GET", "HEAD") and self.action in self.conditional_actions:
+            endpoint = f"{self.basename}:{self.action}:{request.accepted_renderer.format}"
+            etag, last_modified = self.conditional_validators = metrics_cache.validators(
+                endpoint, request.user, request.query_params
+            )
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                raise ConditionalResponse(response.status_code)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, ConditionalResponse):
+            return Response(status=exc.status_code)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.conditional_validators and response.status_code in (200, 304):
+            etag, last_modified = self.conditional_validators
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+            # Revalidate every time; the data is per user
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ["Authorization"])
+        return response
+
+
+# -------------------------
+# Response formats
+# -------------------------
+class ResponseFormatMixin:
+    # Lists and metrics in JSON or MessagePack, as rows or as columns
+    # (?shape=columns); see core.renderers. Viewsets list the fields of each
+    # metric in metric_columns(params).
+    renderer_classes = renderer_classes()
+    shape_actions = ("list", "metrics", "get_metrics")
+    columns = False
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        shape = request.query_params.get("shape", "rows")
+        if shape not in SHAPES:
+            raise ValidationError({"shape": f"Expected one of: {', '.join(SHAPES)}"})
+        self.columns = shape == "columns" and self.action in self.shape_actions
+
+    def column_names(self):
+        """Fields of this action's rows; an empty result still gets an empty column for each."""
+        if self.action == "list":
+            return self.row_serializer_class().names
+        return self.metric_columns(self.request.query_params)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.columns and response.status_code == status.HTTP_200_OK:
+            data = response.data
+            if isinstance(data, list):
+                response.data = to_columns(data, self.column_names())
+            elif isinstance(data, dict) and isinstance(data.get("results"), list):
+                response.data = {**data, "results": to_columns(data["results"], self.column_names())}
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
 # -------------------------
 # Plant ViewSet
 # -------------------------
-class PlantViewSet(viewsets.ModelViewSet):
+class PlantViewSet(ConditionalGetMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = PlantSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -143,13 +247,33 @@ class PlantViewSet(viewsets.ModelViewSet):
         return Plant.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        plant = serializer.save(user=self.request.user)
+        metrics_cache.invalidate(self.request.user, plants=[plant.id])
+
+    def perform_update(self, serializer):
+        plant = serializer.save()
+        # Readings carry the plant name, so their sensor scopes change too
+        metrics_cache.invalidate(
+            self.request.user, plants=[plant.id], sensors=plant.sensors.values_list("id", flat=True)
+        )
+
+    def perform_destroy(self, instance):
+        metrics_cache.invalidate(self.request.user, plants=[instance.id])
+        instance.delete()
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """
+        Dashboard KPIs per plant for a window (start/end or date_filter,
+        optionally one plant), in a fixed number of queries.
+        """
+        return Response(plant_summary(request.user, request.query_params))
 
 
 # -------------------------
 # Sensor ViewSet
 # -------------------------
-class SensorViewSet(viewsets.ModelViewSet):
+class SensorViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = SensorSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -187,14 +311,23 @@ class SensorViewSet(viewsets.ModelViewSet):
         except Plant.DoesNotExist:
             raise ValidationError({"plant": "Invalid plant or not owned by you."})
 
-        serializer.save(plant=plant)
+        sensor = serializer.save(plant=plant)
+        metrics_cache.invalidate(self.request.user, plants=[plant.id], sensors=[sensor.id])
+
+    def perform_update(self, serializer):
+        sensor = serializer.save()
+        metrics_cache.invalidate(self.request.user, plants=[sensor.plant_id], sensors=[sensor.id])
+
+    def perform_destroy(self, instance):
+        metrics_cache.invalidate(self.request.user, plants=[instance.plant_id], sensors=[instance.id])
+        instance.delete()
 
 
 
 # -------------------------
 # Item ViewSet
 # -------------------------
-class ItemViewSet(viewsets.ModelViewSet):
+class ItemViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = ItemSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -215,6 +348,60 @@ class ItemViewSet(viewsets.ModelViewSet):
             raise ValidationError({"plant": "Invalid or unauthorized plant"})
         serializer.save(plant=plant)
 
+    def perform_update(self, serializer):
+        item = serializer.save()
+        self.invalidate_readings(item)
+
+    def perform_destroy(self, instance):
+        self.invalidate_readings(instance)
+        instance.delete()
+
+    def invalidate_readings(self, item):
+        # Readings show the item's name
+        metrics_cache.invalidate(
+            self.request.user, plants=[item.plant_id],
+            sensors=Sensor.objects.filter(plant_id=item.plant_id).values_list("id", flat=True)
+        )
+
+# -------------------------
+# Write-behind ingestion (INGEST_BUFFERED)
+# -------------------------
+class BufferedCreateMixin:
+    buffer_name = None
+
+    def enqueue(self, instance):
+        """Queue an unsaved, validated instance for the background writer; 202 or 503."""
+        ingest_buffer = buffer.get_buffer(self.buffer_name)
+        try:
+            ingest_buffer.submit([(self.request.user, instance)])
+        except buffer.BufferFull:
+            return Response(
+                {"error": "Ingest buffer is full, retry later"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(ingest_buffer.retry_after())}
+            )
+        return Response({"status": "queued"}, status=status.HTTP_202_ACCEPTED)
+
+
+# -------------------------
+# Fast list responses
+# -------------------------
+class ValuesListMixin:
+    # list() renders pages fetched with .values() through a ValuesRowSerializer:
+    # one joined query per page and no ModelSerializer per row. retrieve/create/
+    # update keep using serializer_class.
+    row_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        row_serializer = self.row_serializer_class()
+        queryset = row_serializer.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(row_serializer.to_representation(page))
+        return Response(row_serializer.to_representation(queryset))
+
+
 # -------------------------
 # SensorData ViewSet
 # -------------------------
@@ -224,108 +411,220 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 100
 
 
-class SensorDataViewSet(viewsets.ModelViewSet):
+class SensorDataPagination(PageNumberOrKeysetPagination):
+    # ?cursor= / ?pagination=cursor for constant-cost deep pages
+    page_number_class = StandardResultsSetPagination
+
+
+class SensorDataViewSet(ResponseFormatMixin, ConditionalGetMixin, ReplicaReadMixin, ValuesListMixin, BufferedCreateMixin, viewsets.ModelViewSet):
     serializer_class = SensorDataSerializer
+    row_serializer_class = SensorDataRowSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
-
-    def parse_date_safe(self, date_str):
-        dt = parse_datetime(date_str)
-        if not dt:
-            try:
-                dt = datetime.strptime(date_str, "%Y-%m-%d")
-            except ValueError:
-                return None
-        return timezone.make_aware(dt) if timezone.is_naive(dt) else dt
+    pagination_class = SensorDataPagination
+    buffer_name = "sensor-data"
+    max_chart_points = 10000
+    export_chunk_size = 2000
+    arrow_chunk_size = 20000  # rows per record batch / Parquet row group
+    metric_fields = {
+        "production": ["items_scanned", "items_processed", "items_discarded", "processed_with_errors"],
+        "weight": ["current_weight_kg"],
+        "quality": ["category_a", "category_b", "category_c", "category_d"],
+    }
 
     def get_queryset(self):
-        qs = SensorData.objects.filter(sensor__plant__user=self.request.user)
-        params = self.request.query_params
-
-        sensor_id = params.get("sensor") or params.get("sensor_id")
-        plant_id = params.get("plant") or params.get("plant_id")
-        item_id = params.get("item") or params.get("item_id")
-        start = params.get("start") or params.get("start_date")
-        end = params.get("end") or params.get("end_date")
-        date_filter = params.get("date_filter")  # today, week, month
-        categories = params.getlist("category")
-
-        # Safe parsing
-        if isinstance(start, str):
-            start = self.parse_date_safe(start)
-        if isinstance(end, str):
-            end = self.parse_date_safe(end)
-            if end:
-                # Extend end to end of day
-                end = end.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-        now = timezone.now()
-        if not start and date_filter == "today":
-            start = now.replace(hour=0, minute=0, second=0)
-        elif not start and date_filter == "week":
-            start = now - timedelta(days=7)
-        elif not start and date_filter == "month":
-            start = now - timedelta(days=30)
-
-        if start and timezone.is_naive(start):
-            start = timezone.make_aware(start)
-        if end and timezone.is_naive(end):
-            end = timezone.make_aware(end)
-
-        if plant_id and not sensor_id:
-            qs = qs.filter(sensor__plant_id=plant_id)
-        elif sensor_id:
-            qs = qs.filter(sensor_id=sensor_id)
-            if plant_id:
-                qs = qs.filter(sensor__plant_id=plant_id)
-
-        if item_id:
-            qs = qs.filter(item_id=item_id)
-        if start:
-            qs = qs.filter(timestamp__gte=start)
-        if end:
-            qs = qs.filter(timestamp__lte=end)
-
-        cat_fields = {
-            "A": "category_a__gt",
-            "B": "category_b__gt",
-            "C": "category_c__gt",
-            "D": "category_d__gt"
-        }
-        filter_map = {cat_fields[c]: 0 for c in categories if c in cat_fields}
-        if filter_map:
-            qs = qs.filter(**filter_map)
-
-        return qs.order_by("-timestamp")
+        qs = sensor_data_queryset(self.request.user, self.request.query_params)
+        return qs.select_related("sensor", "plant", "item")
 
-    def perform_create(self, serializer):
+    def get_owned_sensor(self):
         sensor_id = self.request.data.get("sensor")
         if not sensor_id:
             raise ValidationError({"sensor": "Sensor ID is required"})
 
         try:
-            sensor = Sensor.objects.get(id=sensor_id, plant__user=self.request.user)
+            return Sensor.objects.get(id=sensor_id, plant__user=self.request.user)
         except Sensor.DoesNotExist:
             raise ValidationError({"sensor": "Invalid sensor or not owned by you"})
 
-        serializer.save(sensor=sensor)
+    def create(self, request, *args, **kwargs):
+        if not buffer.is_enabled():
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sensor = self.get_owned_sensor()
+        return self.enqueue(SensorData(
+            **{**serializer.validated_data, "sensor": sensor},
+            plant_id=sensor.plant_id, owner=request.user
+        ))
+
+    def perform_create(self, serializer):
+        sensor = self.get_owned_sensor()
+        with transaction.atomic():
+            reading = serializer.save(sensor=sensor, plant_id=sensor.plant_id, owner=self.request.user)
+            record_readings([reading])
+            self.invalidate_metrics([reading])
+            publish_sensor_data([reading])
+
+    def perform_update(self, serializer):
+        previous = copy(serializer.instance)
+        sensor = serializer.validated_data.get("sensor", previous.sensor)
+        if sensor.id != previous.sensor_id and not Sensor.objects.filter(
+            id=sensor.id, plant__user=self.request.user
+        ).exists():
+            raise ValidationError({"sensor": "Invalid sensor or not owned by you"})
+        with transaction.atomic():
+            reading = serializer.save(plant_id=sensor.plant_id, owner=self.request.user)
+            retract_readings([previous])
+            record_readings([reading])
+            self.invalidate_metrics([previous, reading])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            retract_readings([instance])
+            instance.delete()
+            self.invalidate_metrics([instance])
+
+    def invalidate_metrics(self, readings):
+        plants = {r.plant_id for r in readings}
+        sensors = {r.sensor_id for r in readings}
+        transaction.on_commit(lambda: metrics_cache.invalidate(self.request.user, plants, sensors))
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        rows = request.data
+        error = ingest.payload_error(rows)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        readings, errors = ingest.sensor_data_readings(request.user, rows)
+
+        with transaction.atomic():
+            SensorData.objects.bulk_create(readings, batch_size=1000)
+            record_readings(readings)
+            self.invalidate_metrics(readings)
+            publish_sensor_data(readings)
+
+        body, status_code = ingest.bulk_result(len(readings), errors)
+        return Response(body, status=status_code)
 
     @action(detail=False, methods=['get'], url_path='metrics')
     def get_metrics(self, request):
+        return metrics_cache.cached_response(request, "sensor-data", self.compute_metrics)
+
+    @action(detail=False, methods=['get'])
+    def anomalies(self, request):
+        """
+        Discard-rate, error-rate and weight anomalies per sensor over a window
+        (default: the last day); see core.analytics for the detectors.
+        """
+        if not analytics.available():
+            return Response(
+                {"error": "Anomaly detection requires numpy"}, status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        params = request.query_params
+        try:
+            options = {
+                "window": int(params.get("window", analytics.DEFAULT_WINDOW)),
+                "z": float(params.get("z", analytics.DEFAULT_Z)),
+                "alpha": float(params.get("alpha", analytics.DEFAULT_ALPHA)),
+                "limit": int(params.get("limit", analytics.DEFAULT_LIMIT)),
+            }
+        except ValueError:
+            return Response(
+                {"error": "window, z, alpha and limit must be numbers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not (
+            2 <= options["window"] <= 1000 and options["z"] > 0
+            and 0 < options["alpha"] < 1 and 1 <= options["limit"] <= 10000
+        ):
+            return Response(
+                {"error": "Expected 2 <= window <= 1000, z > 0, 0 < alpha < 1, 1 <= limit <= 10000"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            return Response(analytics.anomalies(request.user, sensor_data_filters(params), **options))
+        except analytics.WindowTooLarge as e:
+            return Response(
+                {"error": f"More than {e.args[0]} readings in the window; narrow it with start/end, plant or sensor"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+    def compute_metrics(self, request):
         metric_type = request.query_params.get("metric")
+        resolution = request.query_params.get("resolution")
+        max_points = request.query_params.get("max_points")
+        mode = request.query_params.get("downsample", "avg")  # avg, lttb
+
+        # Charts can only draw so many points; downsample on the server so the
+        # payload depends on max_points rather than on the amount of history.
+        if max_points is not None:
+            try:
+                max_points = int(max_points)
+            except ValueError:
+                max_points = 0
+            if not 3 <= max_points <= self.max_chart_points:
+                return Response(
+                    {"error": f"max_points must be between 3 and {self.max_chart_points}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if mode not in DOWNSAMPLE_MODES:
+                return Response({"error": "Invalid downsample mode"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Pre-aggregated buckets: reads one row per sensor and bucket instead
+        # of every raw reading in the window.
+        if resolution:
+            if resolution not in RESOLUTIONS:
+                return Response({"error": "Invalid resolution"}, status=status.HTTP_400_BAD_REQUEST)
+            if metric_type not in ("production", "weight", "quality"):
+                return Response({"error": "Invalid metric"}, status=status.HTTP_400_BAD_REQUEST)
+            filters = sensor_data_filters(request.query_params)
+            if filters["item_id"] or filters["categories"]:
+                return Response(
+                    {"error": "Item and category filters are not available with resolution"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            data = rollup_metrics(request.user, filters, resolution, metric_type)
+            if max_points:
+                # Buckets are already averaged; only thin them out, keeping the shape
+                data = lttb(data[::-1], max_points, LTTB_SERIES[metric_type])[::-1]
+            return Response(data, status=status.HTTP_200_OK)
+
         qs = self.get_queryset()
 
-        if metric_type == "production":
-            data = qs.values("timestamp", "items_scanned", "items_processed", "items_discarded", "processed_with_errors")
-        elif metric_type == "weight":
-            data = qs.values("timestamp", "current_weight_kg")
-        elif metric_type == "quality":
-            data = qs.values("timestamp", "category_a", "category_b", "category_c", "category_d")
-        else:
+        fields = self.metric_fields.get(metric_type)
+        if fields is None:
             return Response({"error": "Invalid metric"}, status=status.HTTP_400_BAD_REQUEST)
 
+        if max_points:
+            filters = sensor_data_filters(request.query_params)
+            data = downsample(qs, metric_type, fields, filters, max_points, mode)
+        else:
+            # Compacted rows are hourly totals; `readings` says how many raw readings each one holds
+            data = qs.values("timestamp", *fields, "readings", "compacted")
+
         return Response(data, status=status.HTTP_200_OK)
 
+    def metric_columns(self, params):
+        fields = self.metric_fields.get(params.get("metric"), [])
+        # Rollup and averaged buckets don't carry per-reading counts
+        if params.get("resolution") or (params.get("max_points") and params.get("downsample", "avg") == "avg"):
+            return ["timestamp", *fields]
+        return ["timestamp", *fields, "readings", "compacted"]
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        export_format = request.query_params.get("export_format", "csv")  # csv, ndjson, arrow, parquet
+        if export_format not in EXPORT_FORMATS:
+            return Response({"error": "Invalid export format"}, status=status.HTTP_400_BAD_REQUEST)
+        if export_format in ARROW_FORMATS and not arrow_available():
+            return Response(
+                {"error": "Arrow and Parquet exports require pyarrow"}, status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        return streaming_export(
+            self.get_queryset(), SENSOR_DATA_EXPORT_COLUMNS, export_format, "sensor-data",
+            chunk_size=self.arrow_chunk_size if export_format in ARROW_FORMATS else self.export_chunk_size
+        )
+
 # class EnergyPagination(PageNumberPagination):
 #     page_size = 20
 #     page_size_query_param = 'page_size'
@@ -405,44 +704,28 @@ class EnergyPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class EnergyConsumptionViewSet(viewsets.ModelViewSet):
+class EnergyConsumptionPagination(PageNumberOrKeysetPagination):
+    # ?cursor= / ?pagination=cursor for constant-cost deep pages
+    page_number_class = EnergyPagination
+
+class EnergyConsumptionViewSet(ResponseFormatMixin, ConditionalGetMixin, ReplicaReadMixin, ValuesListMixin, BufferedCreateMixin, viewsets.ModelViewSet):
     serializer_class = EnergyConsumptionSerializer
+    row_serializer_class = EnergyConsumptionRowSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = EnergyPagination
+    pagination_class = EnergyConsumptionPagination
+    buffer_name = "energy"
+    export_chunk_size = 2000
+    arrow_chunk_size = 20000  # rows per record batch / Parquet row group
+    metric_fields = {
+        "daily": ["date", "energy_kwh", "cost_inr"],
+        "sensor-cost": ["sensor_name", "total_cost"],
+        "efficiency": ["timestamp", "plant", "location_type", "energy_kwh", "items_processed", "kwh_per_item"],
+    }
 
     def get_queryset(self):
-        qs = EnergyConsumption.objects.filter(plant__user=self.request.user)
-        params = self.request.query_params
-
-        sensor_id = params.get("sensor")
-        plant_id = params.get("plant")
-        start_date = params.get("start_date")  # Changed to match frontend
-        end_date = params.get("end_date")      # Changed to match frontend
-        date_filter = params.get("date_filter")
-
-        now = timezone.now()
-        if date_filter == "today":
-            start_date = now.replace(hour=0, minute=0, second=0, microsecond=0).date()
-            end_date = now.date()
-        elif date_filter == "week":
-            start_date = (now - timedelta(days=now.weekday())).date()  # Start of current week
-            end_date = now.date()
-        elif date_filter == "month":
-            start_date = now.replace(day=1).date()  # Start of current month
-            end_date = now.date()
-
-        if sensor_id:
-            qs = qs.filter(sensor_id=sensor_id)
-        if plant_id:
-            qs = qs.filter(plant_id=plant_id)
-        if start_date:
-            qs = qs.filter(timestamp__date__gte=start_date)
-        if end_date:
-            qs = qs.filter(timestamp__date__lte=end_date)
+        return energy_queryset(self.request.user, self.request.query_params).select_related("sensor", "plant")
 
-        return qs.order_by("-timestamp")
-
-    def perform_create(self, serializer):
+    def get_owned_sensor_and_plant(self):
         sensor_id = self.request.data.get("sensor")
         plant_id = self.request.data.get("plant")
 
@@ -454,11 +737,40 @@ class EnergyConsumptionViewSet(viewsets.ModelViewSet):
             plant = Plant.objects.get(id=plant_id, user=self.request.user)
         except (Sensor.DoesNotExist, Plant.DoesNotExist):
             raise ValidationError({"error": "Invalid sensor or plant for this user."})
+        return sensor, plant
+
+    def create(self, request, *args, **kwargs):
+        if not buffer.is_enabled():
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sensor, plant = self.get_owned_sensor_and_plant()
+        return self.enqueue(EnergyConsumption(**{**serializer.validated_data, "sensor": sensor, "plant": plant}))
 
-        serializer.save(sensor=sensor, plant=plant)
+    def perform_create(self, serializer):
+        sensor, plant = self.get_owned_sensor_and_plant()
+        energy = serializer.save(sensor=sensor, plant=plant)
+        metrics_cache.invalidate(self.request.user, plants=[plant.id], sensors=[sensor.id])
+        publish_energy([energy])
+
+    def perform_update(self, serializer):
+        previous = copy(serializer.instance)
+        energy = serializer.save()
+        metrics_cache.invalidate(
+            self.request.user,
+            plants=[previous.plant_id, energy.plant_id],
+            sensors=[previous.sensor_id, energy.sensor_id]
+        )
+
+    def perform_destroy(self, instance):
+        metrics_cache.invalidate(self.request.user, plants=[instance.plant_id], sensors=[instance.sensor_id])
+        instance.delete()
 
     @action(detail=False, methods=['get'])
     def metrics(self, request):
+        return metrics_cache.cached_response(request, "energy", self.compute_metrics)
+
+    def compute_metrics(self, request):
         metric_type = request.query_params.get("metric")
         if not metric_type:
             return Response({"error": "Metric parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
@@ -466,35 +778,71 @@ class EnergyConsumptionViewSet(viewsets.ModelViewSet):
         qs = self.get_queryset()
         
         try:
+            # Sums are cast to floats in SQL rather than per row in Python
             if metric_type == "daily":
-                data = qs.annotate(
+                formatted_data = qs.annotate(
                     date=TruncDate('timestamp')
                 ).values('date').annotate(
-                    energy_kwh=Sum('energy_kwh'),
-                    cost_inr=Sum('cost')
+                    energy_kwh=Coalesce(Cast(Sum('energy_kwh'), FloatField()), 0.0),
+                    cost_inr=Coalesce(Cast(Sum('cost'), FloatField()), 0.0)
                 ).order_by('date')
-                
-                # Convert to proper format for frontend
-                formatted_data = [{
-                    'date': item['date'].strftime('%Y-%m-%d'),
-                    'energy_kwh': float(item['energy_kwh'] or 0),
-                    'cost_inr': float(item['cost_inr'] or 0)
-                } for item in data]
-                
+
             elif metric_type == "sensor-cost":
-                data = qs.values('sensor__name').annotate(
-                    total_cost=Sum('cost')
+                formatted_data = qs.values(sensor_name=F('sensor__name')).annotate(
+                    total_cost=Coalesce(Cast(Sum('cost'), FloatField()), 0.0)
                 ).order_by('-total_cost')
-                
-                formatted_data = [{
-                    'sensor_name': item['sensor__name'],
-                    'total_cost': float(item['total_cost'] or 0)
-                } for item in data]
-                
+
+            elif metric_type == "efficiency":
+                grain = request.query_params.get("resolution", "day")
+                if grain not in EFFICIENCY_GRAINS:
+                    return Response({"error": "Invalid resolution"}, status=status.HTTP_400_BAD_REQUEST)
+                formatted_data = efficiency_series(
+                    qs, request.user, energy_filters(request.query_params), grain
+                )
+
             else:
                 return Response({"error": "Invalid metric type"}, status=status.HTTP_400_BAD_REQUEST)
             
-            return Response(formatted_data)
+            return Response(list(formatted_data))
             
         except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)   
\ No newline at end of file
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def metric_columns(self, params):
+        return self.metric_fields.get(params.get("metric"), [])
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        export_format = request.query_params.get("export_format", "csv")  # csv, ndjson, arrow, parquet
+        if export_format not in EXPORT_FORMATS:
+            return Response({"error": "Invalid export format"}, status=status.HTTP_400_BAD_REQUEST)
+        if export_format in ARROW_FORMATS and not arrow_available():
+            return Response(
+                {"error": "Arrow and Parquet exports require pyarrow"}, status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        return streaming_export(
+            self.get_queryset(), ENERGY_EXPORT_COLUMNS, export_format, "energy",
+            chunk_size=self.arrow_chunk_size if export_format in ARROW_FORMATS else self.export_chunk_size
+        )   
+
+
+# -------------------------
+# Metrics cache stats
+# -------------------------
+class MetricsCacheViewSet(viewsets.ViewSet):
+    permission_classes = [IsAdminUser]
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        return Response(metrics_cache.stats(), status=status.HTTP_200_OK)
+
+
+# -------------------------
+# Ingest buffer stats
+# -------------------------
+class IngestBufferViewSet(viewsets.ViewSet):
+    permission_classes = [IsAdminUser]
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        return Response({"enabled": buffer.is_enabled(), **buffer.stats()}, status=status.HTTP_200_OK)
@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import sys
+import tempfile
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,6 +49,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'core.middleware.InstrumentationMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,7 +63,7 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     )
 }
 
@@ -95,11 +102,125 @@ DATABASES = {
     }
 }
 
+# Optional read replica: add a DATABASES entry named REPLICA_DATABASE (a
+# streaming replica of 'default') and list, retrieve, metrics and export
+# requests read from it. Writes, requests sending "X-Read-Primary: 1" and a
+# user's requests for REPLICA_STICKY_SECONDS after their last write stay on
+# the primary (core.db_routers).
+DATABASE_ROUTERS = ['core.db_routers.PrimaryReplicaRouter']
+REPLICA_DATABASE = 'replica'
+REPLICA_STICKY_SECONDS = 5
+
+# The test suite adds a replica that mirrors 'default' so the routing above is
+# exercised (core.tests.ReplicaRoutingTests)
+if sys.argv[1:2] == ['test'] and REPLICA_DATABASE not in DATABASES:
+    DATABASES[REPLICA_DATABASE] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# "metrics" holds cached metrics responses and their invalidation markers,
+# "auth" the users resolved from JWTs and the read-after-write pins. Both are file based so every worker
+# process on a host sees the same invalidations; point them at a shared
+# backend (e.g. Redis) when running on several hosts.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'metrics': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': Path(tempfile.gettempdir()) / 'monitoring_system' / 'metrics',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': Path(tempfile.gettempdir()) / 'monitoring_system' / 'auth',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Seconds an authenticated user stays cached (core.authentication)
+AUTH_USER_CACHE_TTL = 30
+
+# Seconds a metrics response stays cached, per metric type
+METRICS_CACHE_TTL = 60
+METRICS_CACHE_TTLS = {
+    'production': 60,
+    'weight': 60,
+    'quality': 60,
+    'daily': 300,
+    'sensor-cost': 300,
+    'efficiency': 300,
+}
+
+# Raw readings older than this are folded into hourly rows (manage.py compact_readings)
+COMPACTION_AGE_DAYS = 30
+COMPACTION_BATCH_SIZE = 5000
+
+# Live readings stream (/api/stream/). The in-process broker only reaches
+# streams served by the same process; swap it for a shared one when running
+# several ASGI workers.
+REALTIME_BROKER = 'core.broker.InProcessBroker'
+REALTIME_HEARTBEAT = 15  # seconds between keep-alive comments
+REALTIME_QUEUE_SIZE = 1000  # messages buffered per slow client
+
+# Write-behind ingestion: POST /sensor-data/ and /energy/ answer 202 and a
+# background thread writes readings in batches. Off by default.
+INGEST_BUFFERED = False
+INGEST_BUFFER_SIZE = 10000  # readings; further POSTs get 503 + Retry-After
+INGEST_BUFFER_BATCH_SIZE = 1000
+INGEST_BUFFER_FLUSH_INTERVAL = 1.0  # seconds
+
+# Most readings one bulk POST may carry, for sensor data and energy alike
+# (core.ingest)
+BULK_MAX_ROWS = 5000
+
+# Most readings /sensor-data/anomalies/ loads for one request (core.analytics)
+ANOMALY_MAX_ROWS = 1_000_000
+
+# Request instrumentation (core.middleware): every response carries a
+# Server-Timing header and GET /metrics serves per-route latency histograms,
+# query counts and cache/buffer stats in the Prometheus text format, to the
+# addresses below or to "Authorization: Bearer <METRICS_AUTH_TOKEN>".
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_AUTH_TOKEN = None
+SLOW_QUERY_MS = 200  # queries at least this slow are logged to core.slow_queries
+
+# Response bodies at least this large are sent brotli- (with the optional
+# brotli package) or gzip-compressed when the client accepts it.
+COMPRESSION_MIN_BYTES = 1024
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.slow_queries': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
 
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
+# Passwords are hashed with PBKDF2-SHA256 at PASSWORD_HASH_ITERATIONS rounds
+# (Django's default count unless overridden). Changing it rehashes each
+# password on that user's next login. The other hashers only verify legacy hashes.
+PASSWORD_HASH_ITERATIONS = 1_000_000
+
+PASSWORD_HASHERS = [
+    'core.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -144,3 +265,6 @@ AUTH_USER_MODEL = 'core.CustomUser'
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # Allow Vite frontend
 ]
+
+CORS_ALLOW_HEADERS = [*default_headers, 'x-read-primary', 'if-none-match', 'if-modified-since']
+CORS_EXPOSE_HEADERS = ['Server-Timing', 'ETag', 'Last-Modified']
@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from core import instrumentation
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('core.urls')),  # 👈 API routes
+    path('metrics', instrumentation.prometheus),  # Prometheus scrape target
 ]